@@ -1,20 +1,37 @@
 import re
-from typing import Any, Text, Dict, List, Optional
+import atexit
+import threading
+from typing import Any, Text, Dict, List, Optional, Tuple
 import logging
 from rasa_sdk.forms import FormValidationAction
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet, FollowupAction
 import mysql.connector
-from werkzeug.security import generate_password_hash, check_password_hash
-
-# --- Configuración de la Base de Datos ---
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '',
-    'database': 'vinai_db_normalizada'
-}
+from actions.db_pool import crear_pool, DB_CONFIG
+from actions import async_db, metricas, versiones
+from actions.async_db import accion_no_bloqueante, accion_medida, en_hilo_db
+from actions.indice_vinos import IndiceVinos, TABLAS_CATALOGO
+from actions.ranking_vinos import RankingVinos
+from actions.catalogo_tours import CatalogoTours, TABLAS_TOURS, coordenadas
+from actions.gazette_vivo import GazetteVivo, CATEGORIAS_GAZETTE
+from actions.resolver_vinas import ResolverVinas, TABLAS_RESOLVER
+from actions.write_behind import ColaEscritura
+from actions.similitud_vinas import SimilitudVinas
+from actions.texto import normalizar
+from actions.cache import CacheTTL
+from actions.consultas import consulta_recomendacion, QUERY_PREFERENCIAS
+from actions.seguridad import PoolHash, HashSaturado
+from actions.consultas_lentas import RegistroConsultasLentas
+
+# --- Configuración de la Base de Datos (DB_CONFIG en actions/db_pool.py) ---
+DB_POOL_SIZE = 8  # Conexiones simultáneas máximas del servidor de acciones
+METRICAS_PUERTO = 9105  # GET /metrics (Prometheus); rasa_sdk no permite agregar rutas a su app
+# Interfaz del puerto de métricas. No tiene autenticación y muestra las consultas
+# y el estado del pool: "0.0.0.0" solo si Prometheus corre en otra máquina y
+# el puerto está cerrado hacia afuera.
+METRICAS_HOST = "127.0.0.1"
+UMBRAL_CONSULTA_LENTA_MS = 100  # Más que esto va a logs/consultas_lentas.jsonl con su EXPLAIN
 
 # --- Configuración de Mapas ---
 GOOGLE_MAPS_API_KEY = "PEGA_TU_GOOGLE_MAPS_API_KEY_AQUÍ"
@@ -25,55 +42,191 @@ VALLEY_MAPS = {
     "Valle de Aconcagua": "https://i.imgur.com/O6wZJ1B.png",
 }
 
+DB_POOL = crear_pool(DB_CONFIG, size=DB_POOL_SIZE, nombre="acciones")
+async_db.configurar(max_workers=DB_POOL_SIZE)  # Un hilo por conexión: nadie espera al pool sin motivo
+
 def _get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+    # Conexión del pool: `conn.close()` la devuelve al pool en vez de cerrarla.
+    return DB_POOL.get_connection()
+
+# --- Escritura diferida de valoraciones y preferencias ---
+# El usuario recibe la confirmación apenas la escritura queda en el diario
+# local; un hilo la vuelca a MySQL en lotes (ver actions/write_behind.py).
+COLA_ESCRITURA = ColaEscritura(_get_db_connection)
+COLA_ESCRITURA.iniciar()
+atexit.register(COLA_ESCRITURA.detener)
+
+# --- Hash de contraseñas en procesos aparte (ver actions/seguridad.py) ---
+POOL_HASH = PoolHash(max_procesos=2, max_en_cola=8, nombre="acciones")
+atexit.register(POOL_HASH.cerrar)
+
+# --- Caché de preferencias por usuario ---
+# Las preferencias casi no cambian: se guardan por usuario_id y
+# ActionGuardarPreferencia actualiza la entrada al guardar (write-through).
+# El TTL acota lo que pueda cambiar fuera del bot.
+#
+# Cada guardado sube la generación del usuario. Una lectura que falló en el
+# caché solo guarda lo leído si la generación no cambió mientras consultaba:
+# si no, un guardado concurrente (que no encontró entrada que modificar) podría
+# quedar tapado por la foto anterior hasta que venza el TTL.
+CACHE_PREFERENCIAS = CacheTTL(max_entradas=10000, ttl=600, nombre="preferencias")
+_GENERACION_PREFERENCIAS: Dict[int, int] = {}
+_LOCK_PREFERENCIAS = threading.Lock()
+
+def _preferencias_de(usuario_id: int) -> Dict[str, str]:
+    """tipo_preferencia -> valor del usuario, desde el caché o la DB (más lo pendiente en la cola)."""
+    preferencias = CACHE_PREFERENCIAS.get(usuario_id)
+    if preferencias is None:
+        with _LOCK_PREFERENCIAS:
+            generacion = _GENERACION_PREFERENCIAS.get(usuario_id, 0)
+        # Lo guardado hace un instante puede seguir en la cola de escritura. Se
+        # lee antes que MySQL: el volcado confirma en MySQL y recién después lo
+        # saca de la cola, así que cada pendiente está en una de las dos lecturas.
+        pendientes = COLA_ESCRITURA.preferencias_pendientes(usuario_id)
+        preferencias = {}
+        conn = _get_db_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(QUERY_PREFERENCIAS, (usuario_id,))
+            for pref in cursor.fetchall():
+                preferencias[pref['tipo_preferencia']] = pref['valor_preferencia']
+            cursor.close()
+        finally:
+            conn.close()
+        preferencias.update(pendientes)
+        with _LOCK_PREFERENCIAS:
+            if _GENERACION_PREFERENCIAS.get(usuario_id, 0) == generacion:
+                CACHE_PREFERENCIAS.set(usuario_id, preferencias)
+    return dict(preferencias)
+
+def _guardar_preferencia_en_cache(usuario_id: int, tipo_pref: str, valor_pref: str) -> None:
+    with _LOCK_PREFERENCIAS:
+        _GENERACION_PREFERENCIAS[usuario_id] = _GENERACION_PREFERENCIAS.get(usuario_id, 0) + 1
+        CACHE_PREFERENCIAS.modificar(usuario_id, lambda prefs: {**prefs, tipo_pref: valor_pref})
 
 # --- Carga Dinámica de Palabras Clave ---
+# GAZETTE_VIVO publica una foto versionada (gazettes + autómata) que se recarga
+# sola cuando cambian las tablas; los lectores usan `GAZETTE_VIVO.actual()`.
+GAZETTE_VIVO = GazetteVivo(_get_db_connection)
+
 def _load_gazettes_from_db() -> Dict[str, List[str]]:
-    gazettes = {
-        "notas_sabor": [],
-        "maridajes": [],
-        "caracteristicas": [],
-        "vinas": []
-    }
-    
-    conn = None
     try:
         print("Cargando palabras clave (gazettes) desde la base de datos...")
-        conn = _get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT nombre FROM notas_sabor")
-        for row in cursor.fetchall():
-            gazettes["notas_sabor"].append(row[0].lower())
-            
-        cursor.execute("SELECT nombre FROM maridajes")
-        for row in cursor.fetchall():
-            gazettes["maridajes"].append(row[0].lower())
-
-        cursor.execute("SELECT nombre FROM caracteristicas")
-        for row in cursor.fetchall():
-            gazettes["caracteristicas"].append(row[0].lower())
-
-        cursor.execute("SELECT nombre FROM vinas")
-        for row in cursor.fetchall():
-            gazettes["vinas"].append(row[0].lower())
-            
-        cursor.close()
+        gazettes = GAZETTE_VIVO.recargar().gazettes
         print(f"Carga exitosa: {len(gazettes['notas_sabor'])} sabores, {len(gazettes['maridajes'])} maridajes, {len(gazettes['caracteristicas'])} características, {len(gazettes['vinas'])} viñas.")
-        
     except mysql.connector.Error as err:
         print(f"Error al cargar gazettes desde DB: {err}")
+    return GAZETTE_VIVO.gazettes
+
+_load_gazettes_from_db()
+
+# --- Índice en memoria del catálogo de vinos ---
+# Si está desactivado, ActionRecomendarVinoDb vuelve a la consulta SQL dinámica.
+USAR_INDICE_VINOS = True
+INDICE_VINOS = IndiceVinos(_get_db_connection)
+
+# --- Ranking de vinos (ver actions/ranking_vinos.py) ---
+# Puntúa todo el catálogo con lo pedido, las preferencias guardadas y los
+# atributos de cata, y devuelve el más cercano aunque nada cumpla todo. Si
+# está desactivado se usa el índice (o la consulta SQL) con filtros exactos.
+USAR_RANKING_VINOS = True
+RANKING_VINOS = RankingVinos(_get_db_connection)
+CATALOGO_TOURS = CatalogoTours(_get_db_connection)
+RESOLVER_VINAS = ResolverVinas(_get_db_connection)
+
+# --- Similitud entre viñas (ver actions/similitud_vinas.py) ---
+# Un hilo arma el modelo desde valoraciones_tour al iniciar y lo reconstruye
+# periódicamente; ActionGuardarValoracionDb lo actualiza en cada valoración y
+# ActionRecomendarTourDb solo lee las vecinas ya calculadas.
+SIMILITUD_VINAS = SimilitudVinas(_get_db_connection)
+SIMILITUD_VINAS.iniciar()
+atexit.register(SIMILITUD_VINAS.detener)
+
+# --- Ruta SQL (índice y ranking desactivados) ---
+# La consulta multi-JOIN elige en MySQL un vino al azar y trae solo esa fila.
+def _elegir_vino_sql(conn, criterios: Dict[str, Any]) -> Optional[tuple]:
+    cursor = conn.cursor()
+    try:
+        query, valores = consulta_recomendacion(**criterios)
+        cursor.execute(query, valores)
+        return cursor.fetchone()
     finally:
-        if conn: conn.close()
+        cursor.close()
 
-    return gazettes
+# --- Métricas (ver actions/metricas.py) ---
+# Latencia por acción y por consulta las registran `accion_no_bloqueante` y el
+# pool; acá se suman los contadores de los componentes y se abre el puerto.
+metricas.REGISTRO.stats("db_pool", DB_POOL.stats)
+metricas.REGISTRO.stats("cache_preferencias", CACHE_PREFERENCIAS.stats)
+metricas.REGISTRO.stats("cola_escritura", COLA_ESCRITURA.stats)
+metricas.REGISTRO.stats("pool_hash", POOL_HASH.stats)
+metricas.REGISTRO.stats("similitud_vinas", SIMILITUD_VINAS.stats)
+metricas.servir_http(METRICAS_PUERTO, host=METRICAS_HOST)
+
+# Forma (huella) y duración de cada consulta; las lentas, con su EXPLAIN, al
+# registro en disco que muestra el panel (ver actions/consultas_lentas.py).
+CONSULTAS_LENTAS = RegistroConsultasLentas(_get_db_connection, umbral_ms=UMBRAL_CONSULTA_LENTA_MS)
+CONSULTAS_LENTAS.iniciar()
+atexit.register(CONSULTAS_LENTAS.detener)
+DB_POOL.observador = CONSULTAS_LENTAS.observar
+metricas.REGISTRO.stats("consultas_lentas", CONSULTAS_LENTAS.stats)
+
+# === ACCIÓN INTERNA: RECARGA DEL CATÁLOGO ===
+class ActionRecargarCatalogo(Action):
+    """
+    La invoca el panel admin (POST al webhook de acciones) justo después de
+    insertar vinos o viñas, para que el bot recargue sin esperar al próximo turno.
+    No está en domain.yml: Rasa Core nunca la predice.
+    """
+    def name(self) -> Text:
+        return "action_recargar_catalogo"
 
-GAZETTE = _load_gazettes_from_db()
+    @accion_no_bloqueante
+    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        logger = logging.getLogger(__name__)
+        tablas = set(tracker.latest_message.get("metadata", {}).get("tablas") or [])
+        try:
+            categorias = [c for c, tabla in CATEGORIAS_GAZETTE.items() if not tablas or tabla in tablas]
+            if categorias:
+                GAZETTE_VIVO.recargar(categorias)
+            if not tablas or tablas & set(TABLAS_CATALOGO):
+                if USAR_RANKING_VINOS:
+                    RANKING_VINOS.refrescar()
+                elif USAR_INDICE_VINOS:
+                    INDICE_VINOS.refrescar()
+            if not tablas or tablas & set(TABLAS_TOURS):
+                CATALOGO_TOURS.refrescar()
+            if not tablas or tablas & set(TABLAS_RESOLVER):
+                RESOLVER_VINAS.refrescar()
+            logger.info(f"ActionRecargarCatalogo: catálogo recargado ({sorted(tablas) or 'todo'}).")
+        except mysql.connector.Error as err:
+            logger.error(f"ActionRecargarCatalogo: error al recargar: {err}")
+        return []
+
+# === ACCIÓN INTERNA: ESTADÍSTICAS DEL SERVIDOR DE ACCIONES ===
+class ActionEstadisticasServidor(Action):
+    """
+    Devuelve (como mensaje JSON) los contadores de los cachés, el pool y la cola
+    de escritura. La consulta el panel admin en /bot_stats; no está en domain.yml.
+    """
+    def name(self) -> Text:
+        return "action_estadisticas_servidor"
+
+    @accion_medida
+    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        dispatcher.utter_message(json_message={
+            "cache_preferencias": CACHE_PREFERENCIAS.stats(),
+            "cola_escritura": COLA_ESCRITURA.stats(),
+            "db_pool": DB_POOL.stats(),
+            "pool_hash": POOL_HASH.stats(),
+            "similitud_vinas": SIMILITUD_VINAS.stats(),
+        })
+        return []
 
 # === ACCIONES DE PERFIL Y LOGIN ===
 class ActionRegistrarUsuario(Action):
     def name(self) -> Text: return "action_registrar_usuario"
+    @accion_no_bloqueante
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         # ... (Tu código de registro va aquí, no necesita cambios) ...
         email = next(tracker.get_latest_entity_values("email"), None)
@@ -81,7 +234,11 @@ class ActionRegistrarUsuario(Action):
         if not email:
             dispatcher.utter_message(text="Para registrarte, por favor di 'quiero registrarme con miemail@ejemplo.com'")
             return []
-        password_hash = generate_password_hash(password_plana)
+        try:
+            password_hash = POOL_HASH.generar(password_plana)
+        except HashSaturado:
+            dispatcher.utter_message(text="Estamos recibiendo muchos registros en este momento. Intenta de nuevo en unos segundos.")
+            return []
         username = email.split('@')[0] 
         conn = _get_db_connection()
         try:
@@ -102,6 +259,7 @@ class ActionRegistrarUsuario(Action):
 
 class ActionIniciarSesion(Action):
     def name(self) -> Text: return "action_iniciar_sesion"
+    @accion_no_bloqueante
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         # ... (Tu código de login va aquí, no necesita cambios) ...
         email = next(tracker.get_latest_entity_values("email"), None)
@@ -130,6 +288,7 @@ class ActionIniciarSesion(Action):
 
 class ActionGuardarPreferencia(Action):
     def name(self) -> Text: return "action_guardar_preferencia"
+    @accion_no_bloqueante
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         # ... (Tu código de guardar preferencia va aquí, no necesita cambios) ...
         user_id_str = tracker.sender_id
@@ -158,6 +317,11 @@ class ActionGuardarPreferencia(Action):
         if not (tipo_pref and valor_pref):
             dispatcher.utter_message(text="No entendí qué preferencia quieres guardar. Prueba 'me gusta el Carmenere'.")
             return []
+        if COLA_ESCRITURA.encolar_preferencia(usuario_id, tipo_pref, valor_pref):
+            _guardar_preferencia_en_cache(usuario_id, tipo_pref, valor_pref)
+            dispatcher.utter_message(text=f"¡Perfecto! He guardado que tu preferencia de '{tipo_pref}' es '{valor_pref}'.")
+            return []
+        # Cola llena: escritura directa
         conn = _get_db_connection()
         try:
             cursor = conn.cursor()
@@ -165,6 +329,8 @@ class ActionGuardarPreferencia(Action):
             query = "INSERT INTO preferencias_usuario (usuario_id, tipo_preferencia, valor_preferencia) VALUES (%s, %s, %s)"
             cursor.execute(query, (usuario_id, tipo_pref, valor_pref))
             conn.commit()
+            versiones.incrementar("preferencias_usuario")  # Invalida el dashboard del panel
+            _guardar_preferencia_en_cache(usuario_id, tipo_pref, valor_pref)
             dispatcher.utter_message(text=f"¡Perfecto! He guardado que tu preferencia de '{tipo_pref}' es '{valor_pref}'.")
         except mysql.connector.Error as err:
             print(f"Error en ActionGuardarPreferencia: {err}")
@@ -189,7 +355,6 @@ class ValidateValorarTourForm(FormValidationAction):
     ) -> Dict[Text, Any]:
         """Valida el nombre de la viña."""
         logger = logging.getLogger(__name__)
-        conn = None 
         
         try:
             user_id_str = tracker.sender_id
@@ -199,28 +364,21 @@ class ValidateValorarTourForm(FormValidationAction):
 
             vina_nombre = str(value)
 
-            conn = _get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id FROM vinas WHERE nombre LIKE %s LIMIT 1", (f"%{vina_nombre}%",))
-            vina = cursor.fetchone()
+            vina = await en_hilo_db(RESOLVER_VINAS.resolver, vina_nombre)
             
             if not vina:
                 logger.debug(f"validate_vina: Viña '{vina_nombre}' no encontrada en DB. Pidiendo de nuevo.")
                 dispatcher.utter_message(text=f"No encontré una viña con el nombre '{vina_nombre}' en mi base de datos. ¿Puedes verificar el nombre?")
-                return {"slot_vina_a_valorar": None}
+                return {"slot_vina_a_valorar": None, "slot_vina_a_valorar_id": None}
             
-            logger.debug(f"validate_vina: Viña '{vina_nombre}' validada con éxito.")
-            # Corregido: Capitalizar el nombre de la viña
-            return {"slot_vina_a_valorar": vina_nombre.capitalize()}
+            logger.debug(f"validate_vina: Viña '{vina_nombre}' resuelta como '{vina.nombre}' (id={vina.id}, puntaje={vina.puntaje}).")
+            # Guardamos el nombre oficial y el id: ActionGuardarValoracionDb no vuelve a buscarlo
+            return {"slot_vina_a_valorar": vina.nombre, "slot_vina_a_valorar_id": vina.id}
 
         except Exception as e:
             logger.error(f"ERROR INESPERADO en validate_slot_vina_a_valorar: {e}", exc_info=True) 
             dispatcher.utter_message(text="Tuvimos un problema inesperado al validar la viña. El equipo técnico ha sido notificado.")
             return {"slot_vina_a_valorar": None, "requested_slot": None}
-            
-        finally:
-            if conn: 
-                conn.close()
 
     async def validate_slot_rating(
         self,
@@ -281,6 +439,7 @@ class ActionGuardarValoracionDb(Action):
     def name(self) -> Text:
         return "action_guardar_valoracion_db"
 
+    @accion_no_bloqueante
     def run(
         self,
         dispatcher: CollectingDispatcher,
@@ -312,29 +471,37 @@ class ActionGuardarValoracionDb(Action):
 
             logger.debug(f"GuardarDB: Datos a guardar: UserID={usuario_id}, Viña={vina_nombre}, Rating={rating}, Comentario={comentario}")
 
-            conn = _get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute("SELECT id FROM vinas WHERE nombre LIKE %s LIMIT 1", (f"%{vina_nombre}%",))
-            vina = cursor.fetchone()
-            
-            if not vina:
-                logger.warning(f"GuardarDB: No se encontró la viña '{vina_nombre}' en la DB.")
-                dispatcher.utter_message(text=f"Error fatal: No pude encontrar {vina_nombre} en la base de datos al guardar.")
-                return []
-
-            vina_id = vina['id']
+            vina_id = tracker.get_slot("slot_vina_a_valorar_id")
+            if vina_id is None:
+                # Slot llenado sin pasar por la validación (p. ej. conversación antigua)
+                vina = RESOLVER_VINAS.resolver(vina_nombre)
+                if not vina:
+                    logger.warning(f"GuardarDB: No se encontró la viña '{vina_nombre}' en la DB.")
+                    dispatcher.utter_message(text=f"Error fatal: No pude encontrar {vina_nombre} en la base de datos al guardar.")
+                    return []
+                vina_id = vina.id
+            vina_id = int(vina_id)
             logger.debug(f"GuardarDB: Viña ID encontrada: {vina_id}")
 
-            cursor.execute("DELETE FROM valoraciones_tour WHERE usuario_id = %s AND vina_id = %s", (usuario_id, vina_id))
-            logger.debug("GuardarDB: DELETE de valoración anterior (si existía) completado.")
+            if COLA_ESCRITURA.encolar_valoracion(usuario_id, vina_id, rating, comentario):
+                logger.debug("GuardarDB: valoración encolada para escritura diferida.")
+            else:
+                logger.warning("GuardarDB: cola de escritura llena, se escribe directo en la DB.")
+                conn = _get_db_connection()
+                cursor = conn.cursor(dictionary=True)
+
+                cursor.execute("DELETE FROM valoraciones_tour WHERE usuario_id = %s AND vina_id = %s", (usuario_id, vina_id))
+                logger.debug("GuardarDB: DELETE de valoración anterior (si existía) completado.")
             
-            query = "INSERT INTO valoraciones_tour (usuario_id, vina_id, rating, comentario) VALUES (%s, %s, %s, %s)"
-            cursor.execute(query, (usuario_id, vina_id, rating, comentario))
-            logger.debug("GuardarDB: INSERT de nueva valoración completado.")
+                query = "INSERT INTO valoraciones_tour (usuario_id, vina_id, rating, comentario) VALUES (%s, %s, %s, %s)"
+                cursor.execute(query, (usuario_id, vina_id, rating, comentario))
+                logger.debug("GuardarDB: INSERT de nueva valoración completado.")
             
-            conn.commit()
-            logger.debug("GuardarDB: conn.commit() exitoso.")
+                conn.commit()
+                logger.debug("GuardarDB: conn.commit() exitoso.")
+                versiones.incrementar("valoraciones_tour")  # Invalida el dashboard del panel
+
+            SIMILITUD_VINAS.actualizar(usuario_id, vina_id, rating)
             
             # ¡Enviamos el mensaje de éxito aquí!
             dispatcher.utter_message(response="utter_valoracion_guardada")
@@ -351,15 +518,21 @@ class ActionGuardarValoracionDb(Action):
         # Limpiamos los slots al final
         return [
             SlotSet("slot_vina_a_valorar", None),
+            SlotSet("slot_vina_a_valorar_id", None),
             SlotSet("slot_rating", None),
             SlotSet("slot_comentario", None),
         ]
         
-# === ACCIONES DE RECOMENDACIÓN (Sin cambios) ===
+# === ACCIONES DE RECOMENDACIÓN ===
+# Cómo se nombra cada criterio al avisar que no se pudo cumplir
+NOMBRES_CRITERIOS = {"cepa": "la cepa", "tipo": "el tipo", "valle": "el valle", "ano": "el año",
+                     "caracteristica": "la característica", "maridaje": "el maridaje", "nota_sabor": "la nota"}
+
 class ActionRecomendarVinoDb(Action):
     def name(self) -> Text: 
         return "action_recomendar_vino_db"
 
+    @accion_no_bloqueante
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         # ... (Tu código de recomendar vino va aquí, no necesita cambios) ...
         user_id_str = tracker.sender_id
@@ -367,13 +540,7 @@ class ActionRecomendarVinoDb(Action):
         if user_id_str and user_id_str.startswith("user_"):
             try:
                 usuario_id = int(user_id_str.split("_")[1])
-                conn_prefs = _get_db_connection()
-                cursor_prefs = conn_prefs.cursor(dictionary=True)
-                cursor_prefs.execute("SELECT tipo_preferencia, valor_preferencia FROM preferencias_usuario WHERE usuario_id = %s", (usuario_id,))
-                for pref in cursor_prefs.fetchall():
-                    preferencias_guardadas[pref['tipo_preferencia']] = pref['valor_preferencia']
-                cursor_prefs.close()
-                conn_prefs.close()
+                preferencias_guardadas = _preferencias_de(usuario_id)
                 if preferencias_guardadas:
                     dispatcher.utter_message(text="*(Usando tus preferencias guardadas para esta búsqueda...)*")
             except Exception as e:
@@ -385,14 +552,14 @@ class ActionRecomendarVinoDb(Action):
         maridaje_slot = tracker.get_slot("slot_maridaje")
         ano_slot = tracker.get_slot("slot_ano")
         latest_message = tracker.latest_message.get('text', '').lower()
-        def find_keyword(text: str, keywords: List[str]) -> Optional[str]:
-            for keyword in keywords:
-                if keyword in text:
-                    return keyword.capitalize()
-            return None
-        nota_sabor_txt = find_keyword(latest_message, GAZETTE["notas_sabor"])
-        caracteristica_txt = find_keyword(latest_message, GAZETTE["caracteristicas"])
-        maridaje_txt = find_keyword(latest_message, GAZETTE["maridajes"])
+        # Una sola pasada del autómata; por categoría gana la coincidencia más larga
+        encontrados = GAZETTE_VIVO.actual().matcher.mejores(latest_message)
+        def find_keyword(categoria: str) -> Optional[str]:
+            keyword = encontrados.get(categoria)
+            return keyword.capitalize() if keyword else None
+        nota_sabor_txt = find_keyword("notas_sabor")
+        caracteristica_txt = find_keyword("caracteristicas")
+        maridaje_txt = find_keyword("maridajes")
         cepa = cepa_slot or preferencias_guardadas.get("cepa")
         tipo = tipo_slot or preferencias_guardadas.get("tipo_vino")
         valle = valle_slot or preferencias_guardadas.get("valle")
@@ -400,46 +567,35 @@ class ActionRecomendarVinoDb(Action):
         caracteristica = caracteristica_slot or caracteristica_txt or preferencias_guardadas.get("caracteristica")
         maridaje = maridaje_slot or maridaje_txt or preferencias_guardadas.get("maridaje")
         nota_sabor = nota_sabor_txt
-        if not any([cepa, tipo, valle, caracteristica, maridaje, nota_sabor, ano]):
+        pide_perfil = USAR_RANKING_VINOS and RankingVinos.perfil({}, {}, latest_message)
+        if not any([cepa, tipo, valle, caracteristica, maridaje, nota_sabor, ano]) and not pide_perfil:
             dispatcher.utter_message(response="utter_pedir_gusto")
             return []
+        criterios = dict(cepa=cepa, tipo=tipo, valle=valle, ano=ano,
+                         caracteristica=caracteristica, maridaje=maridaje, nota_sabor=nota_sabor)
         conn = None
+        relajados = ()
         try:
-            conn = _get_db_connection()
-            cursor = conn.cursor()
-            query = "SELECT DISTINCT v.id, v.nombre, v.cepa, v.ano, v.tipo, va.nombre, va.valle, v.link_compra FROM vinos v JOIN vinas va ON v.vina_id = va.id "
-            valores = []
-            if nota_sabor:
-                query += " JOIN vino_nota vn ON v.id = vn.vino_id JOIN notas_sabor ns ON vn.nota_id = ns.id"
-                query += " AND ns.nombre = %s"
-                valores.append(nota_sabor)
-            if caracteristica:
-                query += " JOIN vino_caracteristica vc ON v.id = vc.vino_id JOIN caracteristicas c ON vc.caracteristica_id = c.id"
-                query += " AND c.nombre = %s"
-                valores.append(caracteristica.capitalize())
-            if maridaje:
-                query += " JOIN vino_maridaje vm ON v.id = vm.vino_id JOIN maridajes m ON vm.maridaje_id = m.id"
-                query += " AND m.nombre = %s"
-                valores.append(maridaje.capitalize())
-            query += " WHERE 1=1" 
-            if cepa:
-                query += " AND v.cepa = %s"
-                valores.append(cepa.capitalize())
-            if tipo:
-                query += " AND v.tipo = %s"
-                valores.append(tipo.capitalize())
-            if valle:
-                query += " AND va.valle LIKE %s"
-                valores.append(f"%{valle}%")
-            if ano:
-                query += " AND v.ano = %s"
-                valores.append(ano)
-            query += " ORDER BY RAND() LIMIT 1;"
-            cursor.execute(query, tuple(valores))
-            resultado = cursor.fetchone()
+            if USAR_RANKING_VINOS:
+                # Lo guardado no filtra: solo suma puntaje (ver RankingVinos)
+                pedido = dict(cepa=cepa_slot, tipo=tipo_slot, valle=valle_slot, ano=ano_slot,
+                              caracteristica=caracteristica_slot or caracteristica_txt,
+                              maridaje=maridaje_slot or maridaje_txt, nota_sabor=nota_sabor_txt)
+                mejores = RANKING_VINOS.mejores(k=1, preferencias=preferencias_guardadas,
+                                                texto=latest_message, **pedido)
+                resultado = mejores[0].fila if mejores else None
+                relajados = mejores[0].relajados if mejores else ()
+            elif USAR_INDICE_VINOS:
+                resultado = INDICE_VINOS.elegir(**criterios)
+            else:
+                conn = _get_db_connection()
+                resultado = _elegir_vino_sql(conn, criterios)
             if resultado:
                 vino_id, vino_nombre, cepa, ano, tipo, vina_nombre, valle_nombre, link = resultado
                 respuesta_texto = f"¡Perfecto! Te recomiendo el vino **{vino_nombre}** ({cepa} {tipo}) del año **{ano}**, de Viña {vina_nombre} ({valle_nombre})."
+                if relajados:
+                    sin = ", ".join(NOMBRES_CRITERIOS.get(c, c) for c in relajados)
+                    respuesta_texto = f"No encontré un vino que cumpla con *todo* lo que pediste (no coincide {sin}), pero el más cercano es **{vino_nombre}** ({cepa} {tipo}) del año **{ano}**, de Viña {vina_nombre} ({valle_nombre})."
                 custom_payload = {"link": link, "link_text": f"Comprar {vino_nombre}"}
                 dispatcher.utter_message(text=respuesta_texto, json_message=custom_payload)
             else:
@@ -463,6 +619,7 @@ class ActionBuscarTour(Action):
     def name(self) -> Text: 
         return "action_buscar_tour"
 
+    @accion_no_bloqueante
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         # ... (Tu código de buscar tour va aquí, no necesita cambios) ...
         vina_solicitada_entidad = tracker.get_slot("slot_vina")
@@ -471,21 +628,15 @@ class ActionBuscarTour(Action):
         if vina_solicitada_entidad:
             vina_solicitada = vina_solicitada_entidad
         else:
-            for vina_db in GAZETTE["vinas"]:
-                if vina_db in latest_message:
-                    vina_solicitada = vina_db.capitalize()
-                    break
+            vina_db = GAZETTE_VIVO.actual().matcher.mejor(latest_message, "vinas")
+            if vina_db:
+                vina_solicitada = vina_db.capitalize()
         if not vina_solicitada:
             dispatcher.utter_message(text="¿Qué viña específica te gustaría visitar para un tour?")
             return [] 
-        conn = None
         try:
-            conn = _get_db_connection()
-            cursor = conn.cursor(dictionary=True) 
-            query = "SELECT nombre, descripcion_tour, horario_tour, link_web, latitud, longitud FROM vinas WHERE nombre LIKE %s AND descripcion_tour IS NOT NULL LIMIT 1;"
-            cursor.execute(query, (f"%{vina_solicitada}%",))
-            resultado = cursor.fetchone()
-            cursor.close()
+            vina = RESOLVER_VINAS.resolver(vina_solicitada)
+            resultado = CATALOGO_TOURS.buscar_por_id(vina.id) if vina else None
             if resultado:
                 nombre_vina = resultado.get("nombre")
                 desc_tour = resultado.get("descripcion_tour")
@@ -506,41 +657,49 @@ class ActionBuscarTour(Action):
         except mysql.connector.Error as err:
             print(f"Error de base de datos en ActionBuscarTour: {err}")
             dispatcher.utter_message(text="Tuvimos un problema al consultar la base de datos de tours. Por favor, inténtalo más tarde.")
-        finally:
-            if conn:
-                conn.close()
         return [SlotSet("slot_vina", None)] 
 
+# Recomendaciones de SIMILITUD_VINAS que se revisan antes de caer al tour al azar
+# (las de otro valle se saltan)
+RECOMENDACIONES_TOUR = 20
+
+def _tour_por_similitud(sender_id: Optional[str], valle: Optional[str]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """(tour, nombre de la viña que lo motiva) para un usuario con valoraciones; (None, None) si no hay."""
+    if not sender_id or not sender_id.startswith("user_"):
+        return None, None
+    buscado = normalizar(valle) if valle else None
+    for recomendacion in SIMILITUD_VINAS.recomendar(int(sender_id.split("_")[1]), k=RECOMENDACIONES_TOUR):
+        tour = CATALOGO_TOURS.buscar_por_id(recomendacion.vina_id)
+        if tour and (not buscado or buscado in normalizar(tour.get("valle"))):
+            semilla = CATALOGO_TOURS.buscar_por_id(recomendacion.semilla_id)
+            return tour, semilla.get("nombre") if semilla else None
+    return None, None
+
 class ActionRecomendarTourDb(Action):
     def name(self) -> Text: 
         return "action_recomendar_tour_db"
 
+    @accion_no_bloqueante
     def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
-        # ... (Tu código de recomendar tour va aquí, no necesita cambios) ...
         valle_deseado = tracker.get_slot("slot_valle")
-        conn = None
         try:
-            conn = _get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            base_query = "SELECT nombre, descripcion_tour, horario_tour, valle, link_web FROM vinas WHERE descripcion_tour IS NOT NULL"
-            valores = []
-            if valle_deseado:
-                base_query += " AND valle LIKE %s"
-                valores.append(f"%{valle_deseado}%")
-            base_query += " ORDER BY RAND() LIMIT 1;"
-            cursor.execute(base_query, tuple(valores))
-            resultado = cursor.fetchone()
-            cursor.close()
+            # Primero lo que les gustó a usuarios con gustos parecidos; si no
+            # hay (usuario anónimo o sin valoraciones), un tour al azar del valle
+            resultado, vina_semilla = _tour_por_similitud(tracker.sender_id, valle_deseado)
+            if resultado is None:
+                resultado = CATALOGO_TOURS.elegir(valle_deseado)
             if resultado:
                 nombre_vina = resultado.get("nombre")
                 desc_tour = resultado.get("descripcion_tour")
-                horario = resultado.get("horario")
+                horario = resultado.get("horario_tour")
                 valle = resultado.get("valle")
                 link = resultado.get("link_web")
                 mapa_url = VALLEY_MAPS.get(valle)
                 if mapa_url:
                     dispatcher.utter_message(image=mapa_url)
                 respuesta_texto = f"¡Tengo una excelente recomendación de tour! Puedes visitar la viña **{nombre_vina}** en el {valle}. El tour es: {desc_tour} (Horario: {horario})."
+                if vina_semilla:
+                    respuesta_texto = f"A quienes les gustó **{vina_semilla}** también les gustó la viña **{nombre_vina}** en el {valle}. El tour es: {desc_tour} (Horario: {horario})."
                 custom_payload = {"link": link, "link_text": f"Ver más sobre {nombre_vina}"}
                 dispatcher.utter_message(text=respuesta_texto, json_message=custom_payload)
             else:
@@ -548,7 +707,66 @@ class ActionRecomendarTourDb(Action):
         except mysql.connector.Error as err:
             print(f"Error de base de datos en ActionRecomendarTourDb: {err}")
             dispatcher.utter_message(text="Tuvimos un problema al consultar la base de datos de tours. Por favor, inténtalo más tarde.")
-        finally:
-            if conn:
-                conn.close()
-        return [SlotSet("slot_valle", None)]
\ No newline at end of file
+        return [SlotSet("slot_valle", None)]
+
+# === TOURS CERCANOS (índice espacial de CATALOGO_TOURS) ===
+TOURS_CERCANOS = 3        # Sin radio: los N más cercanos
+TOURS_EN_RADIO_MAX = 5    # Con radio ("a 20 km"): a lo más N, del más cercano al más lejano
+_RADIO_KM = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:km|kms|kil[oó]metros?)\b", re.IGNORECASE)
+
+def _ubicacion_de_mensaje(tracker: Tracker) -> Optional[tuple]:
+    """(latitud, longitud) enviada por el canal en la metadata del mensaje: {"ubicacion": {"latitud": .., "longitud": ..}}."""
+    ubicacion = (tracker.latest_message.get("metadata") or {}).get("ubicacion")
+    return coordenadas(ubicacion) if isinstance(ubicacion, dict) else None
+
+class ActionToursCercanos(Action):
+    """
+    Tours más cercanos a la ubicación del usuario (si el canal la envía en la
+    metadata) o a una viña mencionada ("tours cerca de Montes"). Si el mensaje
+    trae una distancia ("a 30 km") se limita a ese radio.
+    """
+    def name(self) -> Text:
+        return "action_tours_cercanos"
+
+    @accion_no_bloqueante
+    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+        latest_message = tracker.latest_message.get('text', '')
+        radio = _RADIO_KM.search(latest_message)
+        radio_km = float(radio.group(1).replace(",", ".")) if radio else None
+        try:
+            punto = _ubicacion_de_mensaje(tracker)
+            referencia, excluir = "tu ubicación", None
+            if punto is None:
+                vina_solicitada = tracker.get_slot("slot_vina") or GAZETTE_VIVO.actual().matcher.mejor(latest_message.lower(), "vinas")
+                vina = RESOLVER_VINAS.resolver(vina_solicitada) if vina_solicitada else None
+                tour = CATALOGO_TOURS.buscar_por_id(vina.id) if vina else None
+                punto = coordenadas(tour) if tour else None
+                if punto is None:
+                    if vina_solicitada:
+                        dispatcher.utter_message(text=f"No tengo la ubicación de **{vina_solicitada}**. Prueba con otra viña de referencia.")
+                    else:
+                        dispatcher.utter_message(text="Compárteme tu ubicación o dime una viña de referencia, por ejemplo: 'tours cerca de Santa Rita'.")
+                    return [SlotSet("slot_vina", None)]
+                referencia, excluir = f"**{tour['nombre']}**", tour["id"]
+            k = TOURS_EN_RADIO_MAX if radio_km is not None else TOURS_CERCANOS
+            cercanos = [(t, km) for t, km in CATALOGO_TOURS.cercanos(*punto, k=k + 1, radio_km=radio_km)
+                        if t["id"] != excluir][:k]
+            if not cercanos:
+                if radio_km is not None:
+                    dispatcher.utter_message(text=f"No encontré tours a menos de {radio_km:g} km de {referencia}. Prueba con una distancia mayor.")
+                else:
+                    dispatcher.utter_message(text="Lo siento, todavía no tengo tours con ubicación registrada.")
+                return [SlotSet("slot_vina", None)]
+            lineas = [f"- **{t['nombre']}** ({t.get('valle')}): a {km:.1f} km. {t.get('descripcion_tour')} (Horario: {t.get('horario_tour')})"
+                      for t, km in cercanos]
+            encabezado = f"Tours a menos de {radio_km:g} km de {referencia}:" if radio_km is not None else f"Los tours más cercanos a {referencia}:"
+            mas_cercano = cercanos[0][0]
+            custom_payload = {
+                "link": mas_cercano.get("link_web"), "link_text": f"Ver más sobre {mas_cercano['nombre']}",
+                "tours": [{"id": t["id"], "nombre": t["nombre"], "valle": t.get("valle"), "km": round(km, 1)} for t, km in cercanos],
+            }
+            dispatcher.utter_message(text="\n".join([encabezado] + lineas), json_message=custom_payload)
+        except mysql.connector.Error as err:
+            print(f"Error de base de datos en ActionToursCercanos: {err}")
+            dispatcher.utter_message(text="Tuvimos un problema al consultar la base de datos de tours. Por favor, inténtalo más tarde.")
+        return [SlotSet("slot_vina", None)]
@@ -0,0 +1,81 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from actions import metricas
+
+# --- Ejecución No Bloqueante de Trabajo de DB ---
+# mysql.connector es bloqueante. Para no frenar el event loop de rasa_sdk,
+# el trabajo de DB de cada acción corre en un ThreadPoolExecutor acotado (del
+# mismo tamaño que el pool de conexiones) y la acción espera el resultado con
+# `await`. Así las peticiones concurrentes al webhook solapan su I/O.
+# `accion_no_bloqueante` además registra la latencia y los errores de cada
+# acción, y cuánto esperó un hilo libre (ver actions/metricas).
+
+MAX_WORKERS_DEFAULT = 8
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def configurar(max_workers: int = MAX_WORKERS_DEFAULT) -> None:
+    """Fija el tamaño del executor. Llamar al arrancar, antes de la primera acción."""
+    global _executor
+    with _lock:
+        anterior, _executor = _executor, ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="vinai-db"
+        )
+    if anterior is not None:
+        anterior.shutdown(wait=False)
+
+
+def _obtener_executor() -> ThreadPoolExecutor:
+    if _executor is None:
+        configurar()
+    return _executor
+
+
+async def en_hilo_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Ejecuta `func` (bloqueante) en el executor de DB y espera su resultado sin bloquear el loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_obtener_executor(), functools.partial(func, *args, **kwargs))
+
+
+def accion_no_bloqueante(run: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Decorador para el `run` síncrono de una acción: lo convierte en corrutina que
+    corre el cuerpo original en el executor. rasa_sdk detecta la corrutina y la espera.
+    """
+    def medido(self, dispatcher, tracker, domain, encolada):
+        metricas.ESPERA_EXECUTOR.observar(time.perf_counter() - encolada)
+        return run(self, dispatcher, tracker, domain)
+
+    @functools.wraps(run)
+    async def envoltorio(self, dispatcher, tracker, domain):
+        inicio = time.perf_counter()
+        try:
+            return await en_hilo_db(medido, self, dispatcher, tracker, domain, inicio)
+        except Exception:
+            metricas.ERRORES_ACCION.incrementar(self.name())
+            raise
+        finally:
+            metricas.ACCIONES.observar(time.perf_counter() - inicio, self.name())
+    return envoltorio
+
+
+def accion_medida(run: Callable[..., Any]) -> Callable[..., Any]:
+    """Solo las métricas de `accion_no_bloqueante`, para acciones que ya son rápidas y corren en el loop."""
+    @functools.wraps(run)
+    def envoltorio(self, dispatcher, tracker, domain):
+        inicio = time.perf_counter()
+        try:
+            return run(self, dispatcher, tracker, domain)
+        except Exception:
+            metricas.ERRORES_ACCION.incrementar(self.name())
+            raise
+        finally:
+            metricas.ACCIONES.observar(time.perf_counter() - inicio, self.name())
+    return envoltorio
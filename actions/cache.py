@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# --- Caché LRU con TTL ---
+# Caché en memoria acotada por cantidad de entradas y con expiración por
+# tiempo. Segura para hilos y con contadores de aciertos para las estadísticas.
+
+_AUSENTE = object()
+
+
+class CacheTTL:
+    def __init__(self, max_entradas: int = 1024, ttl: Optional[float] = 60.0, nombre: str = "cache"):
+        """`ttl=None` desactiva la expiración por tiempo (solo LRU + invalidación)."""
+        if max_entradas < 1:
+            raise ValueError("max_entradas debe ser al menos 1.")
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.nombre = nombre
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expiradas = 0
+        self._evicciones = 0
+
+    def get(self, clave: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entrada = self._datos.get(clave, _AUSENTE)
+            if entrada is _AUSENTE:
+                self._misses += 1
+                return default
+            valor, expira = entrada
+            if expira is not None and expira <= time.monotonic():
+                del self._datos[clave]
+                self._expiradas += 1
+                self._misses += 1
+                return default
+            self._datos.move_to_end(clave)
+            self._hits += 1
+            return valor
+
+    def set(self, clave: Hashable, valor: Any) -> None:
+        expira = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self._evicciones += 1
+
+    def obtener_o_calcular(self, clave: Hashable, calcular: Callable[[], Any]) -> Any:
+        """Devuelve el valor en caché o lo calcula y guarda (si `calcular` no devuelve None)."""
+        valor = self.get(clave, _AUSENTE)
+        if valor is _AUSENTE:
+            valor = calcular()
+            if valor is not None:
+                self.set(clave, valor)
+        return valor
+
+    def modificar(self, clave: Hashable, funcion: Callable[[Any], Any]) -> bool:
+        """
+        Escritura directa (write-through): si la clave está vigente, reemplaza su
+        valor por `funcion(valor)` sin renovar el TTL ni contar como consulta.
+        """
+        with self._lock:
+            entrada = self._datos.get(clave, _AUSENTE)
+            if entrada is _AUSENTE:
+                return False
+            valor, expira = entrada
+            if expira is not None and expira <= time.monotonic():
+                return False
+            self._datos[clave] = (funcion(valor), expira)
+            return True
+
+    def invalidar(self, clave: Hashable = _AUSENTE) -> None:
+        """Borra una clave, o todo el caché si no se indica ninguna."""
+        with self._lock:
+            if clave is _AUSENTE:
+                self._datos.clear()
+            else:
+                self._datos.pop(clave, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self._hits + self._misses
+            return {
+                "nombre": self.nombre,
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / consultas, 4) if consultas else 0.0,
+                "expiradas": self._expiradas,
+                "evicciones": self._evicciones,
+            }
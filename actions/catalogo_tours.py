@@ -0,0 +1,123 @@
+import logging
+import random
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from actions import versiones
+from actions.indice_geo import IndiceGeo
+from actions.texto import normalizar
+
+# --- Catálogo de Tours en Memoria ---
+# Viñas con tour agrupadas por valle (una lista por valle) más un diccionario
+# por id. Recomendar un tour es elegir un índice al azar y buscar el tour de una
+# viña (resuelta por `ResolverVinas`) es un acceso al diccionario; la DB solo
+# se lee al (re)construir.
+#
+# Los tours con latitud/longitud válidas van además a un KD-tree (ver
+# actions/indice_geo.py) para "tours cerca de ..." sin calcular distancias
+# por fila.
+
+logger = logging.getLogger(__name__)
+
+TABLAS_TOURS = ("vinas",)
+
+QUERY_TOURS = """
+    SELECT id, nombre, descripcion_tour, horario_tour, valle, link_web, latitud, longitud
+    FROM vinas
+    WHERE descripcion_tour IS NOT NULL
+    ORDER BY id
+"""
+
+
+def coordenadas(tour: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """(latitud, longitud) del tour, o None si faltan o no son válidas."""
+    try:
+        latitud = float(str(tour.get("latitud")).replace(",", "."))
+        longitud = float(str(tour.get("longitud")).replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitud <= 90 and -180 <= longitud <= 180):
+        return None
+    return latitud, longitud
+
+
+class _EstadoTours:
+    def __init__(self, tours: List[Dict[str, Any]], version):
+        self.version = version
+        self.todos = tours
+        self.por_valle: Dict[str, List[Dict[str, Any]]] = {}
+        self.por_id: Dict[int, Dict[str, Any]] = {}
+        self.ubicados: List[Dict[str, Any]] = []   # Posición en el índice espacial -> tour
+        puntos = []
+        for tour in tours:
+            self.por_valle.setdefault(normalizar(tour.get("valle")), []).append(tour)
+            self.por_id[tour["id"]] = tour
+            punto = coordenadas(tour)
+            if punto:
+                self.ubicados.append(tour)
+                puntos.append(punto)
+        self.geo = IndiceGeo(puntos)
+
+
+class CatalogoTours:
+    """Caché de tours para ActionRecomendarTourDb y ActionBuscarTour."""
+
+    def __init__(self, get_connection: Callable[[], Any]):
+        self._get_connection = get_connection
+        self._estado: Optional[_EstadoTours] = None
+        self._lock = threading.Lock()
+
+    def refrescar(self) -> None:
+        version = versiones.versiones(TABLAS_TOURS)
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(QUERY_TOURS)
+            tours = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+        self._estado = _EstadoTours(tours, version)
+        logger.debug(f"CatalogoTours: {len(tours)} tours en {len(self._estado.por_valle)} valles "
+                     f"({len(self._estado.ubicados)} con coordenadas).")
+
+    def asegurar_vigente(self) -> _EstadoTours:
+        estado = self._estado
+        if estado is not None and estado.version == versiones.versiones(TABLAS_TOURS):
+            return estado
+        with self._lock:
+            estado = self._estado
+            if estado is None or estado.version != versiones.versiones(TABLAS_TOURS):
+                self.refrescar()
+            return self._estado
+
+    def elegir(self, valle: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Un tour al azar; con `valle`, entre los valles que lo contienen (como `LIKE '%valle%'`)."""
+        estado = self.asegurar_vigente()
+        if not valle:
+            return random.choice(estado.todos) if estado.todos else None
+        buscado = normalizar(valle)
+        exacto = estado.por_valle.get(buscado)
+        if exacto:
+            return random.choice(exacto)
+        grupos = [tours for nombre_valle, tours in estado.por_valle.items() if buscado in nombre_valle]
+        total = sum(len(tours) for tours in grupos)
+        if not total:
+            return None
+        # Elección uniforme sobre la unión de los valles sin concatenar las listas
+        indice = random.randrange(total)
+        for tours in grupos:
+            if indice < len(tours):
+                return tours[indice]
+            indice -= len(tours)
+        return None
+
+    def buscar_por_id(self, vina_id: int) -> Optional[Dict[str, Any]]:
+        """Tour de una viña ya resuelta (ver `ResolverVinas`); None si la viña no tiene tour."""
+        return self.asegurar_vigente().por_id.get(vina_id)
+
+    def cercanos(self, latitud: float, longitud: float, k: int = 5,
+                 radio_km: Optional[float] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """(tour, km) de los `k` tours más cercanos al punto (con `radio_km`, solo los que están dentro)."""
+        estado = self.asegurar_vigente()
+        return [(estado.ubicados[i], km) for i, km in estado.geo.cercanos(latitud, longitud, k, radio_km)]
@@ -0,0 +1,76 @@
+from typing import Dict, Tuple
+
+# --- Consultas SQL Compartidas ---
+# Las consultas que el bot y el panel emiten en cada turno o vista, en un
+# módulo sin efectos secundarios para que los benchmarks
+# (benchmarks/bench_consultas.py) midan exactamente la misma forma de SQL.
+
+QUERY_PREFERENCIAS = "SELECT tipo_preferencia, valor_preferencia FROM preferencias_usuario WHERE usuario_id = %s"
+
+# Agregados del dashboard de admin_panel()
+QUERIES_DASHBOARD: Dict[str, str] = {
+    "top_preferencias": """
+        SELECT tipo_preferencia, valor_preferencia, COUNT(*) as total
+        FROM preferencias_usuario
+        GROUP BY tipo_preferencia, valor_preferencia
+        ORDER BY total DESC
+        LIMIT 5;
+    """,
+    "top_tours": """
+        SELECT v.nombre, AVG(vt.rating) as avg_rating, COUNT(vt.id) as total_ratings
+        FROM valoraciones_tour vt
+        JOIN vinas v ON vt.vina_id = v.id
+        GROUP BY v.nombre
+        ORDER BY avg_rating DESC, total_ratings DESC
+        LIMIT 5;
+    """,
+    "recent_valoraciones": """
+        SELECT v.nombre as vina_nombre, u.username, vt.rating
+        FROM valoraciones_tour vt
+        JOIN vinas v ON vt.vina_id = v.id
+        JOIN usuarios u ON vt.usuario_id = u.id
+        ORDER BY vt.fecha_valoracion DESC
+        LIMIT 5;
+    """,
+}
+
+# Filtros opcionales de la recomendación de vinos, en el orden de la firma
+FILTROS_RECOMENDACION = ("cepa", "tipo", "valle", "ano", "caracteristica", "maridaje", "nota_sabor")
+
+
+def consulta_recomendacion(cepa=None, tipo=None, valle=None, ano=None,
+                           caracteristica=None, maridaje=None, nota_sabor=None) -> Tuple[str, Tuple]:
+    """
+    Consulta de ActionRecomendarVinoDb cuando USAR_RANKING_VINOS y
+    USAR_INDICE_VINOS están desactivados: un vino al azar entre los que
+    cumplen los criterios, en el orden de FilaVino (actions/indice_vinos.py).
+    """
+    query = "SELECT DISTINCT v.id, v.nombre, v.cepa, v.ano, v.tipo, va.nombre, va.valle, v.link_compra FROM vinos v JOIN vinas va ON v.vina_id = va.id "
+    valores = []
+    if nota_sabor:
+        query += " JOIN vino_nota vn ON v.id = vn.vino_id JOIN notas_sabor ns ON vn.nota_id = ns.id"
+        query += " AND ns.nombre = %s"
+        valores.append(nota_sabor)
+    if caracteristica:
+        query += " JOIN vino_caracteristica vc ON v.id = vc.vino_id JOIN caracteristicas c ON vc.caracteristica_id = c.id"
+        query += " AND c.nombre = %s"
+        valores.append(caracteristica.capitalize())
+    if maridaje:
+        query += " JOIN vino_maridaje vm ON v.id = vm.vino_id JOIN maridajes m ON vm.maridaje_id = m.id"
+        query += " AND m.nombre = %s"
+        valores.append(maridaje.capitalize())
+    query += " WHERE 1=1"
+    if cepa:
+        query += " AND v.cepa = %s"
+        valores.append(cepa.capitalize())
+    if tipo:
+        query += " AND v.tipo = %s"
+        valores.append(tipo.capitalize())
+    if valle:
+        query += " AND va.valle LIKE %s"
+        valores.append(f"%{valle}%")
+    if ano:
+        query += " AND v.ano = %s"
+        valores.append(ano)
+    query += " ORDER BY RAND() LIMIT 1;"
+    return query, tuple(valores)
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from actions import metricas
+
+# --- Registro de Consultas Lentas ---
+# El pool llama a `observar` después de cada `execute` (ver
+# `ConnectionPool.observador`). Cada consulta se reduce a su forma (literales
+# y parámetros como "?", espacios colapsados) y a una huella corta de esa
+# forma: ActionRecomendarVinoDb arma una consulta distinta por cada
+# combinación de filtros, y la huella dice cuál de ellas es la lenta.
+#
+# La duración de cada forma va al histograma `vinai_db_forma_segundos`. Las
+# que superan `umbral_ms` se encolan y un hilo aparte las escribe en un JSONL
+# rotativo (logs/consultas_lentas.jsonl) con los tipos de los parámetros
+# (nunca sus valores: hay emails y hashes) y, como mucho una vez cada
+# `intervalo_explain` por huella, el EXPLAIN de esa misma consulta. Si la cola
+# se llena las entradas se descartan: el registro nunca frena a las acciones.
+#
+# El panel admin lee el archivo con `leer` y `resumir`; `firma` le dice si
+# cambió desde la última lectura.
+
+logger = logging.getLogger(__name__)
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_DEFAULT = os.path.join(PROJECT_PATH, "logs", "consultas_lentas.jsonl")
+
+UMBRAL_MS_DEFAULT = 100.0
+INTERVALO_EXPLAIN_DEFAULT = 300.0   # Segundos entre dos EXPLAIN de la misma forma
+MAX_PENDIENTES_DEFAULT = 100
+LOG_MAX_BYTES = 2 * 1024 * 1024
+LOG_RESPALDOS = 2
+
+# Sentencias para las que MySQL/MariaDB aceptan EXPLAIN (sin ejecutarlas)
+VERBOS_EXPLICABLES = ("select", "insert", "update", "delete", "replace")
+
+_COMENTARIOS = re.compile(r"/\*.*?\*/|--[^\n]*", re.DOTALL)
+_TEXTOS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_PARAMETROS = re.compile(r"%\(\w+\)s|%s|\?")
+_NUMEROS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def huella_consulta(sql: str) -> Tuple[str, str]:
+    """(huella, forma): la forma normalizada de la consulta y un hash corto de ella."""
+    forma = _COMENTARIOS.sub(" ", sql)
+    forma = _TEXTOS.sub("?", forma)
+    forma = _PARAMETROS.sub("?", forma)
+    forma = _NUMEROS.sub("?", forma)
+    forma = _LISTAS.sub("(?+)", forma)
+    forma = _ESPACIOS.sub(" ", forma).strip().rstrip(";").strip()
+    return hashlib.sha1(forma.lower().encode("utf-8")).hexdigest()[:12], forma
+
+
+def tipos_parametros(params: Any) -> Any:
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {clave: type(valor).__name__ for clave, valor in params.items()}
+    return [type(valor).__name__ for valor in params]
+
+
+class RegistroConsultasLentas:
+    def __init__(self, get_connection: Callable[[], Any], ruta: str = RUTA_DEFAULT,
+                 umbral_ms: float = UMBRAL_MS_DEFAULT,
+                 intervalo_explain: float = INTERVALO_EXPLAIN_DEFAULT,
+                 max_pendientes: int = MAX_PENDIENTES_DEFAULT):
+        self._get_connection = get_connection
+        self.ruta = ruta
+        self.umbral_ms = umbral_ms
+        self.intervalo_explain = intervalo_explain
+        self._pendientes: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_pendientes)
+        self._ultimo_explain: Dict[str, float] = {}
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._archivo: Optional[logging.Logger] = None
+        self._stats = {"observadas": 0, "lentas": 0, "explicadas": 0, "descartadas": 0, "errores_explain": 0}
+
+    # --- Camino caliente (hilo de la acción) ---
+
+    def observar(self, sql: str, params: Any, segundos: float) -> None:
+        if sql.lstrip()[:7].lower() == "explain":
+            return
+        huella, forma = huella_consulta(sql)
+        metricas.FORMAS.observar(segundos, huella)
+        with self._lock:
+            self._stats["observadas"] += 1
+            if segundos * 1000 < self.umbral_ms:
+                return
+            self._stats["lentas"] += 1
+            ahora = time.time()
+            explicar = (sql.lstrip()[:7].lower().startswith(VERBOS_EXPLICABLES)
+                        and ahora - self._ultimo_explain.get(huella, 0.0) >= self.intervalo_explain)
+            if explicar:
+                self._ultimo_explain[huella] = ahora
+        entrada = {
+            "ts": round(ahora, 3),
+            "huella": huella,
+            "ms": round(segundos * 1000, 2),
+            "forma": forma,
+            "tipos_parametros": tipos_parametros(params),
+            # Solo viajan al hilo de escritura; no se guardan
+            "_sql": sql if explicar else None,
+            "_params": params if explicar else None,
+        }
+        try:
+            self._pendientes.put_nowait(entrada)
+        except queue.Full:
+            with self._lock:
+                self._stats["descartadas"] += 1
+                if explicar:
+                    # Que el próximo lento de esta forma vuelva a intentarlo
+                    self._ultimo_explain.pop(huella, None)
+
+    # --- Hilo de escritura ---
+
+    def iniciar(self) -> None:
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._archivo = self._crear_log_archivo()
+        self._hilo = threading.Thread(target=self._bucle, name="consultas-lentas", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5.0) -> None:
+        if self._hilo is None:
+            return
+        try:
+            self._pendientes.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._hilo.join(timeout)
+        self._hilo = None
+
+    def _crear_log_archivo(self) -> logging.Logger:
+        archivo = logging.getLogger(f"{__name__}.archivo")
+        archivo.propagate = False
+        archivo.setLevel(logging.INFO)
+        if not archivo.handlers:
+            try:
+                os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+                handler = RotatingFileHandler(self.ruta, maxBytes=LOG_MAX_BYTES, backupCount=LOG_RESPALDOS,
+                                              encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                archivo.addHandler(handler)
+            except OSError as e:
+                logger.error(f"No se pudo abrir el registro de consultas lentas: {e}")
+        return archivo
+
+    def _bucle(self) -> None:
+        while True:
+            entrada = self._pendientes.get()
+            if entrada is None:
+                break
+            sql, params = entrada.pop("_sql"), entrada.pop("_params")
+            if sql is not None:
+                entrada["explain"] = self._explicar(sql, params, entrada)
+            try:
+                self._archivo.info(json.dumps(entrada, ensure_ascii=False, default=str))
+            except Exception as e:
+                logger.error(f"No se pudo escribir una consulta lenta: {e}")
+
+    def _explicar(self, sql: str, params: Any, entrada: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        try:
+            conn = self._get_connection()
+            try:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute("EXPLAIN " + sql.strip().rstrip(";"), params)
+                plan = cursor.fetchall()
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            with self._lock:
+                self._stats["errores_explain"] += 1
+            entrada["explain_error"] = str(e)
+            return None
+        with self._lock:
+            self._stats["explicadas"] += 1
+        return plan
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            datos = dict(self._stats)
+            datos["formas_explicadas"] = len(self._ultimo_explain)
+        datos["pendientes"] = self._pendientes.qsize()
+        datos["umbral_ms"] = self.umbral_ms
+        return datos
+
+
+# --- Lectura (panel admin) ---
+
+def firma(ruta: str = RUTA_DEFAULT) -> Tuple[Tuple[int, int], ...]:
+    """(mtime_ns, tamaño) del log y sus rotados: cambia cada vez que se escribe o rota."""
+    datos = []
+    for i in range(LOG_RESPALDOS + 1):
+        try:
+            st = os.stat(ruta if i == 0 else f"{ruta}.{i}")
+        except OSError:
+            datos.append((0, -1))
+            continue
+        datos.append((st.st_mtime_ns, st.st_size))
+    return tuple(datos)
+
+
+def leer(ruta: str = RUTA_DEFAULT, n: int = 500) -> List[Dict[str, Any]]:
+    """Las últimas `n` entradas (más nuevas primero), incluidos los archivos rotados."""
+    entradas: List[Dict[str, Any]] = []
+    for i in range(LOG_RESPALDOS + 1):
+        archivo = ruta if i == 0 else f"{ruta}.{i}"
+        try:
+            with open(archivo, encoding="utf-8") as f:
+                lineas = f.readlines()
+        except OSError:
+            continue
+        for linea in reversed(lineas):
+            try:
+                entradas.append(json.loads(linea))
+            except ValueError:
+                continue
+            if len(entradas) >= n:
+                return entradas
+    return entradas
+
+
+def resumir(entradas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Agrupa por huella (la más lenta primero) con su último EXPLAIN."""
+    formas: Dict[str, Dict[str, Any]] = {}
+    for e in entradas:
+        r = formas.get(e["huella"])
+        if r is None:
+            r = formas[e["huella"]] = {
+                "huella": e["huella"], "forma": e["forma"], "veces": 0, "max_ms": 0.0, "total_ms": 0.0,
+                "ultima": e["ts"], "tipos_parametros": e.get("tipos_parametros"), "explain": None,
+                "explain_error": None,
+            }
+        r["veces"] += 1
+        r["total_ms"] += e["ms"]
+        r["max_ms"] = max(r["max_ms"], e["ms"])
+        if r["explain"] is None and r["explain_error"] is None and ("explain" in e):
+            r["explain"], r["explain_error"] = e["explain"], e.get("explain_error")
+    for r in formas.values():
+        r["promedio_ms"] = round(r.pop("total_ms") / r["veces"], 2)
+    return sorted(formas.values(), key=lambda r: r["max_ms"], reverse=True)
@@ -0,0 +1,321 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import mysql.connector
+from mysql.connector import errors as mysql_errors
+
+from actions import metricas
+
+# --- Pool de Conexiones Compartido (Servidor de Acciones y Panel Admin) ---
+# Cada proceso crea su propio pool con `crear_pool()`; las conexiones se
+# reutilizan entre turnos/peticiones en vez de abrir un socket nuevo cada vez.
+# Los cursores que entrega el pool miden cada `execute` (ver actions/metricas).
+
+# Configuración de MySQL compartida por el servidor de acciones, el panel y las
+# herramientas de línea de comandos (importación, migraciones, catálogo del NLU).
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+    'database': 'vinai_db_normalizada'
+}
+
+POOL_SIZE_DEFAULT = 5
+POOL_TIMEOUT_DEFAULT = 5.0          # Segundos máximos esperando una conexión libre
+HEALTH_CHECK_INTERVAL_DEFAULT = 30.0  # Ping solo si la conexión estuvo ociosa más que esto
+MAX_LIFETIME_DEFAULT = 3600.0       # Reciclar conexiones más viejas que esto
+
+
+class _ConexionIdle:
+    """Conexión física guardada en el pool junto a sus marcas de tiempo."""
+    __slots__ = ("raw", "creada_en", "devuelta_en")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.creada_en = time.monotonic()
+        self.devuelta_en = self.creada_en
+
+
+class _CursorMedido:
+    """Cursor que registra la duración y los errores de cada consulta por etiqueta (verbo:tabla)."""
+
+    def __init__(self, raw, pool: "ConnectionPool"):
+        self._raw = raw
+        self._pool = pool
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._raw, attr)
+
+    def _medir(self, metodo: str, operation: str, muestra: Any, *args, **kwargs) -> Any:
+        """Ejecuta `metodo`; el observador recibe `operation` con `muestra` como parámetros."""
+        etiqueta = metricas.etiqueta_consulta(operation)
+        inicio = time.perf_counter()
+        try:
+            resultado = getattr(self._raw, metodo)(operation, *args, **kwargs)
+        except mysql_errors.Error as e:
+            metricas.ERRORES_DB.incrementar(self._pool.nombre, etiqueta, e.errno or 0)
+            metricas.CONSULTAS.observar(time.perf_counter() - inicio, self._pool.nombre, etiqueta)
+            raise
+        segundos = time.perf_counter() - inicio
+        metricas.CONSULTAS.observar(segundos, self._pool.nombre, etiqueta)
+        observador = self._pool.observador
+        if observador is not None:
+            try:
+                observador(operation, muestra, segundos)
+            except Exception:
+                pass
+        return resultado
+
+    def execute(self, operation: str, *args, **kwargs) -> Any:
+        return self._medir("execute", operation, args[0] if args else kwargs.get("params"), *args, **kwargs)
+
+    def executemany(self, operation: str, seq_params, *args, **kwargs) -> Any:
+        # Todas las filas comparten la forma de `operation`: al observador (tipos
+        # de parámetros, EXPLAIN) le basta la primera.
+        filas = seq_params if isinstance(seq_params, (list, tuple)) else list(seq_params)
+        return self._medir("executemany", operation, filas[0] if filas else None, filas, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __enter__(self) -> "_CursorMedido":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._raw.close()
+
+
+class PooledConnection:
+    """
+    Envoltorio de una conexión del pool. Se usa igual que una conexión de
+    mysql.connector, pero `close()` la devuelve al pool en vez de cerrarla.
+    """
+
+    def __init__(self, pool: "ConnectionPool", item: _ConexionIdle):
+        self._pool = pool
+        self._item = item
+
+    def __getattr__(self, attr: str) -> Any:
+        if self._item is None:
+            raise mysql_errors.OperationalError("La conexión ya fue devuelta al pool.")
+        return getattr(self._item.raw, attr)
+
+    def cursor(self, *args, **kwargs) -> _CursorMedido:
+        if self._item is None:
+            raise mysql_errors.OperationalError("La conexión ya fue devuelta al pool.")
+        return _CursorMedido(self._item.raw.cursor(*args, **kwargs), self._pool)
+
+    def close(self) -> None:
+        if self._item is not None:
+            item, self._item = self._item, None
+            self._pool._devolver(item)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __del__(self):
+        # Red de seguridad: si alguien olvida cerrar, la conexión vuelve al pool.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones MySQL seguro para hilos.
+
+    - `size`: máximo de conexiones físicas abiertas al mismo tiempo.
+    - `timeout`: segundos que se espera una conexión libre antes de fallar
+      con `PoolError` (cuenta como agotamiento en las estadísticas).
+    - Health-check al sacar una conexión ociosa y reconexión si el socket murió.
+    """
+
+    def __init__(self, db_config: Dict[str, Any], size: int = POOL_SIZE_DEFAULT,
+                 timeout: float = POOL_TIMEOUT_DEFAULT,
+                 health_check_interval: float = HEALTH_CHECK_INTERVAL_DEFAULT,
+                 max_lifetime: float = MAX_LIFETIME_DEFAULT,
+                 nombre: str = "vinai"):
+        if size < 1:
+            raise ValueError("El tamaño del pool debe ser al menos 1.")
+        self.db_config = dict(db_config)
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_lifetime = max_lifetime
+        self.nombre = nombre
+        # Opcional: observador(sql, params, segundos) tras cada execute exitoso
+        # (p. ej. RegistroConsultasLentas.observar). Corre en el hilo de la consulta.
+        self.observador: Optional[Callable[[str, Any, float], None]] = None
+
+        self._idle: List[_ConexionIdle] = []
+        self._abiertas = 0
+        self._cond = threading.Condition(threading.Lock())
+
+        # Contadores (protegidos por self._cond)
+        self._stats = {
+            "checkouts": 0,
+            "creadas": 0,
+            "esperas": 0,
+            "tiempo_espera_total": 0.0,
+            "tiempo_espera_max": 0.0,
+            "agotamientos": 0,
+            "health_checks": 0,
+            "reconexiones": 0,
+            "descartadas": 0,
+        }
+
+    # --- API pública ---
+    def get_connection(self) -> PooledConnection:
+        """Saca una conexión del pool (esperando hasta `timeout` si está lleno)."""
+        inicio = time.monotonic()
+        resultado = "error"
+        try:
+            conexion = self._obtener(inicio)
+            resultado = "ok"
+            return conexion
+        except mysql_errors.PoolError:
+            resultado = "agotado"
+            raise
+        finally:
+            metricas.OBTENER_CONEXION.observar(time.monotonic() - inicio, self.nombre, resultado)
+
+    def _obtener(self, inicio: float) -> PooledConnection:
+        item = None
+        crear = False
+        with self._cond:
+            esperado = False
+            while True:
+                if self._idle:
+                    item = self._idle.pop()
+                    break
+                if self._abiertas < self.size:
+                    self._abiertas += 1
+                    crear = True
+                    break
+                restante = self.timeout - (time.monotonic() - inicio)
+                if restante <= 0:
+                    self._stats["agotamientos"] += 1
+                    self._registrar_espera(time.monotonic() - inicio)
+                    raise mysql_errors.PoolError(
+                        f"Pool '{self.nombre}' agotado: {self.size} conexiones en uso "
+                        f"tras esperar {self.timeout:.1f}s."
+                    )
+                esperado = True
+                self._cond.wait(restante)
+            if esperado:
+                self._registrar_espera(time.monotonic() - inicio)
+            self._stats["checkouts"] += 1
+
+        if crear:
+            try:
+                item = _ConexionIdle(self._conectar())
+            except Exception:
+                self._liberar_cupo()
+                raise
+            with self._cond:
+                self._stats["creadas"] += 1
+        else:
+            item = self._verificar(item)
+        return PooledConnection(self, item)
+
+    def stats(self) -> Dict[str, Any]:
+        """Copia de los contadores del pool, más el estado actual."""
+        with self._cond:
+            datos = dict(self._stats)
+            datos["size"] = self.size
+            datos["abiertas"] = self._abiertas
+            datos["ociosas"] = len(self._idle)
+            datos["en_uso"] = self._abiertas - len(self._idle)
+        return datos
+
+    def close_all(self) -> None:
+        """Cierra todas las conexiones ociosas (las que están en uso se cierran al devolverse)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._abiertas -= len(idle)
+            self._cond.notify_all()
+        for item in idle:
+            self._cerrar_raw(item.raw)
+
+    # --- Internos ---
+    def _conectar(self):
+        return mysql.connector.connect(**self.db_config)
+
+    def _registrar_espera(self, segundos: float) -> None:
+        self._stats["esperas"] += 1
+        self._stats["tiempo_espera_total"] += segundos
+        if segundos > self._stats["tiempo_espera_max"]:
+            self._stats["tiempo_espera_max"] = segundos
+
+    def _liberar_cupo(self) -> None:
+        with self._cond:
+            self._abiertas -= 1
+            self._cond.notify()
+
+    def _verificar(self, item: _ConexionIdle) -> _ConexionIdle:
+        """Health-check de una conexión ociosa; la recicla o reconecta si hace falta."""
+        ahora = time.monotonic()
+        try:
+            if ahora - item.creada_en > self.max_lifetime:
+                self._cerrar_raw(item.raw)
+                with self._cond:
+                    self._stats["reconexiones"] += 1
+                return _ConexionIdle(self._conectar())
+            if ahora - item.devuelta_en > self.health_check_interval:
+                with self._cond:
+                    self._stats["health_checks"] += 1
+                try:
+                    item.raw.ping(reconnect=False)
+                except mysql_errors.Error:
+                    # Socket viejo (p. ej. wait_timeout del servidor): reconectamos.
+                    self._cerrar_raw(item.raw)
+                    with self._cond:
+                        self._stats["reconexiones"] += 1
+                    return _ConexionIdle(self._conectar())
+            return item
+        except Exception:
+            self._liberar_cupo()
+            raise
+
+    def _devolver(self, item: _ConexionIdle) -> None:
+        """Deja la conexión limpia (sin resultados pendientes ni transacción abierta) y la devuelve."""
+        raw = item.raw
+        sana = True
+        try:
+            if raw.unread_result:
+                raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            sana = False
+
+        if not sana:
+            self._cerrar_raw(raw)
+            with self._cond:
+                self._stats["descartadas"] += 1
+                self._abiertas -= 1
+                self._cond.notify()
+            return
+
+        item.devuelta_en = time.monotonic()
+        with self._cond:
+            self._idle.append(item)
+            self._cond.notify()
+
+    @staticmethod
+    def _cerrar_raw(raw) -> None:
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+def crear_pool(db_config: Dict[str, Any], size: int = POOL_SIZE_DEFAULT,
+               timeout: float = POOL_TIMEOUT_DEFAULT, nombre: str = "vinai") -> ConnectionPool:
+    """Crea el pool de un proceso. Las conexiones se abren bajo demanda."""
+    return ConnectionPool(db_config, size=size, timeout=timeout, nombre=nombre)
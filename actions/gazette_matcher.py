@@ -0,0 +1,115 @@
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# --- Matcher Aho-Corasick para los Gazettes ---
+# Compila todas las palabras clave (sabores, maridajes, características,
+# viñas) en un solo autómata. Un mensaje se recorre una sola vez y se obtienen
+# todas las apariciones, respetando límites de palabra y sin importar tildes.
+
+
+class Coincidencia(NamedTuple):
+    categoria: str
+    palabra: str   # Entrada del gazette tal como viene de la DB (en minúsculas)
+    inicio: int
+    fin: int       # Exclusivo
+
+    @property
+    def largo(self) -> int:
+        return self.fin - self.inicio
+
+
+def _plegar_caracter(c: str) -> str:
+    """Minúscula y sin tilde, siempre de un solo carácter para no mover posiciones."""
+    bajo = c.lower()
+    if len(bajo) != 1:
+        bajo = c
+    base = unicodedata.normalize("NFD", bajo)[0]
+    return base
+
+
+def plegar(texto: str) -> str:
+    return "".join(_plegar_caracter(c) for c in texto)
+
+
+def _es_limite(texto: str, pos: int) -> bool:
+    return pos < 0 or pos >= len(texto) or not texto[pos].isalnum()
+
+
+class GazetteMatcher:
+    """Autómata multi-patrón construido a partir de `_load_gazettes_from_db()`."""
+
+    def __init__(self, gazettes: Dict[str, Iterable[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._salidas: List[List[Tuple[str, str, int]]] = [[]]
+        self.total_palabras = 0
+
+        for categoria, palabras in gazettes.items():
+            for palabra in palabras:
+                if palabra:
+                    self._agregar(categoria, palabra)
+        self._construir_fallos()
+
+    def _agregar(self, categoria: str, palabra: str) -> None:
+        clave = plegar(palabra.strip())
+        if not clave:
+            return
+        nodo = 0
+        for c in clave:
+            siguiente = self._goto[nodo].get(c)
+            if siguiente is None:
+                siguiente = len(self._goto)
+                self._goto[nodo][c] = siguiente
+                self._goto.append({})
+                self._fail.append(0)
+                self._salidas.append([])
+            nodo = siguiente
+        self._salidas[nodo].append((categoria, palabra, len(clave)))
+        self.total_palabras += 1
+
+    def _construir_fallos(self) -> None:
+        cola = deque(self._goto[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for c, hijo in self._goto[nodo].items():
+                cola.append(hijo)
+                f = self._fail[nodo]
+                while f and c not in self._goto[f]:
+                    f = self._fail[f]
+                destino = self._goto[f].get(c, 0)
+                self._fail[hijo] = destino if destino != hijo else 0
+                # Las salidas del sufijo más largo también terminan aquí
+                self._salidas[hijo] = self._salidas[hijo] + self._salidas[self._fail[hijo]]
+
+    def buscar(self, texto: str) -> List[Coincidencia]:
+        """Todas las apariciones (pueden solaparse) que caen en límites de palabra."""
+        plegado = plegar(texto)
+        goto, fail, salidas = self._goto, self._fail, self._salidas
+        encontradas = []
+        nodo = 0
+        for i, c in enumerate(plegado):
+            while nodo and c not in goto[nodo]:
+                nodo = fail[nodo]
+            nodo = goto[nodo].get(c, 0)
+            if salidas[nodo]:
+                fin = i + 1
+                if not _es_limite(plegado, fin):
+                    continue
+                for categoria, palabra, largo in salidas[nodo]:
+                    inicio = fin - largo
+                    if _es_limite(plegado, inicio - 1):
+                        encontradas.append(Coincidencia(categoria, palabra, inicio, fin))
+        return encontradas
+
+    def mejores(self, texto: str) -> Dict[str, str]:
+        """La mejor coincidencia por categoría: la más larga y, si empatan, la primera."""
+        mejor: Dict[str, Coincidencia] = {}
+        for m in self.buscar(texto):
+            actual = mejor.get(m.categoria)
+            if actual is None or m.largo > actual.largo or (m.largo == actual.largo and m.inicio < actual.inicio):
+                mejor[m.categoria] = m
+        return {categoria: m.palabra for categoria, m in mejor.items()}
+
+    def mejor(self, texto: str, categoria: str) -> Optional[str]:
+        return self.mejores(texto).get(categoria)
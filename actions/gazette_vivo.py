@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from actions import versiones
+from actions.gazette_matcher import GazetteMatcher
+
+# --- GAZETTE Recargable en Caliente ---
+# Foto versionada de los gazettes + su autómata. Se reemplaza completa (una
+# sola asignación) cuando cambia alguna tabla, recargando solo esas tablas.
+# Detección de cambios:
+#   1. Marcadores de `actions.versiones` (un `stat`, en cada uso).
+#   2. Huella en la DB (COUNT, MAX(id), CRC de nombres) cada `intervalo_huella`
+#      segundos, para cambios hechos fuera del panel (phpMyAdmin, scripts).
+
+logger = logging.getLogger(__name__)
+
+# Categoría del gazette -> tabla con la columna `nombre`
+CATEGORIAS_GAZETTE = {
+    "notas_sabor": "notas_sabor",
+    "maridajes": "maridajes",
+    "caracteristicas": "caracteristicas",
+    "vinas": "vinas",
+}
+
+INTERVALO_HUELLA = 30.0
+INTERVALO_REINTENTO = 5.0
+
+
+def cargar_categorias(get_connection: Callable[[], Any], categorias: Iterable[str]) -> Dict[str, List[str]]:
+    """Lee los nombres de las tablas pedidas (en minúsculas). Propaga errores de DB."""
+    resultado = {}
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        for categoria in categorias:
+            cursor.execute(f"SELECT nombre FROM {CATEGORIAS_GAZETTE[categoria]}")
+            resultado[categoria] = [row[0].lower() for row in cursor.fetchall() if row[0]]
+        cursor.close()
+    finally:
+        conn.close()
+    return resultado
+
+
+def huellas_db(get_connection: Callable[[], Any]) -> Dict[str, Tuple]:
+    """Huella barata de cada tabla del gazette en una sola consulta."""
+    partes = [
+        f"SELECT '{categoria}', COUNT(*), MAX(id), BIT_XOR(CRC32(nombre)) FROM {tabla}"
+        for categoria, tabla in CATEGORIAS_GAZETTE.items()
+    ]
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(" UNION ALL ".join(partes))
+        filas = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+    return {fila[0]: tuple(fila[1:]) for fila in filas}
+
+
+class FotoGazette:
+    """Estado inmutable publicado a los lectores."""
+
+    def __init__(self, version: int, gazettes: Dict[str, List[str]],
+                 marcadores: Dict[str, int], huellas: Dict[str, Tuple]):
+        self.version = version
+        self.gazettes = gazettes
+        self.marcadores = marcadores
+        self.huellas = huellas
+        self.matcher = GazetteMatcher(gazettes)
+
+
+class GazetteVivo:
+    def __init__(self, get_connection: Callable[[], Any],
+                 intervalo_huella: float = INTERVALO_HUELLA):
+        self._get_connection = get_connection
+        self.intervalo_huella = intervalo_huella
+        self._lock = threading.Lock()
+        self._foto = FotoGazette(0, {c: [] for c in CATEGORIAS_GAZETTE}, {}, {})
+        self._ultima_huella = 0.0
+        self._ultimo_error = 0.0
+
+    @property
+    def gazettes(self) -> Dict[str, List[str]]:
+        return self._foto.gazettes
+
+    def actual(self) -> FotoGazette:
+        """Foto vigente; si algo cambió, recarga las tablas afectadas antes de devolverla."""
+        foto = self._foto
+        ahora = time.monotonic()
+        cambiadas = [c for c in CATEGORIAS_GAZETTE if foto.marcadores.get(c) != versiones.version(CATEGORIAS_GAZETTE[c])]
+        revisar_db = ahora - self._ultima_huella >= self.intervalo_huella
+        if not cambiadas and not revisar_db:
+            return foto
+        if ahora - self._ultimo_error < INTERVALO_REINTENTO:
+            return foto
+        try:
+            huellas = None
+            if revisar_db:
+                self._ultima_huella = ahora
+                huellas = huellas_db(self._get_connection)
+                cambiadas = set(cambiadas) | {c for c, h in huellas.items() if foto.huellas.get(c) != h}
+            if cambiadas:
+                self.recargar(cambiadas, huellas)
+        except Exception as e:
+            self._ultimo_error = ahora
+            logger.error(f"GazetteVivo: no se pudo revisar/recargar el gazette: {e}")
+        return self._foto
+
+    def recargar(self, categorias: Optional[Iterable[str]] = None,
+                 huellas: Optional[Dict[str, Tuple]] = None) -> FotoGazette:
+        """Recarga solo las categorías indicadas (todas si es None) y publica una foto nueva."""
+        categorias = set(categorias or CATEGORIAS_GAZETTE)
+        with self._lock:
+            foto = self._foto
+            marcadores = dict(foto.marcadores)
+            for c in categorias:
+                marcadores[c] = versiones.version(CATEGORIAS_GAZETTE[c])
+            if huellas is None:
+                try:
+                    huellas = huellas_db(self._get_connection)
+                    self._ultima_huella = time.monotonic()
+                except Exception:
+                    huellas = {}
+            nuevos = cargar_categorias(self._get_connection, sorted(categorias))
+            gazettes = dict(foto.gazettes)
+            gazettes.update(nuevos)
+            # Solo se actualiza la huella de lo recargado: un cambio en otra tabla
+            # se seguirá detectando en la próxima revisión.
+            nuevas_huellas = dict(foto.huellas)
+            nuevas_huellas.update({c: huellas[c] for c in categorias if c in huellas})
+            self._foto = FotoGazette(foto.version + 1, gazettes, marcadores, nuevas_huellas)
+            self._ultimo_error = 0.0
+        logger.info(f"GazetteVivo v{self._foto.version}: recargadas {sorted(categorias)}")
+        return self._foto
@@ -0,0 +1,467 @@
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import mysql.connector
+
+from actions import versiones
+from actions.db_pool import DB_CONFIG
+from actions.resolver_vinas import nucleo_de
+from actions.texto import normalizar
+
+# --- Importación Masiva del Catálogo ---
+# Carga vinos (con sus notas, características y maridajes) o viñas desde un
+# CSV, JSON Lines o arreglo JSON, leyendo el archivo de a poco: nunca está
+# completo en memoria. Los nombres de viña y de etiquetas se resuelven a ids
+# con mapas en memoria cargados una vez, y las filas se insertan con
+# `executemany` en bloques de `TAMANO_BLOQUE`, una transacción por bloque.
+# Una fila inválida no detiene la carga: queda en el resumen con su número.
+#
+# Columnas de vinos: nombre, cepa, ano, tipo, vina (nombre) o vina_id,
+# link_compra, cuerpo, acidez, taninos, dulzor, precio_aproximado,
+# potencial_guarda, imagen_url, notas, caracteristicas, maridajes.
+# En CSV las listas de etiquetas van separadas por "|".
+# Columnas de viñas: nombre, valle, comuna, descripcion_tour, horario_tour,
+# duracion_tour, precio_tour, tipo_tour, link_web, latitud, longitud, imagen_url.
+#
+# Uso (desde la raíz del proyecto):
+#     python -m actions.importacion vinos distribuidor.csv
+#     python -m actions.importacion vinas vinas.jsonl
+#     python -m actions.importacion vinos catalogo.json --crear-etiquetas
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BLOQUE = 500
+MAX_ERRORES_GUARDADOS = 1000
+SEPARADOR_LISTA = "|"
+LARGO_MAXIMO_NOMBRE = 255  # vinos.nombre y vinas.nombre son varchar(255)
+
+COLUMNAS_VINOS = ("nombre", "cepa", "ano", "tipo", "vina_id", "link_compra", "cuerpo", "acidez",
+                  "taninos", "dulzor", "precio_aproximado", "potencial_guarda", "imagen_url")
+COLUMNAS_VINAS = ("nombre", "valle", "comuna", "descripcion_tour", "horario_tour", "duracion_tour",
+                  "precio_tour", "tipo_tour", "link_web", "latitud", "longitud", "imagen_url")
+
+# Valores permitidos de los enum de `vinos` (se validan antes de ir a la DB)
+ENUMS_VINOS = {
+    "cuerpo": ("Ligero", "Medio", "Completo"),
+    "acidez": ("Baja", "Media", "Alta"),
+    "taninos": ("Bajos", "Medios", "Altos"),
+    "dulzor": ("Seco", "Semi-Seco", "Dulce"),
+    "precio_aproximado": ("$", "$$", "$$$"),
+}
+
+# Columna de la fila -> (tabla de etiquetas, tabla de enlace, columna del id de etiqueta)
+ETIQUETAS = {
+    "notas": ("notas_sabor", "vino_nota", "nota_id"),
+    "caracteristicas": ("caracteristicas", "vino_caracteristica", "caracteristica_id"),
+    "maridajes": ("maridajes", "vino_maridaje", "maridaje_id"),
+}
+
+TABLAS_IMPORTACION = {
+    "vinos": ("vinos", "vino_nota", "vino_caracteristica", "vino_maridaje",
+              "notas_sabor", "caracteristicas", "maridajes"),
+    "vinas": ("vinas",),
+}
+
+# Errores de una fila puntual (no de la conexión): se aísla la fila y se sigue
+ERRORES_DE_FILA = (mysql.connector.errors.DataError, mysql.connector.errors.IntegrityError)
+
+
+class ErrorFila(ValueError):
+    pass
+
+
+class ResumenImportacion:
+    def __init__(self, tipo: str):
+        self.tipo = tipo
+        self.leidas = 0
+        self.insertadas = 0
+        self.enlaces = 0
+        self.etiquetas_creadas = 0
+        self.total_errores = 0
+        self.errores: List[Tuple[int, str]] = []
+        self.inicio = time.perf_counter()
+        self.segundos = 0.0
+
+    def error(self, linea: int, mensaje: str) -> None:
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES_GUARDADOS:
+            self.errores.append((linea, mensaje))
+
+    @property
+    def filas_por_segundo(self) -> float:
+        segundos = self.segundos or (time.perf_counter() - self.inicio)
+        return self.leidas / segundos if segundos else 0.0
+
+    def como_dict(self) -> Dict[str, Any]:
+        return {
+            "tipo": self.tipo,
+            "leidas": self.leidas,
+            "insertadas": self.insertadas,
+            "enlaces": self.enlaces,
+            "etiquetas_creadas": self.etiquetas_creadas,
+            "errores": self.total_errores,
+            "detalle_errores": [{"fila": linea, "error": msg} for linea, msg in self.errores],
+            "segundos": round(self.segundos, 3),
+            "filas_por_segundo": round(self.filas_por_segundo, 1),
+        }
+
+
+# --- Lectura en streaming ---
+
+def _filas_csv(flujo: io.TextIOBase) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    lector = csv.DictReader(flujo)
+    for fila in lector:
+        yield lector.line_num, fila
+
+
+def _filas_jsonl(flujo: io.TextIOBase) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    for numero, linea in enumerate(flujo, 1):
+        if linea.strip():
+            try:
+                yield numero, json.loads(linea)
+            except json.JSONDecodeError as e:
+                yield numero, {"__error__": f"JSON inválido: {e.msg}"}
+
+
+def _filas_json(flujo: io.TextIOBase, tam_lectura: int = 65536) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Recorre un arreglo JSON `[{...}, {...}]` objeto por objeto, leyendo por trozos."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    fin_archivo = False
+    dentro = False
+    numero = 0
+
+    def leer_mas() -> None:
+        nonlocal buffer, fin_archivo
+        trozo = flujo.read(tam_lectura)
+        fin_archivo = not trozo
+        buffer += trozo
+
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer or (dentro and buffer[0] not in ",]" and len(buffer) < tam_lectura and not fin_archivo):
+            if fin_archivo:
+                if dentro:
+                    raise ValueError("El arreglo JSON está incompleto.")
+                return
+            leer_mas()
+            continue
+        if not dentro:
+            if buffer[0] != "[":
+                raise ValueError("Se esperaba un arreglo JSON de objetos.")
+            buffer, dentro = buffer[1:], True
+            continue
+        if buffer[0] == "]":
+            return
+        if buffer[0] == ",":
+            buffer = buffer[1:]
+            continue
+        try:
+            objeto, fin = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if fin_archivo:
+                raise ValueError(f"JSON inválido cerca del objeto {numero + 1}.")
+            leer_mas()
+            continue
+        numero += 1
+        buffer = buffer[fin:]
+        yield numero, objeto
+
+
+def leer_filas(flujo: io.TextIOBase, formato: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(número de fila, dict) por cada registro. `formato`: csv, jsonl o json."""
+    lectores = {"csv": _filas_csv, "jsonl": _filas_jsonl, "json": _filas_json}
+    if formato not in lectores:
+        raise ValueError(f"Formato no soportado: {formato}")
+    return lectores[formato](flujo)
+
+
+def formato_de(nombre_archivo: str) -> str:
+    extension = os.path.splitext(nombre_archivo or "")[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "json"}.get(extension, "csv")
+
+
+# --- Validación de filas ---
+
+def _texto(fila: Dict[str, Any], campo: str) -> Optional[str]:
+    valor = fila.get(campo)
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    return valor or None
+
+
+def _entero(fila: Dict[str, Any], campo: str) -> Optional[int]:
+    valor = _texto(fila, campo)
+    if valor is None:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ErrorFila(f"'{campo}' debe ser un número entero (recibido '{valor}').")
+
+
+def _decimal(fila: Dict[str, Any], campo: str) -> Optional[float]:
+    valor = _texto(fila, campo)
+    if valor is None:
+        return None
+    try:
+        return float(valor.replace(",", "."))
+    except ValueError:
+        raise ErrorFila(f"'{campo}' debe ser un número (recibido '{valor}').")
+
+
+def _lista(fila: Dict[str, Any], campo: str) -> List[str]:
+    valor = fila.get(campo)
+    if valor is None:
+        return []
+    if isinstance(valor, str):
+        valor = valor.split(SEPARADOR_LISTA)
+    return [str(v).strip() for v in valor if str(v).strip()]
+
+
+class _Mapas:
+    """Nombre normalizado -> id de viñas y etiquetas, cargados una sola vez."""
+
+    def __init__(self, conn, cursor, crear_etiquetas: bool):
+        self._conn = conn
+        self.crear_etiquetas = crear_etiquetas
+        self.vinas = self._cargar(cursor, "vinas")
+        self.ids_vinas = set(self.vinas.values())
+        # "Montes" también encuentra "Viña Montes" (sin palabras genéricas)
+        self.vinas_nucleo = {}
+        for nombre, vina_id in self.vinas.items():
+            self.vinas_nucleo.setdefault(nucleo_de(nombre), vina_id)
+        self.etiquetas = {tabla: self._cargar(cursor, tabla) for tabla, _, _ in ETIQUETAS.values()}
+
+    @staticmethod
+    def _cargar(cursor, tabla: str) -> Dict[str, int]:
+        cursor.execute(f"SELECT id, nombre FROM {tabla}")
+        return {normalizar(nombre): id_ for id_, nombre in cursor.fetchall() if nombre}
+
+    def etiqueta(self, cursor, tabla: str, nombre: str, resumen: ResumenImportacion) -> int:
+        clave = normalizar(nombre)
+        id_ = self.etiquetas[tabla].get(clave)
+        if id_ is not None:
+            return id_
+        if not self.crear_etiquetas:
+            raise ErrorFila(f"'{nombre}' no existe en {tabla} (usa --crear-etiquetas para agregarla).")
+        cursor.execute(f"INSERT INTO {tabla} (nombre) VALUES (%s)", (nombre.capitalize(),))
+        self._conn.commit()  # Entre bloques: no arrastra filas a medio insertar
+        id_ = self.etiquetas[tabla][clave] = cursor.lastrowid
+        resumen.etiquetas_creadas += 1
+        return id_
+
+
+def _preparar_vino(fila: Dict[str, Any], mapas: _Mapas, cursor, resumen) -> Tuple[tuple, Dict[str, List[int]]]:
+    nombre = _texto(fila, "nombre")
+    if not nombre:
+        raise ErrorFila("Falta 'nombre'.")
+    if len(nombre) > LARGO_MAXIMO_NOMBRE:
+        raise ErrorFila(f"'nombre' supera los {LARGO_MAXIMO_NOMBRE} caracteres.")
+    vina_id = _entero(fila, "vina_id")
+    if vina_id is None:
+        vina = _texto(fila, "vina")
+        if not vina:
+            raise ErrorFila("Falta 'vina' o 'vina_id'.")
+        vina_id = mapas.vinas.get(normalizar(vina)) or mapas.vinas_nucleo.get(nucleo_de(normalizar(vina)))
+        if vina_id is None:
+            raise ErrorFila(f"La viña '{vina}' no existe.")
+    elif vina_id not in mapas.ids_vinas:
+        raise ErrorFila(f"No existe una viña con id {vina_id}.")
+    valores = {
+        "nombre": nombre, "cepa": _texto(fila, "cepa"), "ano": _entero(fila, "ano"),
+        "tipo": _texto(fila, "tipo"), "vina_id": vina_id, "link_compra": _texto(fila, "link_compra"),
+        "potencial_guarda": _texto(fila, "potencial_guarda") or "Beber ahora",
+        "imagen_url": _texto(fila, "imagen_url"),
+    }
+    for campo, permitidos in ENUMS_VINOS.items():
+        valor = _texto(fila, campo)
+        if valor is not None and valor not in permitidos:
+            raise ErrorFila(f"'{campo}' debe ser uno de {', '.join(permitidos)} (recibido '{valor}').")
+        valores[campo] = valor
+    etiquetas = {}
+    for columna, (tabla, _, _) in ETIQUETAS.items():
+        etiquetas[columna] = sorted({mapas.etiqueta(cursor, tabla, n, resumen) for n in _lista(fila, columna)})
+    return tuple(valores[c] for c in COLUMNAS_VINOS), etiquetas
+
+
+def _preparar_vina(fila: Dict[str, Any], mapas: _Mapas) -> tuple:
+    nombre = _texto(fila, "nombre")
+    if not nombre:
+        raise ErrorFila("Falta 'nombre'.")
+    if len(nombre) > LARGO_MAXIMO_NOMBRE:
+        raise ErrorFila(f"'nombre' supera los {LARGO_MAXIMO_NOMBRE} caracteres.")
+    if normalizar(nombre) in mapas.vinas:
+        raise ErrorFila(f"La viña '{nombre}' ya existe.")
+    valores = {c: _texto(fila, c) for c in COLUMNAS_VINAS}
+    valores["latitud"] = _decimal(fila, "latitud")
+    valores["longitud"] = _decimal(fila, "longitud")
+    return tuple(valores[c] for c in COLUMNAS_VINAS)
+
+
+# --- Inserción por bloques ---
+
+def _sql_insert(tabla: str, columnas: Iterable[str]) -> str:
+    columnas = list(columnas)
+    return f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join(['%s'] * len(columnas))})"
+
+
+SQL_VINOS = _sql_insert("vinos", COLUMNAS_VINOS)
+SQL_VINAS = _sql_insert("vinas", COLUMNAS_VINAS)
+
+
+def _ids_insertados(cursor, tabla: str, primer_id: int, claves: List[tuple], columnas: str) -> List[int]:
+    """
+    Ids de las filas recién insertadas, en el orden de `claves`. Se buscan por
+    clave natural desde el primer id del INSERT, sin suponer ids consecutivos.
+    """
+    cursor.execute(f"SELECT id, {columnas} FROM {tabla} WHERE id >= %s ORDER BY id", (primer_id,))
+    por_clave: Dict[tuple, Deque[int]] = defaultdict(deque)
+    for fila in cursor.fetchall():
+        por_clave[tuple(fila[1:])].append(fila[0])
+    return [por_clave[clave].popleft() for clave in claves]
+
+
+def _insertar_bloque(conn, tipo: str, bloque: List[Tuple[int, tuple, Dict[str, List[int]]]],
+                     mapas: _Mapas, resumen: ResumenImportacion) -> None:
+    cursor = conn.cursor()
+    try:
+        filas = [valores for _, valores, _ in bloque]
+        cursor.executemany(SQL_VINOS if tipo == "vinos" else SQL_VINAS, filas)
+        cursor.execute("SELECT LAST_INSERT_ID()")
+        primer_id = cursor.fetchone()[0]
+        if tipo == "vinos":
+            claves = [(v[0], v[4], v[2]) for v in filas]  # (nombre, vina_id, ano)
+            ids = _ids_insertados(cursor, "vinos", primer_id, claves, "nombre, vina_id, ano")
+            for columna, (_, enlace, columna_id) in ETIQUETAS.items():
+                pares = [(vino_id, etiqueta_id) for vino_id, (_, _, etiquetas) in zip(ids, bloque)
+                         for etiqueta_id in etiquetas[columna]]
+                if pares:
+                    cursor.executemany(f"INSERT IGNORE INTO {enlace} (vino_id, {columna_id}) VALUES (%s, %s)", pares)
+                    resumen.enlaces += len(pares)
+        else:
+            ids = _ids_insertados(cursor, "vinas", primer_id, [(v[0],) for v in filas], "nombre")
+            for valores, vina_id in zip(filas, ids):
+                mapas.vinas[normalizar(valores[0])] = vina_id
+                mapas.vinas_nucleo.setdefault(nucleo_de(normalizar(valores[0])), vina_id)
+                mapas.ids_vinas.add(vina_id)
+        conn.commit()
+        resumen.insertadas += len(bloque)
+    finally:
+        cursor.close()
+
+
+def _volcar(conn, tipo, bloque, mapas, resumen) -> None:
+    """Inserta el bloque; si una fila lo hace fallar, repite de a una para aislarla."""
+    if not bloque:
+        return
+    try:
+        _insertar_bloque(conn, tipo, bloque, mapas, resumen)
+    except ERRORES_DE_FILA:
+        conn.rollback()
+        for item in bloque:
+            try:
+                _insertar_bloque(conn, tipo, [item], mapas, resumen)
+            except ERRORES_DE_FILA as e:
+                conn.rollback()
+                resumen.error(item[0], str(e))
+
+
+def importar(conn, tipo: str, filas: Iterable[Tuple[int, Dict[str, Any]]],
+             tamano_bloque: int = TAMANO_BLOQUE, crear_etiquetas: bool = False,
+             progreso: Optional[Callable[[ResumenImportacion], None]] = None) -> ResumenImportacion:
+    """
+    Importa `filas` (de `leer_filas`) a `vinos` o `vinas`. Devuelve el resumen;
+    si algo corta la carga, la excepción lleva el resumen parcial en `.resumen`.
+    """
+    if tipo not in TABLAS_IMPORTACION:
+        raise ValueError(f"Tipo de importación desconocido: {tipo}")
+    resumen = ResumenImportacion(tipo)
+    cursor = conn.cursor()
+    mapas = _Mapas(conn, cursor, crear_etiquetas)
+    bloque: List[Tuple[int, tuple, Dict[str, List[int]]]] = []
+    try:
+        for linea, fila in filas:
+            resumen.leidas += 1
+            try:
+                if not isinstance(fila, dict):
+                    raise ErrorFila("La fila no es un objeto.")
+                if "__error__" in fila:
+                    raise ErrorFila(fila["__error__"])
+                if tipo == "vinos":
+                    valores, etiquetas = _preparar_vino(fila, mapas, cursor, resumen)
+                else:
+                    valores, etiquetas = _preparar_vina(fila, mapas), {}
+                    mapas.vinas[normalizar(valores[0])] = -1  # Evita duplicados dentro del mismo archivo
+            except ErrorFila as e:
+                resumen.error(linea, str(e))
+                continue
+            bloque.append((linea, valores, etiquetas))
+            if len(bloque) >= tamano_bloque:
+                _volcar(conn, tipo, bloque, mapas, resumen)
+                bloque = []
+                if progreso:
+                    progreso(resumen)
+        _volcar(conn, tipo, bloque, mapas, resumen)
+    except Exception as e:
+        # Los bloques ya confirmados quedan en MySQL: quien llama informa el parcial
+        e.resumen = resumen
+        raise
+    finally:
+        cursor.close()
+        resumen.segundos = time.perf_counter() - resumen.inicio
+        if resumen.insertadas or resumen.etiquetas_creadas:
+            versiones.incrementar(*TABLAS_IMPORTACION[tipo])
+    return resumen
+
+
+# --- Línea de comandos ---
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Importación masiva del catálogo de VinAI")
+    parser.add_argument("tipo", choices=sorted(TABLAS_IMPORTACION))
+    parser.add_argument("archivo", help="CSV, JSON Lines (.jsonl) o arreglo JSON (.json)")
+    parser.add_argument("--formato", choices=["csv", "jsonl", "json"], help="Por defecto, según la extensión")
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE, help="Filas por transacción")
+    parser.add_argument("--crear-etiquetas", action="store_true", help="Agrega notas/características/maridajes desconocidos")
+    args = parser.parse_args(argv)
+
+    def mostrar_progreso(resumen: ResumenImportacion) -> None:
+        print(f"  {resumen.leidas} filas leídas, {resumen.insertadas} insertadas "
+              f"({resumen.filas_por_segundo:.0f} filas/s)", file=sys.stderr)
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        with open(args.archivo, encoding="utf-8-sig", newline="") as flujo:
+            filas = leer_filas(flujo, args.formato or formato_de(args.archivo))
+            resumen = importar(conn, args.tipo, filas, args.bloque, args.crear_etiquetas, mostrar_progreso)
+    except (mysql.connector.Error, ValueError) as e:
+        parcial = getattr(e, "resumen", None)
+        print(f"Error al importar: {e}")
+        if parcial:
+            print(f"Antes del error se importaron {parcial.insertadas}/{parcial.leidas} filas.")
+        return 1
+    finally:
+        conn.close()
+
+    for linea, mensaje in resumen.errores:
+        print(f"Fila {linea}: {mensaje}")
+    if resumen.total_errores > len(resumen.errores):
+        print(f"... y {resumen.total_errores - len(resumen.errores)} errores más.")
+    print(f"{resumen.insertadas}/{resumen.leidas} filas importadas en {resumen.segundos:.2f}s "
+          f"({resumen.filas_por_segundo:.0f} filas/s), {resumen.total_errores} con errores.")
+    return 0 if not resumen.total_errores else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
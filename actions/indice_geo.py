@@ -0,0 +1,145 @@
+import heapq
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# --- Índice Espacial (KD-tree) ---
+# Cada punto (latitud, longitud) se guarda como vector unitario 3D sobre la
+# esfera. La distancia en línea recta entre dos de esos vectores (la cuerda)
+# crece con la distancia sobre la superficie, así que un KD-tree euclidiano
+# común da exactamente los vecinos por distancia de circunferencia máxima
+# (haversine), sin casos especiales en el antimeridiano ni en los polos; los
+# km se calculan solo para los resultados.
+#
+# El árbol es implícito: `orden` se reordena de modo que en cada rango
+# [lo, hi) el punto del medio divide por el eje de mayor dispersión y los
+# rangos de a lo más HOJA puntos se recorren enteros. Una búsqueda visita
+# O(log n) nodos; las coordenadas quedan en listas de Python porque indexar
+# escalares de numpy es varias veces más lento.
+
+RADIO_TIERRA_KM = 6371.0088
+HOJA = 8
+
+
+def _unitario(latitud: float, longitud: float) -> Tuple[float, float, float]:
+    lat, lon = math.radians(latitud), math.radians(longitud)
+    return math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)
+
+
+def _cuerda2_a_km(cuerda2: float) -> float:
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(cuerda2) / 2))
+
+
+def _km_a_cuerda2(km: float) -> float:
+    angulo = min(math.pi, km / RADIO_TIERRA_KM)
+    return (2 * math.sin(angulo / 2)) ** 2
+
+
+def distancia_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia haversine entre dos puntos."""
+    fi1, fi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((fi2 - fi1) / 2) ** 2
+         + math.cos(fi1) * math.cos(fi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class IndiceGeo:
+    """KD-tree sobre `puntos` [(latitud, longitud), ...]; las búsquedas devuelven posiciones en esa lista."""
+
+    def __init__(self, puntos: Sequence[Tuple[float, float]]):
+        n = len(puntos)
+        coords = np.array([_unitario(lat, lon) for lat, lon in puntos], dtype=np.float64).reshape(n, 3)
+        orden = np.arange(n)
+        ejes = [0] * n
+        pendientes = [(0, n)]
+        while pendientes:
+            lo, hi = pendientes.pop()
+            if hi - lo <= HOJA:
+                continue
+            rango = coords[orden[lo:hi]]
+            eje = int(np.argmax(rango.max(axis=0) - rango.min(axis=0)))
+            medio = (lo + hi) // 2
+            orden[lo:hi] = orden[lo:hi][np.argpartition(rango[:, eje], medio - lo)]
+            ejes[medio] = eje
+            pendientes += [(lo, medio), (medio + 1, hi)]
+        self._orden: List[int] = orden.tolist()
+        self._ejes = ejes
+        ordenadas = coords[orden]
+        self._coords = tuple(ordenadas[:, eje].tolist() for eje in range(3))
+        self._n = n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def cercanos(self, latitud: float, longitud: float, k: int = 5,
+                 radio_km: Optional[float] = None) -> List[Tuple[int, float]]:
+        """Los `k` puntos más cercanos (posición, km), del más cercano al más lejano; con `radio_km`, solo los que están dentro."""
+        if k <= 0 or not self._n:
+            return []
+        q = _unitario(latitud, longitud)
+        cx, cy, cz = self._coords
+        ejes, coords = self._ejes, self._coords
+        limite = _km_a_cuerda2(radio_km) if radio_km is not None else math.inf
+        mejores: List[Tuple[float, int]] = []   # Heap de máximos: (-cuerda², posición)
+
+        def peor() -> float:
+            return -mejores[0][0] if len(mejores) == k else limite
+
+        def considerar(i: int) -> None:
+            d = (cx[i] - q[0]) ** 2 + (cy[i] - q[1]) ** 2 + (cz[i] - q[2]) ** 2
+            if d <= peor():
+                if len(mejores) == k:
+                    heapq.heapreplace(mejores, (-d, i))
+                else:
+                    heapq.heappush(mejores, (-d, i))
+
+        def buscar(lo: int, hi: int) -> None:
+            if hi - lo <= HOJA:
+                for i in range(lo, hi):
+                    considerar(i)
+                return
+            medio = (lo + hi) // 2
+            eje = ejes[medio]
+            diferencia = q[eje] - coords[eje][medio]
+            cerca, lejos = ((lo, medio), (medio + 1, hi)) if diferencia < 0 else ((medio + 1, hi), (lo, medio))
+            buscar(*cerca)
+            considerar(medio)
+            if diferencia * diferencia <= peor():
+                buscar(*lejos)
+
+        buscar(0, self._n)
+        return [(self._orden[i], _cuerda2_a_km(-d)) for d, i in sorted(mejores, reverse=True)]
+
+    def en_radio(self, latitud: float, longitud: float, radio_km: float,
+                 limite: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Todos los puntos a `radio_km` o menos (posición, km), del más cercano al más lejano."""
+        if not self._n:
+            return []
+        q = _unitario(latitud, longitud)
+        cx, cy, cz = self._coords
+        ejes, coords = self._ejes, self._coords
+        maximo = _km_a_cuerda2(radio_km)
+        dentro: List[Tuple[float, int]] = []
+        pendientes = [(0, self._n)]
+        while pendientes:
+            lo, hi = pendientes.pop()
+            if hi - lo <= HOJA:
+                candidatos = range(lo, hi)
+            else:
+                medio = (lo + hi) // 2
+                eje = ejes[medio]
+                diferencia = q[eje] - coords[eje][medio]
+                if diferencia < 0 or diferencia * diferencia <= maximo:
+                    pendientes.append((lo, medio))
+                if diferencia >= 0 or diferencia * diferencia <= maximo:
+                    pendientes.append((medio + 1, hi))
+                candidatos = (medio,)
+            for i in candidatos:
+                d = (cx[i] - q[0]) ** 2 + (cy[i] - q[1]) ** 2 + (cz[i] - q[2]) ** 2
+                if d <= maximo:
+                    dentro.append((d, i))
+        dentro.sort()
+        if limite is not None:
+            dentro = dentro[:limite]
+        return [(self._orden[i], _cuerda2_a_km(d)) for d, i in dentro]
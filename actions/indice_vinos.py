@@ -0,0 +1,205 @@
+import logging
+import random
+import threading
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from actions import versiones
+from actions.texto import normalizar
+
+# --- Índice Invertido del Catálogo de Vinos ---
+# Cada valor de atributo (cepa, tipo, año, valle, nota, característica,
+# maridaje) apunta a un bitmap (un `int` de Python) con las posiciones de los
+# vinos que lo cumplen. Una combinación de filtros se resuelve con `&` entre
+# bitmaps y la elección aleatoria es uniforme sobre los bits encendidos, sin
+# consultar la base de datos.
+
+logger = logging.getLogger(__name__)
+
+TABLAS_CATALOGO = (
+    "vinos", "vinas", "notas_sabor", "caracteristicas", "maridajes",
+    "vino_nota", "vino_caracteristica", "vino_maridaje",
+)
+
+# Fila devuelta por el índice, mismo orden que el SELECT original de
+# ActionRecomendarVinoDb: (id, nombre, cepa, ano, tipo, vina, valle, link_compra)
+FilaVino = Tuple[int, str, Optional[str], Optional[int], Optional[str], str, Optional[str], Optional[str]]
+
+QUERY_VINOS = """
+    SELECT v.id, v.nombre, v.cepa, v.ano, v.tipo, va.nombre, va.valle, v.link_compra
+    FROM vinos v JOIN vinas va ON v.vina_id = va.id
+    ORDER BY v.id
+"""
+QUERIES_ETIQUETAS = {
+    "nota_sabor": "SELECT vn.vino_id, ns.nombre FROM vino_nota vn JOIN notas_sabor ns ON vn.nota_id = ns.id",
+    "caracteristica": "SELECT vc.vino_id, c.nombre FROM vino_caracteristica vc JOIN caracteristicas c ON vc.caracteristica_id = c.id",
+    "maridaje": "SELECT vm.vino_id, m.nombre FROM vino_maridaje vm JOIN maridajes m ON vm.maridaje_id = m.id",
+}
+
+
+def _bitmap(posiciones: List[int], total: int) -> int:
+    bits = bytearray((total + 7) // 8)
+    for pos in posiciones:
+        bits[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _kesimo_bit(bitmap: int, k: int) -> int:
+    """Posición del k-ésimo bit encendido (base 0) por búsqueda binaria de conteos."""
+    lo, hi = 0, bitmap.bit_length()
+    while hi - lo > 64:
+        mid = (lo + hi) // 2
+        bajos = ((bitmap >> lo) & ((1 << (mid - lo)) - 1)).bit_count()
+        if k < bajos:
+            hi = mid
+        else:
+            k -= bajos
+            lo = mid
+    segmento = bitmap >> lo
+    while True:
+        if segmento & 1:
+            if k == 0:
+                return lo
+            k -= 1
+        segmento >>= 1
+        lo += 1
+
+
+def posiciones_de(bitmap: int) -> List[int]:
+    """Posiciones de todos los bits encendidos, en orden ascendente."""
+    binario = bin(bitmap)[:1:-1]  # bit 0 primero
+    posiciones = []
+    pos = binario.find("1")
+    while pos != -1:
+        posiciones.append(pos)
+        pos = binario.find("1", pos + 1)
+    return posiciones
+
+
+class _EstadoIndice:
+    """Foto inmutable del catálogo; se reemplaza completa al refrescar."""
+
+    def __init__(self, filas: List[FilaVino], etiquetas: Dict[str, List[Tuple[int, str]]],
+                 version: Tuple[int, ...]):
+        self.version = version
+        self.filas = filas
+        self.ids = array("i", (f[0] for f in filas))
+        self.posicion_por_id = {vino_id: pos for pos, vino_id in enumerate(self.ids)}
+        total = len(filas)
+        self.todos = (1 << total) - 1
+
+        acumulado: Dict[str, Dict[Any, List[int]]] = {
+            "cepa": {}, "tipo": {}, "ano": {}, "valle": {},
+            "nota_sabor": {}, "caracteristica": {}, "maridaje": {},
+        }
+        for pos, (_, _, cepa, ano, tipo, _, valle, _) in enumerate(filas):
+            if cepa:
+                acumulado["cepa"].setdefault(normalizar(cepa), []).append(pos)
+            if tipo:
+                acumulado["tipo"].setdefault(normalizar(tipo), []).append(pos)
+            if ano is not None:
+                acumulado["ano"].setdefault(int(ano), []).append(pos)
+            if valle:
+                acumulado["valle"].setdefault(normalizar(valle), []).append(pos)
+        for atributo, pares in etiquetas.items():
+            destino = acumulado[atributo]
+            for vino_id, nombre in pares:
+                pos = self.posicion_por_id.get(vino_id)
+                if pos is not None and nombre:
+                    destino.setdefault(normalizar(nombre), []).append(pos)
+
+        self.bitmaps: Dict[str, Dict[Any, int]] = {
+            atributo: {valor: _bitmap(pos, total) for valor, pos in valores.items()}
+            for atributo, valores in acumulado.items()
+        }
+
+
+class IndiceVinos:
+    """
+    Índice en memoria para ActionRecomendarVinoDb. Se construye desde la DB la
+    primera vez que se usa y se reconstruye cuando cambia la versión de
+    alguna tabla del catálogo (ver `actions.versiones`) o al llamar `refrescar()`.
+    """
+
+    def __init__(self, get_connection: Callable[[], Any]):
+        self._get_connection = get_connection
+        self._estado: Optional[_EstadoIndice] = None
+        self._lock = threading.Lock()
+
+    # --- Refresco ---
+    def refrescar(self) -> None:
+        """Reconstruye el índice desde la DB y lo publica de forma atómica."""
+        version = versiones.versiones(TABLAS_CATALOGO)
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(QUERY_VINOS)
+            filas = [tuple(f) for f in cursor.fetchall()]
+            etiquetas = {}
+            for atributo, query in QUERIES_ETIQUETAS.items():
+                cursor.execute(query)
+                etiquetas[atributo] = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+        self._estado = _EstadoIndice(filas, etiquetas, version)
+        logger.debug(f"IndiceVinos: {len(filas)} vinos indexados.")
+
+    def asegurar_vigente(self) -> _EstadoIndice:
+        """Devuelve el estado actual, reconstruyéndolo si el catálogo cambió."""
+        estado = self._estado
+        if estado is not None and estado.version == versiones.versiones(TABLAS_CATALOGO):
+            return estado
+        with self._lock:
+            estado = self._estado
+            if estado is None or estado.version != versiones.versiones(TABLAS_CATALOGO):
+                self.refrescar()
+            return self._estado
+
+    # --- Consultas ---
+    def _filtrar(self, estado: _EstadoIndice, cepa: Optional[str] = None,
+                 tipo: Optional[str] = None, valle: Optional[str] = None,
+                 ano: Optional[Any] = None, caracteristica: Optional[str] = None,
+                 maridaje: Optional[str] = None, nota_sabor: Optional[str] = None) -> int:
+        """Bitmap de los vinos que cumplen *todos* los criterios indicados."""
+        resultado = estado.todos
+        exactos = (("cepa", cepa), ("tipo", tipo), ("caracteristica", caracteristica),
+                   ("maridaje", maridaje), ("nota_sabor", nota_sabor))
+        for atributo, valor in exactos:
+            if valor:
+                resultado &= estado.bitmaps[atributo].get(normalizar(valor), 0)
+                if not resultado:
+                    return 0
+        if ano:
+            try:
+                resultado &= estado.bitmaps["ano"].get(int(ano), 0)
+            except (TypeError, ValueError):
+                return 0
+        if valle:
+            # Equivalente a `va.valle LIKE '%valle%'`: unión de los valles que lo contienen
+            buscado = normalizar(valle)
+            del_valle = 0
+            for nombre_valle, bits in estado.bitmaps["valle"].items():
+                if buscado in nombre_valle:
+                    del_valle |= bits
+            resultado &= del_valle
+        return resultado
+
+    def candidatos(self, **criterios) -> List[int]:
+        """IDs (ordenados) de los vinos que cumplen los criterios."""
+        estado = self.asegurar_vigente()
+        return [estado.ids[pos] for pos in posiciones_de(self._filtrar(estado, **criterios))]
+
+    def elegir(self, **criterios) -> Optional[FilaVino]:
+        """Un vino al azar (uniforme) entre los que cumplen los criterios."""
+        estado = self.asegurar_vigente()
+        bits = self._filtrar(estado, **criterios)
+        total = bits.bit_count()
+        if not total:
+            return None
+        return estado.filas[_kesimo_bit(bits, random.randrange(total))]
+
+    def vino(self, vino_id: int) -> Optional[FilaVino]:
+        estado = self.asegurar_vigente()
+        pos = estado.posicion_por_id.get(vino_id)
+        return estado.filas[pos] if pos is not None else None
@@ -0,0 +1,223 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# --- Métricas en Formato Prometheus ---
+# Histogramas y contadores en memoria, sin dependencias, con un lock por
+# métrica: registrar una observación es un `bisect` y dos sumas (~1 µs), así
+# que se pueden dejar activas en producción. `REGISTRO.exponer()` produce el
+# formato de texto de Prometheus; el panel lo sirve en /metrics y el servidor
+# de acciones en un puerto aparte (ver `servir_http`).
+#
+# Las métricas estándar de VinAI (acciones, consultas, pool, rutas del panel)
+# están definidas al final del módulo; cada proceso tiene las suyas.
+
+logger = logging.getLogger(__name__)
+
+# Segundos: de 1 ms a 10 s
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor: Any) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence[Any], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                 buckets: Sequence[float] = BUCKETS_LATENCIA):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *etiquetas: Any) -> None:
+        # Conteos por bucket (no acumulados) + suma + total
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            serie[indice] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    @contextmanager
+    def medir(self, *etiquetas: Any) -> Iterator[None]:
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, *etiquetas)
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for valores, serie in sorted(series.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float("inf"),), serie):
+                acumulado += conteo
+                le = "+Inf" if limite == float("inf") else _numero(limite)
+                etiquetas = _etiquetas(self.etiquetas, valores, 'le="' + le + '"')
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {_numero(serie[-2])}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {serie[-1]}")
+        return lineas
+
+
+class Contador:
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *etiquetas: Any, cantidad: float = 1) -> None:
+        with self._lock:
+            self._series[etiquetas] = self._series.get(etiquetas, 0) + cantidad
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            series = dict(self._series)
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        for valores, total in sorted(series.items()):
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(total)}")
+        return lineas
+
+
+class Registro:
+    def __init__(self):
+        self._metricas: List[Any] = []
+        self._stats: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                   buckets: Sequence[float] = BUCKETS_LATENCIA) -> Histograma:
+        metrica = Histograma(nombre, ayuda, etiquetas, buckets)
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+        metrica = Contador(nombre, ayuda, etiquetas)
+        self._metricas.append(metrica)
+        return metrica
+
+    def stats(self, componente: str, funcion: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Publica los `stats()` numéricos de un componente (pool, cachés, cola...)
+        como `vinai_stats{componente=..., clave=...}`; se leen al exponer.
+        """
+        self._stats[componente] = funcion
+
+    def exponer(self) -> str:
+        lineas: List[str] = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exponer())
+        if self._stats:
+            lineas += ["# HELP vinai_stats Contadores y estado de los componentes internos (stats()).",
+                       "# TYPE vinai_stats gauge"]
+            for componente, funcion in sorted(self._stats.items()):
+                try:
+                    datos = funcion()
+                except Exception as e:
+                    logger.warning(f"stats() de {componente} falló: {e}")
+                    continue
+                for clave, valor in sorted(datos.items()):
+                    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                        lineas.append(f'vinai_stats{{componente="{_escapar(componente)}",clave="{_escapar(clave)}"}} '
+                                      f"{_numero(valor)}")
+        return "\n".join(lineas) + "\n"
+
+
+# --- Etiqueta de una consulta ---
+
+_VERBO = re.compile(r"^\s*(\w+)", re.IGNORECASE)
+_TABLA = re.compile(r"\b(?:from|into|update|table)\s+`?(\w+)`?", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def etiqueta_consulta(sql: str) -> str:
+    """'select:vinos', 'insert:valoraciones_tour'... (verbo + primera tabla)."""
+    verbo = _VERBO.match(sql)
+    tabla = _TABLA.search(sql)
+    return f"{verbo.group(1).lower() if verbo else '?'}:{tabla.group(1) if tabla else '-'}"
+
+
+# --- Servidor HTTP (para el servidor de acciones, que no expone su app) ---
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def servir_http(puerto: int, registro: Optional[Registro] = None, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """
+    Sirve GET /metrics en un hilo daemon. None si el puerto está ocupado. No hay
+    autenticación: por defecto solo escucha en localhost.
+    """
+    registro = registro or REGISTRO
+
+    class _Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = registro.exponer().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", TIPO_CONTENIDO)
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+    except OSError as e:
+        logger.warning(f"No se pudo abrir el puerto de métricas {puerto}: {e}")
+        return None
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+    return servidor
+
+
+# --- Métricas estándar de VinAI ---
+
+REGISTRO = Registro()
+
+ACCIONES = REGISTRO.histograma(
+    "vinai_accion_segundos", "Duración de cada acción del bot (incluye la espera del executor).", ("accion",))
+ERRORES_ACCION = REGISTRO.contador(
+    "vinai_accion_errores_total", "Acciones que terminaron con una excepción.", ("accion",))
+ESPERA_EXECUTOR = REGISTRO.histograma(
+    "vinai_executor_espera_segundos", "Tiempo que una acción espera un hilo libre del executor de DB.")
+CONSULTAS = REGISTRO.histograma(
+    "vinai_db_consulta_segundos", "Duración de execute() por consulta (verbo:tabla).", ("pool", "consulta"))
+ERRORES_DB = REGISTRO.contador(
+    "vinai_db_errores_total", "Consultas que fallaron, por consulta y código de error.", ("pool", "consulta", "errno"))
+FORMAS = REGISTRO.histograma(
+    "vinai_db_forma_segundos", "Duración de execute() por forma de consulta (huella, ver actions/consultas_lentas).",
+    ("huella",))
+OBTENER_CONEXION = REGISTRO.histograma(
+    "vinai_db_obtener_conexion_segundos", "Tiempo para sacar una conexión del pool (incluye health-check).",
+    ("pool", "resultado"))
+RUTAS = REGISTRO.histograma(
+    "vinai_http_segundos", "Duración de las peticiones del panel por ruta.", ("metodo", "ruta", "estado"))
@@ -0,0 +1,262 @@
+import argparse
+import hashlib
+import logging
+import os
+import re
+import shlex
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import mysql.connector
+
+from actions import versiones
+from actions.db_pool import DB_CONFIG
+from actions.consultas import (QUERIES_DASHBOARD, QUERY_PREFERENCIAS,
+                               FILTROS_RECOMENDACION, consulta_recomendacion)
+
+# --- Migraciones de Esquema ---
+# Migraciones numeradas en `bd/migraciones/NNNN_nombre.sql`, aplicadas en orden
+# sobre el dump `bd/vinai_db_normalizada.sql`. Las aplicadas se registran en
+# `schema_migraciones`; volver a correr `aplicar` no hace nada. El DDL de MySQL
+# no es transaccional, así que si una migración se corta a la mitad, al
+# reintentarla se ignoran los errores de "ya existe" de lo que alcanzó a crear.
+#
+# Cada migración puede declarar verificaciones de plan:
+#     -- @explain <indice> [cubriente]: <consulta>
+# donde <consulta> nombra una de las consultas de actions/consultas.py (las
+# mismas que envían el bot y el panel) con sus argumentos:
+#     dashboard <clave>                 QUERIES_DASHBOARD[clave]
+#     preferencias <usuario_id>         QUERY_PREFERENCIAS
+#     recomendacion [filtro=valor ...]  consulta_recomendacion(**filtros)
+# `verificar` corre EXPLAIN de esa consulta con esos parámetros y exige que use
+# el índice (y, si es cubriente, que lo resuelva solo con el índice: "Using
+# index").
+#
+# El checksum cubre solo las sentencias que se ejecutan: corregir comentarios
+# o verificaciones no marca la migración como modificada.
+#
+# Uso (desde la raíz del proyecto):
+#     python -m actions.migraciones estado
+#     python -m actions.migraciones aplicar
+#     python -m actions.migraciones verificar
+#
+# `verificar` termina con código 1 si alguna verificación da FALLA o si quedan
+# migraciones pendientes. En CI se corre con bd/verificar_migraciones.sh, que
+# arma una base desechable desde el dump, aplica las migraciones y verifica.
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_MIGRACIONES = os.path.join(versiones.PROJECT_PATH, "bd", "migraciones")
+
+# Errores que significan "esto ya estaba hecho": columna o índice duplicado,
+# índice a borrar inexistente.
+ERRORES_IDEMPOTENTES = {1060, 1061, 1091}
+
+_ARCHIVO = re.compile(r"^(\d{4})_(\w+)\.sql$")
+_EXPLAIN = re.compile(r"^--\s*@explain\s+(\w+)(\s+cubriente)?\s*:\s*(.+)$")
+
+_TABLA_REGISTRO = """
+    CREATE TABLE IF NOT EXISTS schema_migraciones (
+        version INT NOT NULL PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        aplicada_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+
+class Verificacion(NamedTuple):
+    indice: str
+    cubriente: bool
+    consulta: str
+
+
+def consulta_real(referencia: str) -> Tuple[str, Tuple]:
+    """(sql, parámetros) de la consulta nombrada en un `@explain` (ver arriba)."""
+    nombre, *argumentos = shlex.split(referencia)
+    if nombre == "dashboard" and len(argumentos) == 1 and argumentos[0] in QUERIES_DASHBOARD:
+        return QUERIES_DASHBOARD[argumentos[0]].strip().rstrip(";"), ()
+    if nombre == "preferencias" and len(argumentos) == 1:
+        return QUERY_PREFERENCIAS, (int(argumentos[0]),)
+    if nombre == "recomendacion":
+        filtros = dict(argumento.split("=", 1) for argumento in argumentos if "=" in argumento)
+        if len(filtros) == len(argumentos) and set(filtros) <= set(FILTROS_RECOMENDACION):
+            sql, parametros = consulta_recomendacion(**filtros)
+            return sql.rstrip(";"), parametros
+    raise ValueError(f"Consulta de @explain desconocida: {referencia!r}")
+
+
+class Migracion(NamedTuple):
+    version: int
+    nombre: str
+    checksum: str
+    sentencias: List[str]
+    verificaciones: List[Verificacion]
+
+
+class ResultadoVerificacion(NamedTuple):
+    migracion: int
+    verificacion: Verificacion
+    ok: bool
+    detalle: str
+
+
+def leer_migracion(ruta: str) -> Migracion:
+    archivo = os.path.basename(ruta)
+    coincidencia = _ARCHIVO.match(archivo)
+    if not coincidencia:
+        raise ValueError(f"Nombre de migración inválido: {archivo} (se espera NNNN_nombre.sql)")
+    with open(ruta, encoding="utf-8") as f:
+        sql = f.read()
+    lineas = []
+    verificaciones = []
+    for linea in sql.splitlines():
+        limpia = linea.strip()
+        explain = _EXPLAIN.match(limpia)
+        if explain:
+            verificacion = Verificacion(explain.group(1), bool(explain.group(2)), explain.group(3).strip())
+            consulta_real(verificacion.consulta)  # Falla al cargar si la referencia no existe
+            verificaciones.append(verificacion)
+        elif limpia and not limpia.startswith("--"):
+            lineas.append(linea)
+    sentencias = [s.strip() for s in "\n".join(lineas).split(";") if s.strip()]
+    return Migracion(
+        version=int(coincidencia.group(1)),
+        nombre=coincidencia.group(2),
+        checksum=hashlib.sha256(";\n".join(sentencias).encode("utf-8")).hexdigest(),
+        sentencias=sentencias,
+        verificaciones=verificaciones,
+    )
+
+
+def cargar_migraciones(directorio: str = DIRECTORIO_MIGRACIONES) -> List[Migracion]:
+    migraciones = [leer_migracion(os.path.join(directorio, a))
+                   for a in sorted(os.listdir(directorio)) if a.endswith(".sql")]
+    vistas = set()
+    for m in migraciones:
+        if m.version in vistas:
+            raise ValueError(f"Versión de migración repetida: {m.version:04d}")
+        vistas.add(m.version)
+    return migraciones
+
+
+def aplicadas(conn) -> Dict[int, str]:
+    """version -> checksum de las migraciones ya aplicadas (crea el registro si falta)."""
+    cursor = conn.cursor()
+    cursor.execute(_TABLA_REGISTRO)
+    cursor.execute("SELECT version, checksum FROM schema_migraciones")
+    resultado = {version: checksum for version, checksum in cursor.fetchall()}
+    cursor.close()
+    return resultado
+
+
+def pendientes(conn, migraciones: List[Migracion]) -> List[Migracion]:
+    hechas = aplicadas(conn)
+    for m in migraciones:
+        if m.version in hechas and hechas[m.version] != m.checksum:
+            logger.warning(f"La migración {m.version:04d}_{m.nombre} cambió después de aplicarse.")
+    return [m for m in migraciones if m.version not in hechas]
+
+
+def aplicar_migracion(conn, migracion: Migracion) -> None:
+    cursor = conn.cursor()
+    try:
+        for sentencia in migracion.sentencias:
+            try:
+                cursor.execute(sentencia)
+            except mysql.connector.Error as err:
+                if err.errno not in ERRORES_IDEMPOTENTES:
+                    raise
+                logger.info(f"{migracion.version:04d}: ya aplicado ({err.msg}), se continúa.")
+        cursor.execute("INSERT INTO schema_migraciones (version, nombre, checksum) VALUES (%s, %s, %s)",
+                       (migracion.version, migracion.nombre, migracion.checksum))
+        conn.commit()
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def aplicar(conn, migraciones: Optional[List[Migracion]] = None) -> List[Migracion]:
+    """Aplica en orden las migraciones pendientes. Devuelve las aplicadas."""
+    migraciones = cargar_migraciones() if migraciones is None else migraciones
+    hechas = []
+    for m in pendientes(conn, migraciones):
+        aplicar_migracion(conn, m)
+        logger.info(f"Migración {m.version:04d}_{m.nombre} aplicada.")
+        hechas.append(m)
+    return hechas
+
+
+def verificar(conn, migraciones: Optional[List[Migracion]] = None) -> List[ResultadoVerificacion]:
+    """EXPLAIN de cada consulta declarada con `-- @explain` y comparación con el índice esperado."""
+    migraciones = cargar_migraciones() if migraciones is None else migraciones
+    resultados = []
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for m in migraciones:
+            for v in m.verificaciones:
+                sql, parametros = consulta_real(v.consulta)
+                cursor.execute(f"EXPLAIN {sql}", parametros or None)
+                ok, detalle = _evaluar_plan(cursor.fetchall(), v)
+                resultados.append(ResultadoVerificacion(m.version, v, ok, detalle))
+    finally:
+        cursor.close()
+    return resultados
+
+
+def _evaluar_plan(filas: List[Dict[str, Any]], v: Verificacion) -> Tuple[bool, str]:
+    plan = "; ".join(
+        f"{f.get('table')}: type={f.get('type')} key={f.get('key')} extra={f.get('Extra') or ''}" for f in filas
+    )
+    for fila in filas:
+        if fila.get("key") == v.indice:
+            if v.cubriente and "Using index" not in (fila.get("Extra") or ""):
+                return False, f"usa {v.indice} pero no como índice cubriente | {plan}"
+            return True, plan
+    return False, f"no usa {v.indice} | {plan}"
+
+
+# --- Línea de comandos (DB_CONFIG en actions/db_pool.py) ---
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Migraciones de esquema de VinAI")
+    parser.add_argument("comando", choices=["estado", "aplicar", "verificar"])
+    parser.add_argument("--base", default=DB_CONFIG["database"],
+                        help="Base sobre la que operar (por defecto la de DB_CONFIG)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    migraciones = cargar_migraciones()
+    conn = mysql.connector.connect(**{**DB_CONFIG, "database": args.base})
+    try:
+        if args.comando == "estado":
+            hechas = aplicadas(conn)
+            for m in migraciones:
+                marca = "aplicada " if m.version in hechas else "pendiente"
+                print(f"[{marca}] {m.version:04d}_{m.nombre}")
+            return 0
+        if args.comando == "aplicar":
+            hechas = aplicar(conn, migraciones)
+            print(f"{len(hechas)} migraciones aplicadas." if hechas else "El esquema ya está al día.")
+            return 0
+        faltan = pendientes(conn, migraciones)
+        if faltan:
+            # Un EXPLAIN sin los índices aún creados no verifica nada
+            for m in faltan:
+                print(f"[FALLA] {m.version:04d}_{m.nombre}: migración pendiente, corre `aplicar` primero")
+            return 1
+        resultados = verificar(conn, migraciones)
+        for r in resultados:
+            print(f"[{'OK' if r.ok else 'FALLA'}] {r.migracion:04d} {r.verificacion.indice}: {r.verificacion.consulta}")
+            if not r.ok:
+                print(f"        {r.detalle}")
+        return 0 if all(r.ok for r in resultados) else 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
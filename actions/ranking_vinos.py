@@ -0,0 +1,342 @@
+import logging
+import re
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from actions import versiones
+from actions.indice_vinos import FilaVino, QUERIES_ETIQUETAS, TABLAS_CATALOGO
+from actions.texto import normalizar
+
+# --- Ranking Vectorizado de Vinos ---
+# El catálogo vive como arreglos de NumPy (uno por atributo, una posición por
+# vino) y cada pedido puntúa *todos* los vinos en una sola pasada:
+#   - lo que el usuario pidió ahora (cepa, tipo, valle, año, característica,
+#     maridaje, nota) suma mucho; lo guardado en preferencias_usuario, poco;
+#   - los atributos de cata (cuerpo, acidez, taninos, dulzor, precio, guarda)
+#     se acercan al perfil que se deduce de las características ("Ligero",
+#     "Robusto", "Dulce"...) y de palabras del mensaje ("económico"...);
+#   - un ruido chico desempata, para no recomendar siempre el mismo.
+# Nunca queda vacío: si ningún vino cumple todo, el primero es el que más
+# cumple y `relajados` dice qué criterios no pudo respetar.
+#
+# Igual que IndiceVinos, se reconstruye cuando cambia la versión del catálogo.
+
+logger = logging.getLogger(__name__)
+
+QUERY_RANKING = """
+    SELECT v.id, v.nombre, v.cepa, v.ano, v.tipo, va.nombre, va.valle, v.link_compra,
+           v.cuerpo, v.acidez, v.taninos, v.dulzor, v.precio_aproximado, v.potencial_guarda
+    FROM vinos v JOIN vinas va ON v.vina_id = va.id
+    ORDER BY v.id
+"""
+
+# Enums de `vinos` -> escala 0..1
+ESCALAS = {
+    "cuerpo": {"ligero": 0.0, "medio": 0.5, "completo": 1.0},
+    "acidez": {"baja": 0.0, "media": 0.5, "alta": 1.0},
+    "taninos": {"bajos": 0.0, "medios": 0.5, "altos": 1.0},
+    "dulzor": {"seco": 0.0, "semi-seco": 0.5, "dulce": 1.0},
+    "precio": {"$": 0.0, "$$": 0.5, "$$$": 1.0},
+}
+ATRIBUTOS_CATA = ("cuerpo", "acidez", "taninos", "dulzor", "precio", "guarda")
+GUARDA_MAXIMA = 10.0  # años; "10+ años" y más quedan en 1.0
+
+# Característica o palabra del mensaje -> perfil buscado (atributo -> 0..1)
+PERFILES = {
+    "ligero": {"cuerpo": 0.0, "taninos": 0.0},
+    "robusto": {"cuerpo": 1.0, "taninos": 1.0},
+    "dulce": {"dulzor": 1.0},
+    "seco": {"dulzor": 0.0},
+    "fresco": {"acidez": 1.0, "cuerpo": 0.25},
+    "joven": {"guarda": 0.0},
+    "reserva": {"guarda": 0.8, "cuerpo": 0.75},
+    "suave": {"taninos": 0.0, "acidez": 0.25},
+    "intenso": {"cuerpo": 1.0},
+    "economico": {"precio": 0.0},
+    "barato": {"precio": 0.0},
+    "premium": {"precio": 1.0},
+    "guardar": {"guarda": 1.0},
+}
+
+# Pesos: un criterio pedido vale más que cualquier suma de preferencias y
+# perfil, así que se relaja primero lo guardado y lo menos importante.
+PESOS_PEDIDO = {"cepa": 12.0, "tipo": 12.0, "maridaje": 10.0, "valle": 9.0,
+                "nota_sabor": 8.0, "caracteristica": 8.0, "ano": 6.0}
+PESO_PREFERENCIA = 2.0
+PESO_PERFIL = 1.5
+RUIDO = 0.5
+TOLERANCIA_ANO = 3  # Años vecinos suman menos, hasta esta distancia
+# El puntaje de los criterios se acumula en int16, en cuartos de punto (un
+# año vecino suma 3/4, 2/4...): la mitad de memoria que float32 y sin
+# conversiones en la pasada sobre todo el catálogo.
+UNIDADES = TOLERANCIA_ANO + 1
+MAX_PISO_EXACTO = 4096  # Con más vinos cerca del mejor, el piso se acota sin mirarlos uno a uno
+
+# tipo_preferencia de preferencias_usuario -> criterio
+PREFERENCIA_A_CRITERIO = {"cepa": "cepa", "tipo_vino": "tipo", "valle": "valle",
+                          "maridaje": "maridaje", "caracteristica": "caracteristica"}
+
+_NUMEROS = re.compile(r"\d+")
+
+
+def guarda_en_anos(texto: Optional[str]) -> float:
+    """'Beber ahora' -> 0, '3-5 años' -> 4, '10+ años' -> 10; NaN si no se entiende."""
+    if not texto:
+        return float("nan")
+    numeros = [int(n) for n in _NUMEROS.findall(texto)]
+    if not numeros:
+        return 0.0 if "ahora" in normalizar(texto) else float("nan")
+    return sum(numeros) / len(numeros)
+
+
+class Resultado(NamedTuple):
+    fila: FilaVino
+    puntaje: float
+    relajados: Tuple[str, ...]  # Criterios pedidos que este vino no cumple
+
+
+class _EstadoRanking:
+    """Foto inmutable del catálogo en arreglos; se reemplaza completa al refrescar."""
+
+    def __init__(self, filas: List[Tuple], etiquetas: Dict[str, List[Tuple[int, str]]],
+                 version: Tuple[int, ...]):
+        self.version = version
+        self.filas: List[FilaVino] = [tuple(f[:8]) for f in filas]
+        self.total = len(filas)
+        posicion_por_id = {f[0]: pos for pos, f in enumerate(filas)}
+
+        # Categóricos: código por valor normalizado (-1 = sin dato)
+        self.codigos: Dict[str, np.ndarray] = {}
+        self.valores: Dict[str, Dict[str, int]] = {}
+        for atributo, columna in (("cepa", 2), ("tipo", 4), ("valle", 6)):
+            vocabulario: Dict[str, int] = {}
+            codigos = np.full(self.total, -1, dtype=np.int32)
+            for pos, f in enumerate(filas):
+                if f[columna]:
+                    codigos[pos] = vocabulario.setdefault(normalizar(f[columna]), len(vocabulario))
+            self.codigos[atributo] = codigos.astype(np.int16) if len(vocabulario) < 2 ** 15 else codigos
+            self.valores[atributo] = vocabulario
+        self.anos = np.array([f[3] or 0 for f in filas], dtype=np.int16)
+
+        # Atributos de cata en 0..1 (NaN = sin dato)
+        self.cata: Dict[str, np.ndarray] = {}
+        for atributo, columna in (("cuerpo", 8), ("acidez", 9), ("taninos", 10), ("dulzor", 11), ("precio", 12)):
+            escala = ESCALAS[atributo]
+            self.cata[atributo] = np.array(
+                [escala.get(normalizar(f[columna]) if f[columna] else "", np.nan) for f in filas], dtype=np.float32)
+        self.cata["guarda"] = np.minimum(
+            np.array([guarda_en_anos(f[13]) for f in filas], dtype=np.float32) / GUARDA_MAXIMA, 1.0)
+        # Las combinaciones de cata distintas son pocas (niveles discretos):
+        # cada vino guarda el código de la suya y el perfil se puntúa por combinación.
+        matriz = np.nan_to_num(np.stack([self.cata[a] for a in ATRIBUTOS_CATA], axis=1), nan=-1.0) \
+            if self.total else np.zeros((0, len(ATRIBUTOS_CATA)), dtype=np.float32)
+        combinaciones, codigos = np.unique(matriz, axis=0, return_inverse=True)
+        combinaciones[combinaciones < 0] = np.nan
+        self.combinaciones_cata = combinaciones.astype(np.float32)
+        self.codigo_cata = codigos.reshape(-1).astype(np.int32)
+        self.vinos_por_combinacion = np.bincount(self.codigo_cata, minlength=len(combinaciones))
+        self.posiciones_cata = np.split(np.argsort(self.codigo_cata, kind="stable"),
+                                        np.cumsum(self.vinos_por_combinacion)[:-1])
+        # Ruido precalculado: cada pedido toma una ventana al azar
+        self.ruido = np.random.default_rng().random(2 * self.total, dtype=np.float32) * np.float32(RUIDO)
+
+        # Etiquetas (varias por vino): valor normalizado -> máscara de los vinos que la tienen
+        self.etiquetas: Dict[str, Dict[str, np.ndarray]] = {}
+        for atributo, pares in etiquetas.items():
+            mascaras: Dict[str, np.ndarray] = {}
+            for vino_id, nombre in pares:
+                pos = posicion_por_id.get(vino_id)
+                if pos is not None and nombre:
+                    mascara = mascaras.get(normalizar(nombre))
+                    if mascara is None:
+                        mascara = mascaras[normalizar(nombre)] = np.zeros(self.total, dtype=bool)
+                    mascara[pos] = True
+            self.etiquetas[atributo] = mascaras
+        self.ninguno = np.zeros(self.total, dtype=bool)  # Etiqueta que ningún vino tiene
+
+
+class RankingVinos:
+    def __init__(self, get_connection: Callable[[], Any], semilla: Optional[int] = None):
+        self._get_connection = get_connection
+        self._estado: Optional[_EstadoRanking] = None
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(semilla)
+
+    # --- Refresco ---
+    def refrescar(self) -> None:
+        version = versiones.versiones(TABLAS_CATALOGO)
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(QUERY_RANKING)
+            filas = cursor.fetchall()
+            etiquetas = {}
+            for atributo, query in QUERIES_ETIQUETAS.items():
+                cursor.execute(query)
+                etiquetas[atributo] = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+        self.cargar(filas, etiquetas, version)
+
+    def cargar(self, filas: List[Tuple], etiquetas: Dict[str, List[Tuple[int, str]]],
+               version: Tuple[int, ...]) -> None:
+        """Publica un catálogo ya leído (filas de QUERY_RANKING y pares de QUERIES_ETIQUETAS)."""
+        self._estado = _EstadoRanking(filas, etiquetas, version)
+        logger.debug(f"RankingVinos: {self._estado.total} vinos cargados.")
+
+    def asegurar_vigente(self) -> _EstadoRanking:
+        estado = self._estado
+        if estado is not None and estado.version == versiones.versiones(TABLAS_CATALOGO):
+            return estado
+        with self._lock:
+            estado = self._estado
+            if estado is None or estado.version != versiones.versiones(TABLAS_CATALOGO):
+                self.refrescar()
+            return self._estado
+
+    # --- Puntaje ---
+    def _sumar(self, estado: _EstadoRanking, puntaje: np.ndarray, auxiliar: np.ndarray, criterio: str,
+               valor: Any, peso: float) -> Optional[Tuple[np.ndarray, Any]]:
+        """
+        Suma a `puntaje` (en el lugar, cuartos de punto) lo que cada vino cumple de
+        `criterio` con `peso` puntos; `auxiliar` es un int16 del mismo largo para no
+        reservar memoria en cada paso. Devuelve (arreglo, esperado): el vino en `pos`
+        lo cumple del todo si arreglo[pos] == esperado. None si el valor no se entiende.
+        """
+        if criterio == "ano":
+            try:
+                ano = int(valor)
+            except (TypeError, ValueError):
+                return None
+            if not 0 < ano < 2 ** 15:
+                return None
+            # (UNIDADES - min(|año - pedido|, UNIDADES)) * peso; clip es varias
+            # veces más rápido que np.minimum con un escalar sobre int16.
+            np.subtract(estado.anos, np.int16(ano), out=auxiliar)
+            np.clip(auxiliar, -UNIDADES, UNIDADES, out=auxiliar)
+            np.abs(auxiliar, out=auxiliar)
+            np.multiply(auxiliar, np.int16(-peso), out=auxiliar)
+            auxiliar += np.int16(peso * UNIDADES)
+            puntaje += auxiliar
+            return estado.anos, ano
+        if criterio in ("cepa", "tipo"):
+            codigo = estado.valores[criterio].get(normalizar(valor), -2)
+            mascara, cheque = estado.codigos[criterio] == codigo, (estado.codigos[criterio], codigo)
+        elif criterio == "valle":
+            # Como `va.valle LIKE '%valle%'`: todos los valles que lo contienen
+            buscado = normalizar(valor)
+            mascara = np.zeros(estado.total, dtype=bool)
+            for nombre, codigo in estado.valores["valle"].items():
+                if buscado in nombre:
+                    mascara |= estado.codigos["valle"] == codigo
+            cheque = (mascara, True)
+        else:
+            mascara = estado.etiquetas.get(criterio, {}).get(normalizar(valor))
+            if mascara is None:
+                return estado.ninguno, True
+            cheque = (mascara, True)
+        np.multiply(mascara, np.int16(peso * UNIDADES), out=auxiliar)
+        puntaje += auxiliar
+        return cheque
+
+    @staticmethod
+    def perfil(pedido: Dict[str, Any], preferencias: Dict[str, str], texto: str = "") -> Dict[str, float]:
+        """Perfil de cata buscado, desde las características y las palabras del mensaje."""
+        objetivos: Dict[str, List[float]] = {}
+        fuentes = [pedido.get("caracteristica"), preferencias.get("caracteristica")]
+        fuentes += normalizar(texto).split() if texto else []
+        for fuente in fuentes:
+            for atributo, valor in PERFILES.get(normalizar(fuente) if fuente else "", {}).items():
+                objetivos.setdefault(atributo, []).append(valor)
+        return {atributo: sum(v) / len(v) for atributo, v in objetivos.items()}
+
+    def mejores(self, k: int = 5, preferencias: Optional[Dict[str, str]] = None, texto: str = "",
+                **pedido) -> List[Resultado]:
+        """Los `k` vinos con mejor puntaje para el pedido (nunca vacío si hay catálogo)."""
+        estado = self.asegurar_vigente()
+        if not estado.total or k < 1:
+            return []
+        preferencias = preferencias or {}
+        k = min(k, estado.total)
+        puntaje = np.zeros(estado.total, dtype=np.int16)  # En cuartos de punto
+        auxiliar = np.empty(estado.total, dtype=np.int16)
+        cumple: Dict[str, Tuple[np.ndarray, Any]] = {}
+
+        # 1) Criterios pedidos y preferencias guardadas: comparaciones sobre todo el catálogo
+        for criterio, valor in pedido.items():
+            if valor and criterio in PESOS_PEDIDO:
+                cheque = self._sumar(estado, puntaje, auxiliar, criterio, valor, PESOS_PEDIDO[criterio])
+                if cheque is not None:
+                    cumple[criterio] = cheque
+        for tipo_pref, valor in preferencias.items():
+            criterio = PREFERENCIA_A_CRITERIO.get(tipo_pref)
+            if valor and criterio and not pedido.get(criterio):
+                self._sumar(estado, puntaje, auxiliar, criterio, valor, PESO_PREFERENCIA)
+
+        perfil = self.perfil(pedido, preferencias, texto)
+        penalizacion = None
+        if perfil:
+            # Penalización por combinación de cata; sin dato: a mitad de camino
+            penalizacion = np.zeros(len(estado.combinaciones_cata), dtype=np.float32)
+            for atributo, objetivo in perfil.items():
+                columna = estado.combinaciones_cata[:, ATRIBUTOS_CATA.index(atributo)]
+                penalizacion += np.nan_to_num(np.abs(columna - np.float32(objetivo)), nan=0.5)
+            penalizacion *= np.float32(PESO_PERFIL)
+
+        # 2) Perfil y ruido mueven el puntaje a lo sumo `margen`, así que el
+        #    top-k sale de los vinos cerca del mejor puntaje de criterios.
+        minimo = float(penalizacion.min()) if penalizacion is not None else 0.0
+        rango = float(penalizacion.max()) - minimo if penalizacion is not None else 0.0
+        margen = int(np.ceil((rango + RUIDO) * UNIDADES))
+        maximo = int(puntaje.max())
+        candidatos = None
+        if penalizacion is not None and maximo == int(puntaje.min()):
+            # Todos empatan en los criterios (p. ej. solo "algo económico"):
+            # bastan las combinaciones de cata que alcanzan a las k mejores.
+            orden_comb = np.argsort(penalizacion, kind="stable")
+            alcanza = int(np.searchsorted(np.cumsum(estado.vinos_por_combinacion[orden_comb]), k))
+            umbral = penalizacion[orden_comb[min(alcanza, len(orden_comb) - 1)]] + np.float32(RUIDO)
+            elegidas = orden_comb[penalizacion[orden_comb] <= umbral]
+            candidatos = np.concatenate([estado.posiciones_cata[c] for c in elegidas])
+        else:
+            # La franja bajo el mejor se ensancha al doble hasta tener k vinos
+            # (con puntaje acotado a int16 son pocas vueltas).
+            paso = margen
+            while np.count_nonzero(puntaje >= maximo - paso) < k:
+                paso *= 2
+            nivel = maximo - paso
+            arriba = np.flatnonzero(puntaje >= nivel)
+            # Los de `arriba` son al menos k con un final de `piso` o más (el
+            # ruido solo suma); un vino con puntaje p no pasa de p + RUIDO -
+            # penalización mínima, así que bajo `umbral` nadie los alcanza.
+            if len(arriba) > MAX_PISO_EXACTO:
+                piso = nivel / UNIDADES - minimo - rango
+            else:
+                finales = puntaje[arriba].astype(np.float32) / np.float32(UNIDADES)
+                if penalizacion is not None:
+                    finales -= penalizacion[estado.codigo_cata[arriba]]
+                piso = float(np.partition(finales, len(finales) - k)[len(finales) - k])
+            umbral = int(np.floor((piso - RUIDO + minimo) * UNIDADES))
+            candidatos = arriba if umbral >= nivel else np.flatnonzero(puntaje >= umbral)
+            if len(candidatos) == estado.total:
+                candidatos = None
+
+        total = estado.total if candidatos is None else len(candidatos)
+        base = puntaje if candidatos is None else puntaje[candidatos]
+        final = base.astype(np.float32) / np.float32(UNIDADES)
+        inicio = int(self._rng.integers(0, estado.total + 1))
+        final += estado.ruido[inicio:inicio + total]
+        if penalizacion is not None:
+            codigos = estado.codigo_cata if candidatos is None else estado.codigo_cata[candidatos]
+            final -= penalizacion[codigos]
+
+        orden = np.argpartition(final, len(final) - k)[len(final) - k:]
+        orden = orden[np.argsort(-final[orden])]
+        posiciones = orden if candidatos is None else candidatos[orden]
+        # Qué criterios pedidos no cumple cada uno, solo en las k posiciones
+        fallas = {c: arreglo[posiciones] != esperado for c, (arreglo, esperado) in cumple.items()}
+        return [Resultado(estado.filas[pos], float(final[i]), tuple(c for c, falla in fallas.items() if falla[j]))
+                for j, (i, pos) in enumerate(zip(orden, posiciones))]
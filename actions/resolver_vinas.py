@@ -0,0 +1,159 @@
+import logging
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+
+from actions import versiones
+from actions.texto import normalizar
+
+# --- Resolución Difusa de Nombres de Viñas ---
+# Reemplaza `SELECT id FROM vinas WHERE nombre LIKE '%x%'`. Índice de trigramas
+# en memoria sobre `vinas.nombre` para preseleccionar candidatos y distancia de
+# edición para puntuarlos. Tolera errores de tipeo, tildes y palabras de más
+# ("la viña montes", "errazuris").
+
+logger = logging.getLogger(__name__)
+
+TABLAS_RESOLVER = ("vinas",)
+PUNTAJE_MINIMO = 0.75
+MAX_CANDIDATOS = 8
+
+# Palabras que no distinguen una viña de otra
+PALABRAS_GENERICAS = {"vina", "vinas", "vinedo", "vinedos", "bodega", "bodegas",
+                      "la", "el", "los", "las", "de", "del", "y"}
+
+
+class VinaResuelta(NamedTuple):
+    id: int
+    nombre: str
+    puntaje: float
+
+
+def nucleo_de(texto_normalizado: str) -> str:
+    palabras = [p for p in texto_normalizado.split() if p not in PALABRAS_GENERICAS]
+    return " ".join(palabras) or texto_normalizado
+
+
+def _trigramas(texto: str) -> Set[str]:
+    relleno = f"  {texto} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def _similitud_edicion(a: str, b: str) -> float:
+    """1 - distancia de Levenshtein normalizada por el largo mayor."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    if len(a) < len(b):
+        a, b = b, a
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        anterior = actual
+    return 1.0 - anterior[-1] / len(a)
+
+
+def _contiene_palabras(mayor: str, menor: str) -> bool:
+    return len(menor) >= 4 and f" {menor} " in f" {mayor} "
+
+
+class _EstadoResolver:
+    def __init__(self, filas: List[Any], version):
+        self.version = version
+        self.nombres: Dict[int, str] = {}
+        self.normalizados: Dict[int, str] = {}
+        self.nucleos: Dict[int, str] = {}
+        self.exactos: Dict[str, int] = {}
+        self.exactos_nucleo: Dict[str, int] = {}
+        self.trigramas: Dict[str, List[int]] = {}
+        for vina_id, nombre in filas:
+            if not nombre:
+                continue
+            norm = normalizar(nombre)
+            nucleo = nucleo_de(norm)
+            self.nombres[vina_id] = nombre
+            self.normalizados[vina_id] = norm
+            self.nucleos[vina_id] = nucleo
+            self.exactos.setdefault(norm, vina_id)
+            self.exactos_nucleo.setdefault(nucleo, vina_id)
+            for tri in _trigramas(nucleo):
+                self.trigramas.setdefault(tri, []).append(vina_id)
+
+
+class ResolverVinas:
+    """Compartido por la validación del formulario, el guardado de valoraciones y la búsqueda de tours."""
+
+    def __init__(self, get_connection: Callable[[], Any]):
+        self._get_connection = get_connection
+        self._estado: Optional[_EstadoResolver] = None
+        self._lock = threading.Lock()
+
+    def refrescar(self) -> None:
+        version = versiones.versiones(TABLAS_RESOLVER)
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, nombre FROM vinas ORDER BY id")
+            filas = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+        self._estado = _EstadoResolver(filas, version)
+        logger.debug(f"ResolverVinas: {len(self._estado.nombres)} viñas indexadas.")
+
+    def asegurar_vigente(self) -> _EstadoResolver:
+        estado = self._estado
+        if estado is not None and estado.version == versiones.versiones(TABLAS_RESOLVER):
+            return estado
+        with self._lock:
+            estado = self._estado
+            if estado is None or estado.version != versiones.versiones(TABLAS_RESOLVER):
+                self.refrescar()
+            return self._estado
+
+    def nombre(self, vina_id: int) -> Optional[str]:
+        return self.asegurar_vigente().nombres.get(vina_id)
+
+    def resolver(self, texto: str) -> Optional[VinaResuelta]:
+        """La viña con mejor puntaje para lo que escribió el usuario, o None si ninguna es convincente."""
+        estado = self.asegurar_vigente()
+        consulta = normalizar(texto)
+        if not consulta:
+            return None
+        vina_id = estado.exactos.get(consulta)
+        if vina_id is not None:
+            return VinaResuelta(vina_id, estado.nombres[vina_id], 1.0)
+
+        nucleo = nucleo_de(consulta)
+        vina_id = estado.exactos_nucleo.get(nucleo)
+        if vina_id is not None:
+            return VinaResuelta(vina_id, estado.nombres[vina_id], 1.0)
+
+        trigramas = _trigramas(nucleo)
+        coincidencias = Counter()
+        for tri in trigramas:
+            for candidato in estado.trigramas.get(tri, ()):
+                coincidencias[candidato] += 1
+        minimo = max(1, len(trigramas) // 4)
+
+        mejor = None
+        mejor_clave = None
+        for candidato, comunes in coincidencias.most_common(MAX_CANDIDATOS):
+            if comunes < minimo:
+                break
+            nucleo_cand = estado.nucleos[candidato]
+            if _contiene_palabras(nucleo, nucleo_cand) or _contiene_palabras(nucleo_cand, nucleo):
+                puntaje = 0.9
+            else:
+                puntaje = _similitud_edicion(nucleo, nucleo_cand)
+            # Desempate: más puntaje, luego el nombre de largo más parecido, luego el id menor
+            clave = (puntaje, -abs(len(estado.normalizados[candidato]) - len(consulta)), -candidato)
+            if mejor_clave is None or clave > mejor_clave:
+                mejor, mejor_clave = candidato, clave
+
+        if mejor is None or mejor_clave[0] < PUNTAJE_MINIMO:
+            return None
+        return VinaResuelta(mejor, estado.nombres[mejor], round(mejor_clave[0], 3))
@@ -0,0 +1,195 @@
+import math
+import multiprocessing
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Optional
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# --- Hash de Contraseñas Fuera del Hilo de la Petición ---
+# El scrypt de werkzeug (scrypt:32768:8:1) gasta decenas de ms de CPU y ~32 MB
+# por llamada. Se ejecuta en un pool de procesos acotado: el hilo que atiende
+# la petición solo espera el resultado (sin retener el GIL) y, si ya hay
+# `max_procesos + max_en_cola` hashes en curso, se rechaza de inmediato con
+# `HashSaturado` en vez de encolar sin límite.
+#
+# El cupo se devuelve cuando el hash termina de verdad (callback del futuro),
+# no cuando el llamador deja de esperar: tras un timeout el proceso sigue
+# ocupado y `cancel()` no lo detiene. Los procesos se crean con forkserver
+# (spawn en Windows) para no heredar por fork los hilos y conexiones del panel.
+#
+# `Limitador` cuenta intentos fallidos por clave (IP, email) en una ventana
+# deslizante para frenar ráfagas de login.
+
+MAX_PROCESOS_DEFAULT = 2
+MAX_EN_COLA_DEFAULT = 8
+TIMEOUT_HASH = 10.0
+METODO_INICIO = "spawn" if sys.platform == "win32" else "forkserver"
+MUESTRAS_LATENCIA = 1000
+
+
+class HashSaturado(RuntimeError):
+    """Hay demasiados hashes en curso; el llamador debe responder 'intenta más tarde'."""
+
+
+def _percentil(ordenadas, p: float) -> float:
+    if not ordenadas:
+        return 0.0
+    return ordenadas[min(len(ordenadas) - 1, int(math.ceil(p * len(ordenadas))) - 1)]
+
+
+class PoolHash:
+    def __init__(self, max_procesos: int = MAX_PROCESOS_DEFAULT, max_en_cola: int = MAX_EN_COLA_DEFAULT,
+                 timeout: float = TIMEOUT_HASH, nombre: str = "hash"):
+        self.max_procesos = max_procesos
+        self.max_en_cola = max_en_cola
+        self.timeout = timeout
+        self.nombre = nombre
+        self._cupos = threading.BoundedSemaphore(max_procesos + max_en_cola)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._en_vuelo = 0
+        self._latencias: Dict[str, Deque[float]] = {
+            "generar": deque(maxlen=MUESTRAS_LATENCIA),
+            "verificar": deque(maxlen=MUESTRAS_LATENCIA),
+        }
+        self._contadores = {"generar": 0, "verificar": 0, "rechazadas": 0, "errores": 0}
+
+    def _obtener_executor(self) -> ProcessPoolExecutor:
+        # Se crea al primer uso: importar el módulo no levanta procesos
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_procesos,
+                                                     mp_context=multiprocessing.get_context(METODO_INICIO))
+            return self._executor
+
+    def _liberar(self, _futuro=None) -> None:
+        with self._lock:
+            self._en_vuelo -= 1
+        self._cupos.release()
+
+    def _ejecutar(self, operacion: str, func: Callable[..., Any], *args) -> Any:
+        if not self._cupos.acquire(blocking=False):
+            with self._lock:
+                self._contadores["rechazadas"] += 1
+            raise HashSaturado(f"{self.nombre}: {self.max_procesos + self.max_en_cola} hashes en curso.")
+        with self._lock:
+            self._en_vuelo += 1
+        inicio = time.perf_counter()
+        try:
+            try:
+                futuro = self._obtener_executor().submit(func, *args)
+            except BaseException:
+                self._liberar()
+                raise
+            # Tras un timeout el hash sigue corriendo: el cupo se libera cuando termine
+            futuro.add_done_callback(self._liberar)
+            try:
+                return futuro.result(timeout=self.timeout)
+            except BaseException:
+                futuro.cancel()
+                raise
+        except BrokenProcessPool:
+            # Un proceso murió (p. ej. sin memoria): se recrea el pool en la próxima llamada
+            with self._lock:
+                self._executor = None
+                self._contadores["errores"] += 1
+            raise
+        except Exception:
+            with self._lock:
+                self._contadores["errores"] += 1
+            raise
+        finally:
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            with self._lock:
+                self._contadores[operacion] += 1
+                self._latencias[operacion].append(duracion_ms)
+
+    def generar(self, password: str) -> str:
+        return self._ejecutar("generar", generate_password_hash, password)
+
+    def verificar(self, password_hash: str, password: str) -> bool:
+        return self._ejecutar("verificar", check_password_hash, password_hash, password)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            datos: Dict[str, Any] = dict(self._contadores)
+            datos.update({
+                "nombre": self.nombre,
+                "max_procesos": self.max_procesos,
+                "max_en_cola": self.max_en_cola,
+                "en_vuelo": self._en_vuelo,
+                "en_cola": max(0, self._en_vuelo - self.max_procesos),
+            })
+            for operacion, muestras in self._latencias.items():
+                ordenadas = sorted(muestras)
+                datos[f"{operacion}_p50_ms"] = round(_percentil(ordenadas, 0.50), 2)
+                datos[f"{operacion}_p95_ms"] = round(_percentil(ordenadas, 0.95), 2)
+                datos[f"{operacion}_max_ms"] = round(ordenadas[-1], 2) if ordenadas else 0.0
+        return datos
+
+    def cerrar(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Limitador:
+    """Máximo `max_intentos` fallos por clave dentro de `ventana` segundos."""
+
+    def __init__(self, max_intentos: int, ventana: float, max_claves: int = 10000):
+        self.max_intentos = max_intentos
+        self.ventana = ventana
+        self.max_claves = max_claves
+        self._fallos: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bloqueos = 0
+
+    def _vigentes(self, clave: str, ahora: float) -> Optional[Deque[float]]:
+        fallos = self._fallos.get(clave)
+        if fallos is None:
+            return None
+        while fallos and fallos[0] <= ahora - self.ventana:
+            fallos.popleft()
+        if not fallos:
+            del self._fallos[clave]
+            return None
+        return fallos
+
+    def espera(self, *claves: Optional[str]) -> float:
+        """Segundos que faltan para poder intentar de nuevo (0 si se puede ya)."""
+        ahora = time.monotonic()
+        espera = 0.0
+        with self._lock:
+            for clave in filter(None, claves):
+                fallos = self._vigentes(clave, ahora)
+                if fallos is not None and len(fallos) >= self.max_intentos:
+                    espera = max(espera, fallos[0] + self.ventana - ahora)
+            if espera:
+                self._bloqueos += 1
+        return espera
+
+    def fallo(self, *claves: Optional[str]) -> None:
+        ahora = time.monotonic()
+        with self._lock:
+            for clave in filter(None, claves):
+                fallos = self._fallos.setdefault(clave, deque(maxlen=self.max_intentos))
+                fallos.append(ahora)
+                self._fallos.move_to_end(clave)
+            while len(self._fallos) > self.max_claves:
+                self._fallos.popitem(last=False)
+
+    def exito(self, *claves: Optional[str]) -> None:
+        with self._lock:
+            for clave in filter(None, claves):
+                self._fallos.pop(clave, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"claves": len(self._fallos), "bloqueos": self._bloqueos,
+                    "max_intentos": self.max_intentos, "ventana_s": self.ventana}
@@ -0,0 +1,293 @@
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# --- Similitud entre Viñas (filtrado colaborativo ítem-ítem) ---
+# "A quienes les gustó X también les gustó Y" a partir de valoraciones_tour.
+# Cada valoración pesa `rating - 3` (5 -> +2, 3 -> 0, 1 -> -2) y la similitud
+# de dos viñas es el coseno de esos pesos sobre los usuarios que valoraron
+# ambas, encogido por `n / (n + ENCOGIMIENTO)` para que un solo usuario en
+# común no dé similitud 1.
+#
+# Se guardan, por par de viñas valoradas por un mismo usuario, el producto
+# punto y la cantidad de usuarios en común (matriz dispersa), más la norma de
+# cada viña. De ahí sale, por viña, la lista de sus VECINAS_MAX vecinas más
+# similares ya ordenada: una recomendación solo recorre esas listas, nunca las
+# valoraciones.
+#
+# - `reconstruir` lee todas las valoraciones y arma el modelo desde cero; la
+#   corre un hilo al iniciar y luego cada `intervalo_reconstruccion`.
+# - `actualizar` aplica una valoración nueva (o que reemplaza a la anterior
+#   del mismo usuario) sobre los productos y normas en O(viñas del usuario) y
+#   marca las viñas afectadas; el mismo hilo recalcula sus listas de vecinas.
+# - `similares` y `recomendar` leen sin lock: las listas de vecinas y el dict
+#   de valoraciones de cada usuario se reemplazan enteros, nunca se modifican.
+
+logger = logging.getLogger(__name__)
+
+QUERY_VALORACIONES = "SELECT usuario_id, vina_id, rating FROM valoraciones_tour"
+
+RATING_NEUTRO = 3          # Centro de la escala 1-5: ni gusta ni disgusta
+ENCOGIMIENTO = 5.0         # Usuarios en común para llegar a la mitad de la similitud
+VECINAS_MAX = 20           # Vecinas guardadas por viña
+SEMILLAS_MAX = 5           # Viñas del usuario que se usan para recomendar
+INTERVALO_RECONSTRUCCION_DEFAULT = 6 * 3600.0
+ESPERA_RECALCULO = 1.0     # Segundos que se juntan actualizaciones antes de recalcular listas
+# Valoraciones recientes que se reaplican sobre una reconstrucción: cubren las
+# que seguían en la cola de escritura cuando se leyó la DB.
+MARGEN_REAPLICAR = 300.0
+MAX_RECIENTES = 10000
+
+
+class Recomendacion(NamedTuple):
+    vina_id: int
+    puntaje: float
+    semilla_id: int   # La viña valorada por el usuario que más aportó
+
+
+def _peso(rating: Any) -> float:
+    return float(rating) - RATING_NEUTRO
+
+
+class _Modelo:
+    def __init__(self):
+        self.por_usuario: Dict[int, Dict[int, float]] = {}   # usuario -> {viña: peso}
+        self.pares: Dict[int, Dict[int, List[float]]] = {}   # viña -> {viña: [producto, en_común]}
+        self.norma2: Dict[int, float] = {}
+        self.vecinas: Dict[int, Tuple[Tuple[int, float], ...]] = {}
+        self.valoraciones = 0
+
+    def aplicar(self, usuario_id: int, vina_id: int, peso: Optional[float]) -> Iterable[int]:
+        """Fija (o borra, con None) el peso de una valoración; devuelve las viñas cuyas listas cambian."""
+        propias = self.por_usuario.get(usuario_id, {})
+        anterior = propias.get(vina_id)
+        if anterior == peso:
+            return ()
+        nuevo = peso if peso is not None else 0.0
+        delta = nuevo - (anterior if anterior is not None else 0.0)
+        en_comun = (peso is not None) - (anterior is not None)
+        fila = self.pares.setdefault(vina_id, {})
+        # La norma de `vina_id` entra en su similitud con todas sus vecinas
+        afectadas = {vina_id, *fila}
+        for otra, peso_otra in propias.items():
+            if otra == vina_id:
+                continue
+            par = fila.get(otra)
+            if par is None:
+                par = fila[otra] = [0.0, 0]
+                self.pares.setdefault(otra, {})[vina_id] = par   # La misma lista en ambos sentidos
+            par[0] += delta * peso_otra
+            par[1] += en_comun
+            if par[1] <= 0:
+                del fila[otra]
+                del self.pares[otra][vina_id]
+        self.norma2[vina_id] = self.norma2.get(vina_id, 0.0) + nuevo * nuevo - (anterior or 0.0) ** 2
+        self.valoraciones += en_comun
+        # Dict nuevo en vez de modificar el actual: `recomendar` lo copia sin lock
+        propias = dict(propias)
+        if peso is None:
+            del propias[vina_id]
+        else:
+            propias[vina_id] = peso
+        self.por_usuario[usuario_id] = propias
+        afectadas.update(fila)
+        return afectadas
+
+    def similitud(self, a: int, b: int, par: List[float]) -> float:
+        normas = self.norma2.get(a, 0.0) * self.norma2.get(b, 0.0)
+        if normas <= 1e-12:
+            return 0.0
+        return par[0] / math.sqrt(normas) * (par[1] / (par[1] + ENCOGIMIENTO))
+
+    def recalcular(self, vina_id: int) -> None:
+        candidatas = ((otra, self.similitud(vina_id, otra, par))
+                      for otra, par in self.pares.get(vina_id, {}).items())
+        mejores = heapq.nlargest(VECINAS_MAX, (c for c in candidatas if c[1] > 0), key=lambda c: c[1])
+        if mejores:
+            self.vecinas[vina_id] = tuple((otra, round(sim, 4)) for otra, sim in mejores)
+        else:
+            self.vecinas.pop(vina_id, None)
+
+
+class SimilitudVinas:
+    def __init__(self, get_connection: Callable[[], Any],
+                 intervalo_reconstruccion: float = INTERVALO_RECONSTRUCCION_DEFAULT):
+        self._get_connection = get_connection
+        self.intervalo_reconstruccion = intervalo_reconstruccion
+        self._modelo: Optional[_Modelo] = None
+        self._lock = threading.Lock()
+        self._sucias: Set[int] = set()
+        self._recientes: Deque[Tuple[float, int, int, Optional[float]]] = deque(maxlen=MAX_RECIENTES)
+        self._despertar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._detenido = False
+        self._stats = {"reconstrucciones": 0, "actualizaciones": 0, "listas_recalculadas": 0,
+                       "errores": 0, "ultima_reconstruccion_ms": 0.0}
+
+    # --- Construcción ---
+
+    def reconstruir(self) -> None:
+        inicio = time.time()
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(QUERY_VALORACIONES)
+            filas = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+        modelo = _Modelo()
+        for usuario_id, vina_id, rating in filas:
+            modelo.por_usuario.setdefault(int(usuario_id), {})[int(vina_id)] = _peso(rating)
+        for propias in modelo.por_usuario.values():
+            items = list(propias.items())
+            for i, (a, peso_a) in enumerate(items):
+                modelo.norma2[a] = modelo.norma2.get(a, 0.0) + peso_a * peso_a
+                fila_a = modelo.pares.setdefault(a, {})
+                for b, peso_b in items[i + 1:]:
+                    par = fila_a.get(b)
+                    if par is None:
+                        par = fila_a[b] = [0.0, 0]
+                        modelo.pares.setdefault(b, {})[a] = par
+                    par[0] += peso_a * peso_b
+                    par[1] += 1
+        modelo.valoraciones = len(filas)
+        for vina_id in modelo.pares:
+            modelo.recalcular(vina_id)
+        with self._lock:
+            # Lo valorado mientras se leía (o aún en la cola de escritura) se
+            # vuelve a aplicar; `aplicar` es idempotente.
+            desde = inicio - MARGEN_REAPLICAR
+            afectadas: Set[int] = set()
+            for ts, usuario_id, vina_id, peso in self._recientes:
+                if ts >= desde:
+                    afectadas.update(modelo.aplicar(usuario_id, vina_id, peso))
+            for vina_id in afectadas:
+                modelo.recalcular(vina_id)
+            self._modelo = modelo
+            self._sucias.clear()
+            self._stats["reconstrucciones"] += 1
+            self._stats["ultima_reconstruccion_ms"] = round((time.time() - inicio) * 1000, 1)
+        logger.info(f"SimilitudVinas: {len(filas)} valoraciones, {len(modelo.vecinas)} viñas con vecinas "
+                    f"({self._stats['ultima_reconstruccion_ms']} ms).")
+
+    def actualizar(self, usuario_id: int, vina_id: int, rating: Any) -> None:
+        """Aplica una valoración guardada; `rating=None` la quita."""
+        peso = None if rating is None else _peso(rating)
+        with self._lock:
+            self._recientes.append((time.time(), usuario_id, vina_id, peso))
+            self._stats["actualizaciones"] += 1
+            if self._modelo is None:
+                return   # La reconstrucción en curso la reaplica
+            self._sucias.update(self._modelo.aplicar(usuario_id, vina_id, peso))
+        self._despertar.set()
+
+    def _recalcular_sucias(self) -> None:
+        with self._lock:
+            modelo, sucias, self._sucias = self._modelo, self._sucias, set()
+            if modelo is None:
+                return
+            for vina_id in sucias:
+                modelo.recalcular(vina_id)
+            self._stats["listas_recalculadas"] += len(sucias)
+
+    # --- Hilo de fondo ---
+
+    def iniciar(self) -> None:
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detenido = False
+        self._hilo = threading.Thread(target=self._bucle, name="similitud-vinas", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5.0) -> None:
+        if self._hilo is None:
+            return
+        self._detenido = True
+        self._despertar.set()
+        self._hilo.join(timeout)
+        self._hilo = None
+
+    def _bucle(self) -> None:
+        proxima = 0.0
+        while not self._detenido:
+            if time.time() >= proxima:
+                try:
+                    self.reconstruir()
+                    proxima = time.time() + self.intervalo_reconstruccion
+                except Exception as e:
+                    # Sin DB al arrancar: se reintenta en un minuto
+                    logger.error(f"SimilitudVinas: no se pudo reconstruir: {e}")
+                    with self._lock:
+                        self._stats["errores"] += 1
+                    proxima = time.time() + min(60.0, self.intervalo_reconstruccion)
+            self._despertar.wait(max(0.0, proxima - time.time()))
+            if self._detenido:
+                break
+            if self._despertar.is_set():
+                self._despertar.clear()
+                time.sleep(ESPERA_RECALCULO)   # Junta las valoraciones de una ráfaga
+                self._recalcular_sucias()
+
+    # --- Consultas (camino caliente) ---
+
+    def listo(self) -> bool:
+        return self._modelo is not None
+
+    def similares(self, vina_id: int, k: int = 5, excluir: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """Las `k` viñas más similares a `vina_id` (id, similitud), de mayor a menor."""
+        modelo = self._modelo
+        if modelo is None:
+            return []
+        excluir = set(excluir)
+        resultado = []
+        for otra, sim in modelo.vecinas.get(vina_id, ()):
+            if otra not in excluir:
+                resultado.append((otra, sim))
+                if len(resultado) >= k:
+                    break
+        return resultado
+
+    def recomendar(self, usuario_id: int, k: int = 5) -> List[Recomendacion]:
+        """
+        Viñas que el usuario no valoró, puntuadas por su similitud con las que
+        más le gustaron (hasta SEMILLAS_MAX, cada una con sus VECINAS_MAX vecinas).
+        """
+        modelo = self._modelo
+        if modelo is None:
+            return []
+        propias = modelo.por_usuario.get(usuario_id, {})
+        semillas = heapq.nlargest(SEMILLAS_MAX, ((v, p) for v, p in propias.items() if p > 0),
+                                  key=lambda s: s[1])
+        puntajes: Dict[int, List[float]] = {}   # viña -> [puntaje, mejor aporte, semilla]
+        for semilla, peso in semillas:
+            for otra, sim in modelo.vecinas.get(semilla, ()):
+                if otra in propias:
+                    continue
+                aporte = sim * peso
+                actual = puntajes.get(otra)
+                if actual is None:
+                    puntajes[otra] = [aporte, aporte, semilla]
+                else:
+                    actual[0] += aporte
+                    if aporte > actual[1]:
+                        actual[1], actual[2] = aporte, semilla
+        mejores = heapq.nlargest(k, puntajes.items(), key=lambda item: item[1][0])
+        return [Recomendacion(vina_id, round(p[0], 4), int(p[2])) for vina_id, p in mejores]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            datos = dict(self._stats)
+            modelo = self._modelo
+            datos["listas_pendientes"] = len(self._sucias)
+        datos["listo"] = modelo is not None
+        if modelo is not None:
+            datos["valoraciones"] = modelo.valoraciones
+            datos["usuarios"] = len(modelo.por_usuario)
+            datos["vinas_con_vecinas"] = len(modelo.vecinas)
+            datos["pares"] = sum(len(fila) for fila in modelo.pares.values()) // 2
+        return datos
@@ -0,0 +1,17 @@
+import unicodedata
+from functools import lru_cache
+
+# --- Utilidades de Texto ---
+
+
+@lru_cache(maxsize=8192)
+def normalizar(texto: str) -> str:
+    """
+    Minúsculas, sin tildes y con espacios colapsados. Replica la comparación
+    de la collation `utf8mb4_unicode_ci` de la DB ('Carménère' == 'carmenere').
+    """
+    if texto is None:
+        return ""
+    descompuesto = unicodedata.normalize("NFD", str(texto))
+    sin_tildes = "".join(c for c in descompuesto if unicodedata.category(c) != "Mn")
+    return " ".join(sin_tildes.casefold().split())
@@ -0,0 +1,37 @@
+import os
+from typing import Iterable, Tuple
+
+# --- Versiones de Tablas (invalidación entre procesos) ---
+# El panel admin y el servidor de acciones son procesos distintos. Cuando uno
+# escribe en una tabla "toca" su archivo marcador; los cachés en memoria del
+# otro comparan la fecha de modificación (un `stat`, sin ir a la DB) para saber
+# si deben recargarse.
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VERSIONES_DIR = os.path.join(PROJECT_PATH, ".versiones")
+
+
+def _ruta(tabla: str) -> str:
+    return os.path.join(VERSIONES_DIR, tabla)
+
+
+def incrementar(*tablas: str) -> None:
+    """Marca las tablas como modificadas."""
+    os.makedirs(VERSIONES_DIR, exist_ok=True)
+    for tabla in tablas:
+        ruta = _ruta(tabla)
+        with open(ruta, "a"):
+            pass
+        os.utime(ruta, None)
+
+
+def version(tabla: str) -> int:
+    """Versión actual de una tabla (0 si nunca se marcó)."""
+    try:
+        return os.stat(_ruta(tabla)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def versiones(tablas: Iterable[str]) -> Tuple[int, ...]:
+    return tuple(version(t) for t in tablas)
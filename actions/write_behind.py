@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import mysql.connector
+from mysql.connector import errors as mysql_errors
+
+from actions import versiones
+
+# --- Cola de Escritura Diferida (write-behind) ---
+# Las valoraciones y preferencias se anotan primero en un diario SQLite local
+# (durable: se confirma con fsync antes de responder al usuario) y un hilo las
+# vuelca a MySQL en lotes, una transacción por lote.
+#   - Coalescencia: la clave primaria del diario es (tipo, clave), así que dos
+#     escrituras de la misma (usuario, viña) o (usuario, tipo_preferencia)
+#     antes del volcado dejan solo la última.
+#   - Reinicio: lo que quedó en el diario se vuelca al arrancar.
+#   - Contrapresión: sobre `max_pendientes` se rechaza el encolado y la acción
+#     escribe directo en MySQL como antes.
+
+logger = logging.getLogger(__name__)
+
+RUTA_DIARIO = os.path.join(versiones.PROJECT_PATH, ".write_behind.sqlite3")
+INTERVALO_FLUSH = 0.5
+TAMANO_LOTE = 200
+MAX_PENDIENTES = 10000
+REINTENTO_MAXIMO = 30.0
+
+VALORACION = "valoracion"
+PREFERENCIA = "preferencia"
+
+# Tipo de escritura -> tabla de MySQL (para invalidar versiones tras el volcado)
+TABLAS_ESCRITURA = {
+    VALORACION: "valoraciones_tour",
+    PREFERENCIA: "preferencias_usuario",
+}
+
+# Errores que no se arreglan reintentando: la fila se aparta a `fallidas`
+ERRORES_PERMANENTES = (mysql_errors.IntegrityError, mysql_errors.DataError, mysql_errors.ProgrammingError)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pendientes (
+    tipo TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    encolado REAL NOT NULL,
+    PRIMARY KEY (tipo, clave)
+);
+CREATE TABLE IF NOT EXISTS fallidas (
+    tipo TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    error TEXT NOT NULL,
+    fecha REAL NOT NULL
+);
+"""
+
+
+def _aplicar_valoracion(cursor, datos: Dict[str, Any]) -> None:
+    cursor.execute("DELETE FROM valoraciones_tour WHERE usuario_id = %s AND vina_id = %s",
+                   (datos["usuario_id"], datos["vina_id"]))
+    cursor.execute("INSERT INTO valoraciones_tour (usuario_id, vina_id, rating, comentario) VALUES (%s, %s, %s, %s)",
+                   (datos["usuario_id"], datos["vina_id"], datos["rating"], datos["comentario"]))
+
+
+def _aplicar_preferencia(cursor, datos: Dict[str, Any]) -> None:
+    cursor.execute("DELETE FROM preferencias_usuario WHERE usuario_id = %s AND tipo_preferencia = %s",
+                   (datos["usuario_id"], datos["tipo_preferencia"]))
+    cursor.execute("INSERT INTO preferencias_usuario (usuario_id, tipo_preferencia, valor_preferencia) VALUES (%s, %s, %s)",
+                   (datos["usuario_id"], datos["tipo_preferencia"], datos["valor_preferencia"]))
+
+
+APLICADORES: Dict[str, Callable[[Any, Dict[str, Any]], None]] = {
+    VALORACION: _aplicar_valoracion,
+    PREFERENCIA: _aplicar_preferencia,
+}
+
+
+class ColaEscritura:
+    def __init__(self, get_connection: Callable[[], Any], ruta_diario: str = RUTA_DIARIO,
+                 intervalo_flush: float = INTERVALO_FLUSH, tamano_lote: int = TAMANO_LOTE,
+                 max_pendientes: int = MAX_PENDIENTES):
+        self._get_connection = get_connection
+        self.intervalo_flush = intervalo_flush
+        self.tamano_lote = tamano_lote
+        self.max_pendientes = max_pendientes
+        self._lock = threading.Lock()
+        self._hay_trabajo = threading.Event()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+        self._db = sqlite3.connect(ruta_diario, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")  # Lo confirmado sobrevive a un corte de luz
+        self._db.executescript(_ESQUEMA)
+        fila = self._db.execute("SELECT COALESCE(MAX(seq), 0), COUNT(*) FROM pendientes").fetchone()
+        self._seq, pendientes_al_iniciar = fila
+
+        # Espejo en memoria de lo pendiente (lecturas de lo recién escrito)
+        self._pendientes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for tipo, clave, datos in self._db.execute("SELECT tipo, clave, datos FROM pendientes"):
+            self._pendientes[(tipo, clave)] = json.loads(datos)
+
+        self._contadores = {
+            "encoladas": 0,
+            "coalescidas": 0,
+            "rechazadas": 0,
+            "lotes": 0,
+            "filas_escritas": 0,
+            "filas_fallidas": 0,
+            "errores_flush": 0,
+            "pendientes_al_iniciar": pendientes_al_iniciar,
+        }
+        self._ultimo_lote_ms = 0.0
+        self._max_lote_ms = 0.0
+        self._espera = 0.0
+        if pendientes_al_iniciar:
+            logger.info(f"ColaEscritura: {pendientes_al_iniciar} escrituras pendientes del arranque anterior.")
+            self._hay_trabajo.set()
+
+    # --- Productores (acciones) ---
+
+    def encolar(self, tipo: str, clave: str, datos: Dict[str, Any]) -> bool:
+        """Anota la escritura en el diario. False si la cola está llena (escribir directo)."""
+        with self._lock:
+            existente = (tipo, clave) in self._pendientes
+            if not existente and len(self._pendientes) >= self.max_pendientes:
+                self._contadores["rechazadas"] += 1
+                return False
+            self._seq += 1
+            self._db.execute(
+                "INSERT OR REPLACE INTO pendientes (tipo, clave, datos, seq, encolado) VALUES (?, ?, ?, ?, ?)",
+                (tipo, clave, json.dumps(datos), self._seq, time.time()),
+            )
+            self._pendientes[(tipo, clave)] = datos
+            self._contadores["encoladas"] += 1
+            if existente:
+                self._contadores["coalescidas"] += 1
+        self._hay_trabajo.set()
+        return True
+
+    def encolar_valoracion(self, usuario_id: int, vina_id: int, rating: Any, comentario: Any) -> bool:
+        return self.encolar(VALORACION, f"{usuario_id}:{vina_id}", {
+            "usuario_id": usuario_id, "vina_id": vina_id, "rating": rating, "comentario": comentario,
+        })
+
+    def encolar_preferencia(self, usuario_id: int, tipo_preferencia: str, valor_preferencia: str) -> bool:
+        return self.encolar(PREFERENCIA, f"{usuario_id}:{tipo_preferencia}", {
+            "usuario_id": usuario_id, "tipo_preferencia": tipo_preferencia, "valor_preferencia": valor_preferencia,
+        })
+
+    def preferencias_pendientes(self, usuario_id: int) -> Dict[str, str]:
+        """Preferencias del usuario aún no volcadas (para superponerlas a lo leído de MySQL)."""
+        with self._lock:
+            return {
+                d["tipo_preferencia"]: d["valor_preferencia"]
+                for (tipo, _), d in self._pendientes.items()
+                if tipo == PREFERENCIA and d["usuario_id"] == usuario_id
+            }
+
+    # --- Volcado a MySQL ---
+
+    def iniciar(self) -> None:
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name="vinai-write-behind", daemon=True)
+            self._hilo.start()
+
+    def detener(self, timeout: float = 5.0) -> None:
+        """Detiene el hilo tras un último volcado. Lo que no alcance queda en el diario."""
+        self._detener.set()
+        self._hay_trabajo.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def _bucle(self) -> None:
+        while not self._detener.is_set():
+            if self._espera:
+                self._detener.wait(self._espera)
+            else:
+                self._hay_trabajo.wait()
+                self._detener.wait(self.intervalo_flush)  # Junta más escrituras en el mismo lote
+            self._hay_trabajo.clear()
+            self._volcar_todo()
+        self._volcar_todo()
+
+    def _volcar_todo(self) -> None:
+        try:
+            while self.volcar_lote() >= self.tamano_lote:
+                pass
+            self._espera = 0.0
+        except Exception as e:
+            self._contadores["errores_flush"] += 1
+            self._espera = min(REINTENTO_MAXIMO, max(1.0, self._espera * 2))
+            logger.error(f"ColaEscritura: no se pudo volcar a MySQL (reintento en {self._espera:.0f}s): {e}")
+
+    def _leer_lote(self) -> List[Tuple[str, str, str, int]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT tipo, clave, datos, seq FROM pendientes ORDER BY seq LIMIT ?", (self.tamano_lote,)
+            ).fetchall()
+
+    def volcar_lote(self) -> int:
+        """Vuelca un lote en una transacción. Devuelve cuántas filas se procesaron."""
+        lote = self._leer_lote()
+        if not lote:
+            return 0
+        inicio = time.perf_counter()
+        fallidas: List[Tuple[str, str, str, int, str]] = []
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            try:
+                for tipo, _, datos, _ in lote:
+                    APLICADORES[tipo](cursor, json.loads(datos))
+                conn.commit()
+            except ERRORES_PERMANENTES:
+                # Alguna fila es inválida: se repite de a una para aislarla
+                conn.rollback()
+                for tipo, clave, datos, seq in lote:
+                    try:
+                        APLICADORES[tipo](cursor, json.loads(datos))
+                        conn.commit()
+                    except ERRORES_PERMANENTES as e:
+                        conn.rollback()
+                        fallidas.append((tipo, clave, datos, seq, str(e)))
+            cursor.close()
+        except mysql.connector.Error:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                pass
+            raise
+        finally:
+            conn.close()
+
+        self._confirmar(lote, fallidas)
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        self._ultimo_lote_ms = duracion_ms
+        self._max_lote_ms = max(self._max_lote_ms, duracion_ms)
+        versiones.incrementar(*sorted({TABLAS_ESCRITURA[fila[0]] for fila in lote}))
+        logger.debug(f"ColaEscritura: lote de {len(lote)} filas volcado en {duracion_ms:.1f} ms.")
+        return len(lote)
+
+    def _confirmar(self, lote, fallidas) -> None:
+        """Borra del diario lo volcado, salvo lo que se reemplazó mientras tanto (otro `seq`)."""
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM pendientes WHERE tipo = ? AND clave = ? AND seq = ?",
+                                 [(tipo, clave, seq) for tipo, clave, _, seq in lote])
+            self._db.executemany("INSERT INTO fallidas (tipo, clave, datos, error, fecha) VALUES (?, ?, ?, ?, ?)",
+                                 [(tipo, clave, datos, error, time.time()) for tipo, clave, datos, _, error in fallidas])
+            self._db.execute("COMMIT")
+            vigentes = {(t, c) for t, c in self._db.execute("SELECT tipo, clave FROM pendientes")}
+            for tipo, clave, _, _ in lote:
+                if (tipo, clave) not in vigentes:
+                    self._pendientes.pop((tipo, clave), None)
+            self._contadores["lotes"] += 1
+            self._contadores["filas_escritas"] += len(lote) - len(fallidas)
+            self._contadores["filas_fallidas"] += len(fallidas)
+        for tipo, clave, _, _, error in fallidas:
+            logger.error(f"ColaEscritura: escritura descartada {tipo} {clave}: {error}")
+
+    # --- Métricas ---
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            antiguo = self._db.execute("SELECT MIN(encolado) FROM pendientes").fetchone()[0]
+            datos = dict(self._contadores)
+            datos.update({
+                "pendientes": len(self._pendientes),
+                "max_pendientes": self.max_pendientes,
+                "ocupacion": round(len(self._pendientes) / self.max_pendientes, 4),
+                "edad_pendiente_mas_antigua_s": round(time.time() - antiguo, 3) if antiguo else 0.0,
+                "ultimo_lote_ms": round(self._ultimo_lote_ms, 3),
+                "max_lote_ms": round(self._max_lote_ms, 3),
+                "reintento_en_s": self._espera,
+            })
+        return datos
@@ -1,29 +1,121 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context, g
 import mysql.connector
-import subprocess
 import os
 import sys # --- NOVEDAD: Importar la librería del sistema
+import json
+import math
+import codecs
+import threading
+import time
+import urllib.request
+import atexit
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import timedelta 
 from flask_cors import CORS
+from actions.db_pool import crear_pool, DB_CONFIG
+from actions import metricas, versiones
+from actions.cache import CacheTTL
+from actions.catalogo_tours import CatalogoTours, coordenadas
+from actions.consultas import QUERIES_DASHBOARD
+from actions import consultas_lentas
+from actions.seguridad import PoolHash, HashSaturado, Limitador
+from panel.entrenamiento import GestorEntrenamiento, EntrenamientoEnCurso, EXITOSO
+from panel import nlu_catalogo
+from panel.supervisor import Supervisor, ProcesoSupervisado, modelo_cargado
+from actions.importacion import importar, leer_filas, formato_de, TABLAS_IMPORTACION
 
 app = Flask(__name__)
 app.secret_key = 'cambia_esto_por_algo_muy_secreto_y_largo!'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
 CORS(app, supports_credentials=True)
 
-# --- Configuración de la DB ---
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '',
-    'database': 'vinai_db_normalizada'
-}
+# --- Configuración de la DB (DB_CONFIG en actions/db_pool.py) ---
+DB_POOL_SIZE = 5  # Conexiones simultáneas máximas del panel
+DB_POOL = crear_pool(DB_CONFIG, size=DB_POOL_SIZE, nombre="admin")
+
+# --- Caché del Dashboard ---
+# Los agregados del dashboard se guardan con la versión de sus tablas como
+# clave: cuando el bot guarda una preferencia o valoración (o el panel agrega
+# una viña) la versión cambia y la próxima carga vuelve a consultar. El TTL
+# cubre los cambios hechos fuera del bot y del panel.
+TABLAS_DASHBOARD = ("preferencias_usuario", "valoraciones_tour", "vinas")
+CACHE_DASHBOARD = CacheTTL(max_entradas=4, ttl=300, nombre="dashboard")
+
+# El resumen de consultas lentas del dashboard se guarda con la firma
+# (mtime, tamaño) del log como clave: solo se vuelve a leer y agrupar el
+# archivo cuando el servidor de acciones escribió algo nuevo.
+CACHE_CONSULTAS_LENTAS = CacheTTL(max_entradas=2, ttl=300, nombre="consultas_lentas")
+
+# --- Caché de Administradores (Flask-Login) ---
+# `load_user` corre en cada petición autenticada del panel. El usuario se
+# guarda unos minutos por id; `invalidar_usuario` lo borra (logout, cambios
+# en `admins`). Si no está, se consulta la DB como antes.
+USAR_CACHE_USUARIOS = True
+CACHE_USUARIOS = CacheTTL(max_entradas=256, ttl=300, nombre="admins")
+
+# --- Hash de Contraseñas y Límite de Intentos ---
+# El scrypt corre en un pool de procesos acotado (ver actions/seguridad.py);
+# con el pool lleno se responde 503 al instante. Los logins fallidos se
+# cuentan por IP y por cuenta (email o usuario admin).
+POOL_HASH = PoolHash(max_procesos=2, max_en_cola=8, nombre="admin")
+LIMITE_IP = Limitador(max_intentos=20, ventana=300)
+LIMITE_CUENTA = Limitador(max_intentos=5, ventana=900)
+
+# --- Métricas (ver actions/metricas.py) ---
+# Latencia por ruta (plantilla de la regla, no la URL, para no crear una serie
+# por id), tiempo de cada consulta y de sacar conexiones del pool, y los
+# contadores de los componentes. Se exponen en GET /metrics: sin login solo
+# para las IPs de METRICAS_IPS (el scraper de Prometheus), para el resto hace
+# falta la sesión de admin.
+METRICAS_IPS = {"127.0.0.1", "::1"}
+metricas.REGISTRO.stats("db_pool", DB_POOL.stats)
+metricas.REGISTRO.stats("cache_dashboard", CACHE_DASHBOARD.stats)
+metricas.REGISTRO.stats("cache_admins", CACHE_USUARIOS.stats)
+metricas.REGISTRO.stats("cache_consultas_lentas", CACHE_CONSULTAS_LENTAS.stats)
+metricas.REGISTRO.stats("pool_hash", POOL_HASH.stats)
+
+# --- Tours Cercanos ---
+# Mismo catálogo en memoria que usa el bot (con su índice espacial); se
+# reconstruye solo cuando cambia la versión de `vinas`.
+MAX_TOURS_CERCANOS = 50
+CATALOGO_TOURS = CatalogoTours(DB_POOL.get_connection)
+
+def _ruta_actual():
+    return request.url_rule.rule if request.url_rule is not None else "<sin ruta>"
+
+@app.before_request
+def _iniciar_medicion():
+    g.inicio_peticion = time.perf_counter()
+
+@app.after_request
+def _medir_peticion(response):
+    inicio = g.pop('inicio_peticion', None)
+    if inicio is not None:
+        metricas.RUTAS.observar(time.perf_counter() - inicio, request.method, _ruta_actual(), response.status_code)
+    return response
+
+@app.teardown_request
+def _medir_peticion_fallida(exc):
+    # Solo llega con `inicio_peticion` si la vista lanzó una excepción sin respuesta
+    inicio = g.pop('inicio_peticion', None)
+    if inicio is not None:
+        metricas.RUTAS.observar(time.perf_counter() - inicio, request.method, _ruta_actual(), 500)
+
+def _espera_login(cuenta):
+    """Segundos de bloqueo que le quedan a esta IP/cuenta (0 si puede intentar)."""
+    return max(LIMITE_IP.espera(request.remote_addr), LIMITE_CUENTA.espera(cuenta))
+
+def _registrar_login(cuenta, exitoso):
+    if exitoso:
+        LIMITE_CUENTA.exito(cuenta)
+    else:
+        LIMITE_IP.fallo(request.remote_addr)
+        LIMITE_CUENTA.fallo(cuenta)
+
+# --- Webhook del servidor de acciones (para avisarle cambios del catálogo) ---
+ACTIONS_WEBHOOK_URL = 'http://localhost:5055/webhook'
 
 # --- Variables Globales para procesos del Bot ---
-rasa_core_process = None
-rasa_actions_process = None
 project_path = os.path.dirname(os.path.abspath(__file__))
 
 # --- NOVEDAD: Ruta al ejecutable de Python ---
@@ -31,6 +123,24 @@ project_path = os.path.dirname(os.path.abspath(__file__))
 PYTHON_EXECUTABLE_PATH = sys.executable
 # ============================================
 
+# --- Entrenamientos en segundo plano (ver panel/entrenamiento.py) ---
+ENTRENAMIENTOS = GestorEntrenamiento(project_path, PYTHON_EXECUTABLE_PATH)
+
+# --- Servidores del bot supervisados (ver panel/supervisor.py) ---
+# Logs en logs/rasa_core.log y logs/rasa_actions.log
+SUPERVISOR = Supervisor([
+    ProcesoSupervisado(
+        "rasa_core", [PYTHON_EXECUTABLE_PATH, '-m', 'rasa', 'run', '--enable-api'], project_path,
+        url_listo="http://localhost:5005/status", url_vivo="http://localhost:5005/",
+        validar_listo=modelo_cargado,
+    ),
+    ProcesoSupervisado(
+        "rasa_actions", [PYTHON_EXECUTABLE_PATH, '-m', 'rasa', 'run', 'actions'], project_path,
+        url_listo="http://localhost:5055/health",
+    ),
+])
+atexit.register(SUPERVISOR.detener_todos)
+
 # --- (Configuración de Flask-Login para Admin, Clase User, get_db_connection) ---
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -79,16 +189,59 @@ class User(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.get(user_id)
+    if not USAR_CACHE_USUARIOS:
+        return User.get(user_id)
+    return CACHE_USUARIOS.obtener_o_calcular(str(user_id), lambda: User.get(user_id))
+
+def invalidar_usuario(user_id=None):
+    """Saca a un admin del caché de sesión (o a todos si no se indica id)."""
+    if user_id is None:
+        CACHE_USUARIOS.invalidar()
+    else:
+        CACHE_USUARIOS.invalidar(str(user_id))
 
 def get_db_connection():
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = DB_POOL.get_connection()
         return conn
     except mysql.connector.Error as err:
         print(f"Error de base de datos: {err}")
         return None
 
+def _llamar_accion(nombre_accion, metadata=None, timeout=10):
+    """POST al webhook del servidor de acciones con un tracker mínimo. Devuelve la respuesta JSON."""
+    payload = {
+        "next_action": nombre_accion,
+        "sender_id": "admin_panel",
+        "tracker": {
+            "sender_id": "admin_panel",
+            "slots": {},
+            "latest_message": {"text": "", "metadata": metadata or {}},
+            "events": [],
+            "paused": False,
+            "active_loop": {},
+        },
+        "domain": {},
+    }
+    req = urllib.request.Request(ACTIONS_WEBHOOK_URL, data=json.dumps(payload).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read().decode('utf-8'))
+
+def notificar_bot(*tablas):
+    """
+    Marca las tablas como modificadas y pide al servidor de acciones que recargue
+    su catálogo en caliente (action_recargar_catalogo). Si el bot no está
+    corriendo no pasa nada: el marcador de versión basta para el próximo arranque/turno.
+    """
+    versiones.incrementar(*tablas)
+    def _enviar():
+        try:
+            _llamar_accion("action_recargar_catalogo", {"tablas": list(tablas)})
+        except Exception as e:
+            print(f"Aviso: no se pudo notificar al servidor de acciones: {e}")
+    threading.Thread(target=_enviar, daemon=True).start()
+
 # --- (Rutas de Login/Logout de Admin) ---
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -97,6 +250,10 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
+        espera = _espera_login(f"admin:{username}")
+        if espera:
+            flash(f"Demasiados intentos fallidos. Intenta de nuevo en {math.ceil(espera)} segundos.", "error")
+            return render_template('login.html'), 429
         conn = get_db_connection()
         user_data = None
         if conn:
@@ -109,9 +266,16 @@ def login():
             except mysql.connector.Error as err:
                 flash(f"Error de base de datos al buscar usuario: {err}", "error")
                 return render_template('login.html')
-        if user_data and check_password_hash(user_data['password_hash'], password):
+        try:
+            valido = bool(user_data) and POOL_HASH.verificar(user_data['password_hash'], password)
+        except HashSaturado:
+            flash("El servidor está ocupado. Intenta de nuevo en unos segundos.", "error")
+            return render_template('login.html'), 503
+        _registrar_login(f"admin:{username}", valido)
+        if valido:
             user = User(id=user_data['id'], username=user_data['username'])
             login_user(user)
+            CACHE_USUARIOS.set(str(user.id), user)  # Las próximas peticiones no van a la DB
             flash("Inicio de sesión exitoso.", "success")
             return redirect(url_for('admin_panel'))
         else:
@@ -121,70 +285,56 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
+    invalidar_usuario(current_user.get_id())
     logout_user()
     flash("Sesión cerrada exitosamente.", "success")
     return redirect(url_for('login'))
 
 # --- (Rutas de Admin: / (admin_panel), /add_wine, /add_vina) ---
+def cargar_dashboard():
+    """Consulta los agregados del dashboard. None si no hay conexión (no se cachea)."""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        dashboard = {}
+        for nombre, query in QUERIES_DASHBOARD.items():
+            cursor.execute(query)
+            dashboard[nombre] = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+    return dashboard
+
 @app.route('/')
 @login_required
 def admin_panel():
-    global rasa_core_process, rasa_actions_process
-    core_status = "Detenido"
-    actions_status = "Detenido"
-    if rasa_core_process and rasa_core_process.poll() is None:
-        core_status = "Corriendo"
-    if rasa_actions_process and rasa_actions_process.poll() is None:
-        actions_status = "Corriendo"
+    procesos = SUPERVISOR.resumen()
+    core_status = procesos["rasa_core"]["estado"]
+    actions_status = procesos["rasa_actions"]["estado"]
     
-    # Lógica del Dashboard
-    top_preferencias = []
-    top_tours = []
-    recent_valoraciones = []
-    conn = get_db_connection()
-    if conn:
-        try:
-            cursor = conn.cursor(dictionary=True)
-            query_prefs = """
-                SELECT tipo_preferencia, valor_preferencia, COUNT(*) as total
-                FROM preferencias_usuario
-                GROUP BY tipo_preferencia, valor_preferencia
-                ORDER BY total DESC
-                LIMIT 5;
-            """
-            cursor.execute(query_prefs)
-            top_preferencias = cursor.fetchall()
-            query_top_tours = """
-                SELECT v.nombre, AVG(vt.rating) as avg_rating, COUNT(vt.id) as total_ratings
-                FROM valoraciones_tour vt
-                JOIN vinas v ON vt.vina_id = v.id
-                GROUP BY v.nombre
-                ORDER BY avg_rating DESC, total_ratings DESC
-                LIMIT 5;
-            """
-            cursor.execute(query_top_tours)
-            top_tours = cursor.fetchall()
-            query_recent_vals = """
-                SELECT v.nombre as vina_nombre, u.username, vt.rating
-                FROM valoraciones_tour vt
-                JOIN vinas v ON vt.vina_id = v.id
-                JOIN usuarios u ON vt.usuario_id = u.id
-                ORDER BY vt.fecha_valoracion DESC
-                LIMIT 5;
-            """
-            cursor.execute(query_recent_vals)
-            recent_valoraciones = cursor.fetchall()
-            cursor.close()
-            conn.close()
-        except mysql.connector.Error as err:
-            flash(f"Error al cargar el dashboard: {err}", "error")
+    # Lógica del Dashboard (cacheada, ver CACHE_DASHBOARD)
+    dashboard = {"top_preferencias": [], "top_tours": [], "recent_valoraciones": []}
+    try:
+        dashboard = CACHE_DASHBOARD.obtener_o_calcular(
+            versiones.versiones(TABLAS_DASHBOARD), cargar_dashboard
+        ) or dashboard
+    except mysql.connector.Error as err:
+        flash(f"Error al cargar el dashboard: {err}", "error")
             
+    entrenamiento = ENTRENAMIENTOS.actual
     return render_template('admin.html', 
                            core_status=core_status, 
                            actions_status=actions_status,
-                           top_preferencias=top_preferencias,
-                           top_tours=top_tours,
-                           recent_valoraciones=recent_valoraciones)
+                           procesos=procesos,
+                           entrenamiento=entrenamiento.resumen() if entrenamiento else None,
+                           historial_entrenamientos=ENTRENAMIENTOS.historial(5),
+                           consultas_lentas=CACHE_CONSULTAS_LENTAS.obtener_o_calcular(
+                               consultas_lentas.firma(), lambda: consultas_lentas.resumir(consultas_lentas.leer())[:10]),
+                           top_preferencias=dashboard["top_preferencias"],
+                           top_tours=dashboard["top_tours"],
+                           recent_valoraciones=dashboard["recent_valoraciones"])
 
 @app.route('/add_wine', methods=['POST'])
 @login_required
@@ -203,6 +353,7 @@ def add_wine():
             query = "INSERT INTO vinos (nombre, cepa, ano, tipo, vina_id, link_compra) VALUES (%s, %s, %s, %s, %s, %s)"
             cursor.execute(query, (nombre, cepa, ano, tipo, vina_id, link))
             conn.commit()
+            notificar_bot("vinos")  # El bot recarga su índice de vinos
             cursor.close()
             conn.close()
             flash(f"¡Vino '{nombre}' añadido con éxito!", 'success')
@@ -233,6 +384,7 @@ def add_vina():
             """
             cursor.execute(query, (nombre, valle, descripcion_tour, horario_tour, link_web, latitud, longitud))
             conn.commit()
+            notificar_bot("vinas")
             cursor.close()
             conn.close()
             flash(f"¡Viña '{nombre}' añadida con éxito!", 'success')
@@ -240,34 +392,76 @@ def add_vina():
             flash(f"Error al añadir la viña: {err}", 'error')
     return redirect(url_for('admin_panel'))
 
+@app.route('/importar_catalogo', methods=['POST'])
+@login_required
+def importar_catalogo():
+    # Carga masiva de vinos o viñas desde CSV/JSON (ver actions/importacion.py).
+    # El archivo se lee por partes: Werkzeug lo deja en disco si es grande.
+    archivo = request.files.get('archivo')
+    tipo = request.form.get('tipo', 'vinos')
+    quiere_json = request.args.get('formato') == 'json'
+    if not archivo or not archivo.filename or tipo not in TABLAS_IMPORTACION:
+        if quiere_json:
+            return jsonify({"error": "Falta el archivo o el tipo de importación."}), 400
+        flash("Selecciona un archivo CSV o JSON y el tipo de datos a importar.", 'error')
+        return redirect(url_for('admin_panel'))
+    conn = get_db_connection()
+    if not conn:
+        if quiere_json:
+            return jsonify({"error": "No hay conexión con la base de datos."}), 503
+        flash("No hay conexión con la base de datos.", 'error')
+        return redirect(url_for('admin_panel'))
+    error = None
+    try:
+        flujo = codecs.getreader('utf-8-sig')(archivo.stream)
+        resumen = importar(conn, tipo, leer_filas(flujo, formato_de(archivo.filename)),
+                           crear_etiquetas=bool(request.form.get('crear_etiquetas')))
+    except (mysql.connector.Error, ValueError) as err:
+        # Los bloques confirmados antes del error quedan: `importar` deja el parcial en el error
+        error, resumen = err, getattr(err, 'resumen', None)
+    finally:
+        conn.close()
+    if resumen and (resumen.insertadas or resumen.etiquetas_creadas):
+        notificar_bot(*TABLAS_IMPORTACION[tipo])
+    if error is not None:
+        if quiere_json:
+            cuerpo = {"error": str(error)}
+            if resumen:
+                cuerpo["resumen"] = resumen.como_dict()
+            return jsonify(cuerpo), 400
+        flash(f"Error al importar: {error}", 'error')
+        if resumen and resumen.insertadas:
+            flash(f"Antes del error se importaron {resumen.insertadas} de {resumen.leidas} filas leídas.", 'error')
+        return redirect(url_for('admin_panel'))
+    if quiere_json:
+        return jsonify(resumen.como_dict())
+    flash(f"Importación de {tipo}: {resumen.insertadas}/{resumen.leidas} filas en {resumen.segundos:.1f}s "
+          f"({resumen.filas_por_segundo:.0f} filas/s), {resumen.total_errores} con errores.",
+          'success' if not resumen.total_errores else 'error')
+    for linea, mensaje in resumen.errores[:10]:
+        flash(f"Fila {linea}: {mensaje}", 'error')
+    return redirect(url_for('admin_panel'))
+
 # --- Rutas de Control del Bot (ACTUALIZADAS) ---
 @app.route('/start_bot')
 @login_required
 def start_bot():
-    global rasa_core_process, rasa_actions_process
-    started_core = False
-    started_actions = False
+    entrenamiento = ENTRENAMIENTOS.actual
+    if entrenamiento is not None and not entrenamiento.terminado:
+        flash("Hay un re-entrenamiento en curso. Espera a que termine antes de iniciar los servidores.", 'error')
+        return redirect(url_for('admin_panel'))
 
     try:
-        # === NOVEDAD: Usar la ruta de Python y el módulo -m rasa ===
-        if rasa_core_process is None or rasa_core_process.poll() is not None:
-            rasa_core_process = subprocess.Popen(
-                [PYTHON_EXECUTABLE_PATH, '-m', 'rasa', 'run', '--enable-api'], 
-                cwd=project_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
+        # El supervisor vacía la salida, espera a que respondan y los reinicia si se caen
+        started_core = SUPERVISOR["rasa_core"].iniciar()
+        if started_core:
             flash("Iniciando servidor Rasa Core...", 'info')
-            started_core = True
         else:
             flash("El servidor Rasa Core ya estaba corriendo.", 'info')
 
-        # === NOVEDAD: Usar la ruta de Python y el módulo -m rasa ===
-        if rasa_actions_process is None or rasa_actions_process.poll() is not None:
-            rasa_actions_process = subprocess.Popen(
-                [PYTHON_EXECUTABLE_PATH, '-m', 'rasa', 'run', 'actions'], 
-                cwd=project_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
+        started_actions = SUPERVISOR["rasa_actions"].iniciar()
+        if started_actions:
             flash("Iniciando servidor de Acciones...", 'info')
-            started_actions = True
         else:
             flash("El servidor de Acciones ya estaba corriendo.", 'info')
 
@@ -276,74 +470,169 @@ def start_bot():
 
     except Exception as e:
         flash(f"Error al iniciar los servidores: {e}", 'error')
-        rasa_core_process = None
-        rasa_actions_process = None
+        SUPERVISOR.detener_todos()
         
     return redirect(url_for('admin_panel'))
 
 @app.route('/stop_bot')
 @login_required
 def stop_bot():
-    # ... (código de stop_bot sin cambios)
-    global rasa_core_process, rasa_actions_process
-    stopped_core = False
-    stopped_actions = False
-    if rasa_core_process and rasa_core_process.poll() is None:
-        try:
-            rasa_core_process.terminate() 
-            rasa_core_process.wait(timeout=5) 
-        except subprocess.TimeoutExpired:
-            rasa_core_process.kill() 
-        rasa_core_process = None
+    # Parada ordenada (SIGTERM y, si no sale a tiempo, SIGKILL) de ambos en paralelo
+    detenidos = SUPERVISOR.detener_todos()
+    if "rasa_core" in detenidos:
         flash("Servidor Rasa Core detenido.", 'success')
-        stopped_core = True
-    if rasa_actions_process and rasa_actions_process.poll() is None:
-        try:
-            rasa_actions_process.terminate()
-            rasa_actions_process.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            rasa_actions_process.kill()
-        rasa_actions_process = None
+    if "rasa_actions" in detenidos:
         flash("Servidor de Acciones detenido.", 'success')
-        stopped_actions = True
-    if not stopped_core and not stopped_actions:
+    if not detenidos:
         flash("Los servidores ya estaban detenidos.", 'info')
     return redirect(url_for('admin_panel'))
 
+@app.route('/bot_procesos')
+@login_required
+def bot_procesos():
+    return jsonify(SUPERVISOR.resumen())
+
+@app.route('/bot_procesos/<nombre>/log')
+@login_required
+def bot_proceso_log(nombre):
+    # Últimas líneas de salida (el historial completo queda en logs/<nombre>.log)
+    if nombre not in SUPERVISOR.procesos:
+        return jsonify({"error": "Proceso desconocido."}), 404
+    n = max(1, min(request.args.get('n', 200, type=int), 2000))
+    return Response("\n".join(SUPERVISOR[nombre].log.ultimas(n)), mimetype='text/plain')
+
 @app.route('/rasa_train')
 @login_required
 def rasa_train():
-    global rasa_core_process, rasa_actions_process
-    core_running = rasa_core_process and rasa_core_process.poll() is None
-    actions_running = rasa_actions_process and rasa_actions_process.poll() is None
-
-    if core_running or actions_running:
+    if SUPERVISOR.algun_activo():
         flash("¡Error! Debes detener los servidores del bot antes de re-entrenar.", 'error')
         return redirect(url_for('admin_panel'))
         
+    # 1. Exportar el catálogo como lookup tables (data/catalogo_nlu.yml)
     try:
-        flash("Iniciando re-entrenamiento... Esto puede tardar unos minutos.", 'info')
-        # === NOVEDAD: Usar la ruta de Python y el módulo -m rasa ===
-        completed_process = subprocess.run(
-            [PYTHON_EXECUTABLE_PATH, '-m', 'rasa', 'train'], 
-            cwd=project_path, 
-            capture_output=True, 
-            text=True,
-            check=False 
-        )
-        
-        if completed_process.returncode != 0:
-             flash(f"Error durante el entrenamiento:\n{completed_process.stderr}", 'error')
+        # DB_POOL.get_connection (no get_db_connection, que devuelve None) para
+        # que una DB caída llegue como mysql.connector.Error
+        nlu_catalogo.generar(DB_POOL.get_connection, project_path)
+    except mysql.connector.Error as err:
+        flash(f"No se pudo exportar el catálogo al NLU ({err}); se entrena con el último exportado.", 'warning')
+
+    # 2. Si nada de lo que entra al entrenamiento cambió, se reutiliza el último modelo
+    huella = nlu_catalogo.calcular_huella(project_path)
+    modelo = nlu_catalogo.modelo_vigente(huella, project_path)
+    forzar = request.args.get('forzar') == '1'
+
+    def guardar_huella(trabajo):
+        if trabajo.estado == EXITOSO and trabajo.modelo:
+            nlu_catalogo.guardar_huella(huella, trabajo.modelo, project_path)
+
+    try:
+        if modelo and not forzar:
+            ENTRENAMIENTOS.omitir(modelo, motivo=f"panel ({current_user.username})")
+            flash(f"Sin cambios desde el último entrenamiento: se reutiliza {modelo}.", 'info')
         else:
-            flash("¡Re-entrenamiento completado con éxito!", 'success')
-            flash("Ahora puedes INICIAR los servidores para aplicar los cambios.", 'info')
-            
+            ENTRENAMIENTOS.encolar(motivo=f"panel ({current_user.username})" + (", forzado" if forzar else ""),
+                                   al_terminar=guardar_huella)
+            flash("Re-entrenamiento iniciado en segundo plano. Puedes seguir el progreso en el panel.", 'info')
+    except EntrenamientoEnCurso as e:
+        flash(f"Ya hay un re-entrenamiento en curso (iniciado hace {e.trabajo.duracion or 0:.0f}s).", 'warning')
     except Exception as e:
-        flash(f"Error inesperado al ejecutar el entrenamiento: {e}", 'error')
+        flash(f"Error inesperado al iniciar el entrenamiento: {e}", 'error')
         
     return redirect(url_for('admin_panel'))
 
-# --- (Rutas públicas: /public_register, /public_login, /profile, /public_logout, /check_session) ---
+@app.route('/entrenamientos')
+@login_required
+def entrenamientos():
+    # Trabajo actual e historial con duraciones (para seguir regresiones de tiempo)
+    actual = ENTRENAMIENTOS.actual
+    return jsonify({
+        "actual": actual.resumen() if actual else None,
+        "historial": ENTRENAMIENTOS.historial(max(1, min(request.args.get('n', 20, type=int), 5000))),
+    })
+
+@app.route('/entrenamientos/<trabajo_id>/eventos')
+@login_required
+def eventos_entrenamiento(trabajo_id):
+    # Server-Sent Events: líneas del log (con id para reanudar) y el estado del trabajo
+    trabajo = ENTRENAMIENTOS.obtener(trabajo_id)
+    if trabajo is None:
+        return jsonify({"error": "Entrenamiento no encontrado."}), 404
+    try:
+        desde = int(request.headers.get('Last-Event-ID', request.args.get('desde', 0)))
+    except ValueError:
+        desde = 0
+
+    def generar():
+        seq = desde
+        while True:
+            for seq, linea in trabajo.log.esperar(seq, timeout=15):
+                yield f"id: {seq}\ndata: {json.dumps({'linea': linea}, ensure_ascii=False)}\n\n"
+            yield f"event: estado\ndata: {json.dumps(trabajo.resumen())}\n\n"
+            if trabajo.log.cerrado and seq >= trabajo.log.ultima_secuencia:
+                yield "event: fin\ndata: {}\n\n"
+                return
+
+    return Response(stream_with_context(generar()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/entrenamientos/<trabajo_id>/cancelar', methods=['POST'])
+@login_required
+def cancelar_entrenamiento(trabajo_id):
+    if ENTRENAMIENTOS.cancelar(trabajo_id):
+        flash("Re-entrenamiento cancelado.", 'info')
+    else:
+        flash("Ese re-entrenamiento ya no está corriendo.", 'warning')
+    return redirect(url_for('admin_panel'))
+
+@app.route('/db_pool_stats')
+@login_required
+def db_pool_stats():
+    # Contadores del pool de conexiones del panel (espera, agotamiento, reconexiones)
+    return jsonify(DB_POOL.stats())
+
+@app.route('/bot_stats')
+@login_required
+def bot_stats():
+    # Contadores del servidor de acciones (caché de preferencias, cola de escritura, pool)
+    try:
+        respuesta = _llamar_accion("action_estadisticas_servidor", timeout=5)
+        mensajes = [r.get("custom") for r in respuesta.get("responses", []) if r.get("custom")]
+        return jsonify(mensajes[0] if mensajes else {})
+    except Exception as e:
+        return jsonify({"error": f"El servidor de acciones no responde: {e}"}), 503
+
+@app.route('/hash_stats')
+@login_required
+def hash_stats():
+    # Latencias (p50/p95/máx) y rechazos del pool de hash, y bloqueos por intentos
+    return jsonify({"pool_hash": POOL_HASH.stats(), "limite_ip": LIMITE_IP.stats(), "limite_cuenta": LIMITE_CUENTA.stats()})
+
+@app.route('/dashboard_cache_stats')
+@login_required
+def dashboard_cache_stats():
+    # Aciertos/fallos del caché de agregados del dashboard y del de administradores
+    return jsonify({"dashboard": CACHE_DASHBOARD.stats(), "admins": CACHE_USUARIOS.stats(),
+                    "consultas_lentas": CACHE_CONSULTAS_LENTAS.stats()})
+
+@app.route('/consultas_lentas')
+@login_required
+def ver_consultas_lentas():
+    # Registro que escribe el servidor de acciones: entradas crudas o agrupadas por forma
+    n = min(request.args.get('n', 500, type=int), 5000)
+    entradas = consultas_lentas.leer(n=n)
+    if request.args.get('agrupar', '1') == '0':
+        return jsonify(entradas)
+    return jsonify(consultas_lentas.resumir(entradas))
+
+@app.route('/metrics')
+def metrics():
+    # Formato de texto de Prometheus. Las métricas del servidor de acciones están
+    # en su propio puerto (METRICAS_PUERTO, solo localhost por defecto).
+    if request.remote_addr not in METRICAS_IPS and not current_user.is_authenticated:
+        return "Acceso restringido.", 403
+    return Response(metricas.REGISTRO.exponer(), content_type=metricas.TIPO_CONTENIDO)
+
+# --- (Rutas públicas: /public_register, /public_login, /profile, /public_logout, /check_session, /tours_cercanos) ---
 @app.route('/public_register', methods=['POST'])
 def public_register():
     # ... (código de public_register)
@@ -353,7 +642,15 @@ def public_register():
     password_plana = data.get('password')
     if not username or not email or not password_plana:
         return jsonify({"success": False, "message": "Faltan datos."}), 400
-    password_hash = generate_password_hash(password_plana)
+    if not all(isinstance(v, str) for v in (username, email, password_plana)):
+        return jsonify({"success": False, "message": "Datos inválidos."}), 400
+    espera = LIMITE_IP.espera(request.remote_addr)
+    if espera:
+        return jsonify({"success": False, "message": "Demasiados intentos. Espera un momento."}), 429, {"Retry-After": str(math.ceil(espera))}
+    try:
+        password_hash = POOL_HASH.generar(password_plana)
+    except HashSaturado:
+        return jsonify({"success": False, "message": "El servidor está ocupado. Intenta de nuevo en unos segundos."}), 503, {"Retry-After": "1"}
     conn = get_db_connection()
     if not conn:
         return jsonify({"success": False, "message": "Error de conexión a la base de datos."}), 500
@@ -365,6 +662,7 @@ def public_register():
         return jsonify({"success": True, "message": "¡Registro exitoso! Ahora puedes iniciar sesión."})
     except mysql.connector.Error as err:
         if err.errno == 1062: 
+            LIMITE_IP.fallo(request.remote_addr)  # Frena el sondeo de emails registrados
             return jsonify({"success": False, "message": "El email o usuario ya está registrado."}), 409
         else:
             return jsonify({"success": False, "message": f"Error de base de datos: {err}"}), 500
@@ -379,6 +677,11 @@ def public_login():
     password_plana = data.get('password')
     if not email or not password_plana:
         return jsonify({"success": False, "message": "Faltan datos."}), 400
+    if not isinstance(email, str) or not isinstance(password_plana, str):
+        return jsonify({"success": False, "message": "Datos inválidos."}), 400
+    espera = _espera_login(f"email:{email.lower()}")
+    if espera:
+        return jsonify({"success": False, "message": f"Demasiados intentos fallidos. Intenta de nuevo en {math.ceil(espera)} segundos."}), 429, {"Retry-After": str(math.ceil(espera))}
     conn = get_db_connection()
     if not conn:
         return jsonify({"success": False, "message": "Error de conexión a la base de datos."}), 500
@@ -386,7 +689,15 @@ def public_login():
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT id, username, password_hash FROM usuarios WHERE email = %s", (email,))
         user = cursor.fetchone()
-        if user and check_password_hash(user['password_hash'], password_plana):
+        cursor.close()
+        conn.close()  # No retener la conexión mientras corre el hash
+        conn = None
+        try:
+            valido = bool(user) and POOL_HASH.verificar(user['password_hash'], password_plana)
+        except HashSaturado:
+            return jsonify({"success": False, "message": "El servidor está ocupado. Intenta de nuevo en unos segundos."}), 503, {"Retry-After": "1"}
+        _registrar_login(f"email:{email.lower()}", valido)
+        if valido:
             user_id_str = f"user_{user['id']}" 
             session.permanent = True 
             session['public_user_id'] = user['id']
@@ -459,6 +770,32 @@ def check_session():
     else:
         return jsonify({"logged_in": False})
 
+@app.route('/tours_cercanos')
+def tours_cercanos():
+    # ?lat=-33.6&lon=-70.6[&k=5][&radio_km=30]: los k más cercanos (dentro del radio, si se indica)
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None or coordenadas({"latitud": lat, "longitud": lon}) is None:
+        return jsonify({"success": False, "message": "Faltan lat y lon válidos."}), 400
+    k = max(1, min(request.args.get('k', 5, type=int), MAX_TOURS_CERCANOS))
+    radio_km = request.args.get('radio_km', type=float)
+    if radio_km is not None and radio_km <= 0:
+        return jsonify({"success": False, "message": "radio_km debe ser positivo."}), 400
+    try:
+        cercanos = CATALOGO_TOURS.cercanos(lat, lon, k=k, radio_km=radio_km)
+    except mysql.connector.Error as err:
+        print(f"Error de base de datos en /tours_cercanos: {err}")
+        return jsonify({"success": False, "message": "Error de base de datos."}), 503
+    tours = []
+    for tour, km in cercanos:
+        latitud, longitud = coordenadas(tour)
+        tours.append({
+            "id": tour["id"], "nombre": tour["nombre"], "valle": tour.get("valle"),
+            "descripcion_tour": tour.get("descripcion_tour"), "horario_tour": tour.get("horario_tour"),
+            "link_web": tour.get("link_web"), "latitud": latitud, "longitud": longitud, "km": round(km, 2),
+        })
+    return jsonify({"success": True, "tours": tours})
+
 # --- Iniciar el servidor del panel ---
 if __name__ == '__main__':
     app.run(debug=True, port=8080)
\ No newline at end of file
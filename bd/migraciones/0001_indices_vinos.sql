@@ -0,0 +1,15 @@
+-- Filtros por igualdad de la consulta de ActionRecomendarVinoDb por la ruta
+-- SQL sin índice en memoria (consulta_recomendacion): cepa, cepa+tipo,
+-- cepa+tipo+ano, tipo, tipo+ano y ano. La consulta lee la fila completa del
+-- vino elegido, así que el índice acota las filas pero no es cubriente.
+-- Con filtros de etiquetas (nota, característica, maridaje) el plan puede
+-- partir de la tabla de la etiqueta y leer vinos por PRIMARY; esos casos no se
+-- verifican aquí.
+CREATE INDEX idx_vinos_cepa_tipo_ano ON vinos (cepa, tipo, ano, vina_id);
+CREATE INDEX idx_vinos_tipo_ano ON vinos (tipo, ano, vina_id);
+CREATE INDEX idx_vinos_ano ON vinos (ano, vina_id);
+
+-- @explain idx_vinos_cepa_tipo_ano: recomendacion cepa=Carmenere
+-- @explain idx_vinos_cepa_tipo_ano: recomendacion cepa=Carmenere tipo=Tinto ano=2020
+-- @explain idx_vinos_tipo_ano: recomendacion tipo=Blanco
+-- @explain idx_vinos_ano: recomendacion ano=2020
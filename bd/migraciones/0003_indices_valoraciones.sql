@@ -0,0 +1,8 @@
+-- Dashboard del panel: últimas valoraciones (ORDER BY fecha_valoracion DESC
+-- LIMIT 5, recorriendo el índice hacia atrás) y promedio por viña (AVG/COUNT
+-- con el JOIN a vinas, leyendo valoraciones_tour solo desde el índice).
+CREATE INDEX idx_valoraciones_fecha ON valoraciones_tour (fecha_valoracion);
+CREATE INDEX idx_valoraciones_vina_rating ON valoraciones_tour (vina_id, rating);
+
+-- @explain idx_valoraciones_fecha: dashboard recent_valoraciones
+-- @explain idx_valoraciones_vina_rating cubriente: dashboard top_tours
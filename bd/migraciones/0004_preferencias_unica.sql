@@ -0,0 +1,15 @@
+-- Una preferencia por (usuario, tipo): es lo que ya garantiza el DELETE+INSERT
+-- de las acciones, y permite upserts de una sola sentencia
+-- (INSERT ... ON DUPLICATE KEY UPDATE). Antes se eliminan duplicados dejando
+-- el más reciente.
+DELETE p FROM preferencias_usuario p
+  JOIN preferencias_usuario q
+    ON p.usuario_id = q.usuario_id AND p.tipo_preferencia = q.tipo_preferencia AND p.id < q.id;
+CREATE UNIQUE INDEX uq_preferencias_usuario_tipo ON preferencias_usuario (usuario_id, tipo_preferencia);
+-- El índice único empieza por usuario_id y sirve a la FK: el simple sobra
+ALTER TABLE preferencias_usuario DROP INDEX usuario_id;
+-- Top de preferencias del dashboard (GROUP BY tipo, valor) sin leer la tabla
+CREATE INDEX idx_preferencias_tipo_valor ON preferencias_usuario (tipo_preferencia, valor_preferencia);
+
+-- @explain uq_preferencias_usuario_tipo: preferencias 1
+-- @explain idx_preferencias_tipo_valor cubriente: dashboard top_preferencias
@@ -0,0 +1,21 @@
+#!/usr/bin/env bash
+# Paso de CI: crea una base desechable desde el dump, aplica las migraciones y
+# corre `verificar`. Termina con error si alguna consulta no usa su índice
+# (cualquier FALLA) o si una migración no se pudo aplicar.
+#
+# Uso (desde la raíz del proyecto, con MySQL corriendo y las credenciales de
+# DB_CONFIG en actions/db_pool.py):
+#     bash bd/verificar_migraciones.sh
+# Variables opcionales: BASE_CI (por defecto vinai_ci_migraciones),
+# MYSQL_USER (root) y MYSQL_PWD (vacía; la lee el cliente mysql).
+set -euo pipefail
+
+BASE_CI="${BASE_CI:-vinai_ci_migraciones}"
+MYSQL=(mysql -u "${MYSQL_USER:-root}")
+
+"${MYSQL[@]}" -e "DROP DATABASE IF EXISTS \`${BASE_CI}\`; CREATE DATABASE \`${BASE_CI}\` DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+trap '"${MYSQL[@]}" -e "DROP DATABASE IF EXISTS \`${BASE_CI}\`;"' EXIT
+
+"${MYSQL[@]}" "${BASE_CI}" < bd/vinai_db_normalizada.sql
+python -m actions.migraciones aplicar --base "${BASE_CI}"
+python -m actions.migraciones verificar --base "${BASE_CI}"
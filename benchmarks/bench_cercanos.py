@@ -0,0 +1,90 @@
+"""
+Benchmark: índice espacial de tours (actions/indice_geo.py) con viñas
+sintéticas repartidas por los valles de Chile, sin base de datos. Mide la
+construcción del KD-tree y la latencia de los k más cercanos, de los k más
+cercanos dentro de un radio (lo que usan la acción y /tours_cercanos) y de
+todos los del radio (que crece con la cantidad de resultados), para varios
+tamaños de catálogo, y compara una muestra con el cálculo haversine fila por
+fila.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_cercanos.py --vinas 1000 10000 100000 --consultas 2000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions.indice_geo import IndiceGeo, distancia_km  # noqa: E402
+
+# (latitud, longitud) aproximadas del centro de cada valle
+VALLES = ((-29.95, -70.75), (-32.80, -70.60), (-33.30, -71.40), (-33.65, -70.60), (-34.65, -71.25),
+          (-34.95, -71.20), (-35.45, -71.65), (-36.60, -72.40), (-37.40, -72.40), (-33.80, -71.50))
+
+
+def generar(total: int, rnd: random.Random) -> List[Tuple[float, float]]:
+    # Agrupadas alrededor de los valles (~20 km), como las viñas reales
+    return [(centro[0] + rnd.gauss(0, 0.18), centro[1] + rnd.gauss(0, 0.18))
+            for centro in (rnd.choice(VALLES) for _ in range(total))]
+
+
+def _percentil(ordenadas: List[float], p: float) -> float:
+    return ordenadas[min(len(ordenadas) - 1, int(math.ceil(p * len(ordenadas))) - 1)]
+
+
+def _medir(funcion, consultas) -> Tuple[List[float], float]:
+    tiempos, resultados = [], 0
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        resultados += len(funcion(*consulta))
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return sorted(tiempos), resultados / max(1, len(consultas))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vinas", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--radio", type=float, default=15.0, help="km de la búsqueda por radio")
+    parser.add_argument("--verificar", type=int, default=50, help="consultas comparadas con haversine por fila")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'viñas':>7} | {'carga ms':>8} | {'consulta':<11} | {'p50 ms':>7} | {'p95 ms':>7} | "
+          f"{'p99 ms':>7} | {'resultados':>10} | {'por fila ms':>11} | difieren")
+    for total in args.vinas:
+        rnd = random.Random(args.semilla)
+        puntos = generar(total, rnd)
+        consultas = [(c[0] + rnd.uniform(-0.3, 0.3), c[1] + rnd.uniform(-0.3, 0.3))
+                     for c in (rnd.choice(VALLES) for _ in range(args.consultas))]
+        inicio = time.perf_counter()
+        indice = IndiceGeo(puntos)
+        t_carga = (time.perf_counter() - inicio) * 1000
+
+        # Referencia: lo que haría un ORDER BY haversine sobre cada fila
+        inicio = time.perf_counter()
+        difieren = 0
+        for lat, lon in consultas[:args.verificar]:
+            fuerza_bruta = sorted((distancia_km(lat, lon, p_lat, p_lon), i) for i, (p_lat, p_lon) in enumerate(puntos))
+            esperado = [round(km, 6) for km, _ in fuerza_bruta[:args.k]]
+            difieren += esperado != [round(km, 6) for _, km in indice.cercanos(lat, lon, args.k)]
+        t_fila = (time.perf_counter() - inicio) * 1000 / max(1, min(args.verificar, len(consultas)))
+
+        busquedas = (("k_cercanos", lambda lat, lon: indice.cercanos(lat, lon, args.k)),
+                     ("k_en_radio", lambda lat, lon: indice.cercanos(lat, lon, args.k, args.radio)),
+                     ("radio_todo", lambda lat, lon: indice.en_radio(lat, lon, args.radio)))
+        for nombre, funcion in busquedas:
+            tiempos, resultados = _medir(funcion, consultas)
+            print(f"{total:>7} | {t_carga:>8.0f} | {nombre:<11} | {_percentil(tiempos, 0.5):>7.3f} | "
+                  f"{_percentil(tiempos, 0.95):>7.3f} | {_percentil(tiempos, 0.99):>7.3f} | {resultados:>10.1f} | "
+                  f"{t_fila:>11.1f} | {difieren if nombre == 'k_cercanos' else '-'}")
+
+
+if __name__ == "__main__":
+    main()
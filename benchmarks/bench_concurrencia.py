@@ -0,0 +1,130 @@
+"""
+Benchmark de concurrencia del camino asíncrono de DB de las acciones.
+
+Simula N conversaciones simultáneas; cada turno hace una consulta que tarda
+`--latencia` segundos en el servidor (SELECT SLEEP). Compara:
+  - bloqueante: la consulta corre en el event loop (como antes, un turno a la vez)
+  - executor:   la consulta corre con `en_hilo_db` (actions.async_db)
+y muestra turnos/segundo para cada nivel de concurrencia. Con el executor el
+rendimiento debe crecer con las conversaciones hasta el tamaño del pool.
+
+Requiere el MySQL local configurado en actions/db_pool.py (DB_CONFIG).
+
+Con `--simulado` no usa MySQL: N acciones decoradas con
+`accion_no_bloqueante`, cuyo cuerpo es una llamada bloqueante simulada
+(time.sleep), corren a la vez y deben terminar en más o menos lo que tarda
+una sola, no N veces eso. Sale con código 1 si no es así, para usarlo como
+verificación automática.
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_concurrencia.py --turnos 64 --latencia 0.05
+    python benchmarks/bench_concurrencia.py --simulado
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions import async_db  # noqa: E402
+from actions.async_db import accion_no_bloqueante  # noqa: E402
+
+# --simulado: N acciones a la vez pueden tardar a lo sumo esto por sobre una sola
+TOLERANCIA_SIMULADO = 1.5
+
+
+def turno(pool, latencia: float) -> None:
+    conn = pool.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT SLEEP(%s)", (latencia,))
+        cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+async def conversacion_bloqueante(pool, turnos: int, latencia: float) -> None:
+    for _ in range(turnos):
+        turno(pool, latencia)
+        await asyncio.sleep(0)
+
+
+async def conversacion_executor(pool, turnos: int, latencia: float) -> None:
+    for _ in range(turnos):
+        await async_db.en_hilo_db(turno, pool, latencia)
+
+
+async def medir(modo, pool, conversaciones: int, turnos_totales: int, latencia: float) -> float:
+    por_conversacion = max(1, turnos_totales // conversaciones)
+    inicio = time.perf_counter()
+    await asyncio.gather(*(modo(pool, por_conversacion, latencia) for _ in range(conversaciones)))
+    return por_conversacion * conversaciones / (time.perf_counter() - inicio)
+
+
+class AccionSimulada:
+    """Acción con el mismo decorador que las de actions/actions.py; su "consulta" es un sleep bloqueante."""
+
+    def __init__(self, latencia: float):
+        self.latencia = latencia
+
+    def name(self) -> str:
+        return "action_simulada"
+
+    @accion_no_bloqueante
+    def run(self, dispatcher, tracker, domain):
+        time.sleep(self.latencia)
+        return []
+
+
+async def acciones_concurrentes(accion: AccionSimulada, cantidad: int) -> float:
+    inicio = time.perf_counter()
+    await asyncio.gather(*(accion.run(None, None, {}) for _ in range(cantidad)))
+    return time.perf_counter() - inicio
+
+
+def verificar_simulado(pool: int, latencia: float) -> bool:
+    async_db.configurar(max_workers=pool)
+    accion = AccionSimulada(latencia)
+    asyncio.run(acciones_concurrentes(accion, pool))  # Crea los hilos del executor
+    una = asyncio.run(acciones_concurrentes(accion, 1))
+    print(f"{'acciones':>8} | {'total s':>8} | {'vs una':>7} | {'en serie':>8}")
+    correcto = True
+    for cantidad in sorted({1, 2, 4, pool}):
+        total = asyncio.run(acciones_concurrentes(accion, cantidad))
+        correcto &= total <= una * TOLERANCIA_SIMULADO
+        print(f"{cantidad:>8} | {total:>8.3f} | {total / una:>6.2f}x | {cantidad:>7}x")
+    return correcto
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turnos", type=int, default=64, help="Turnos totales por medición")
+    parser.add_argument("--latencia", type=float, default=0.05, help="Segundos por consulta (SELECT SLEEP)")
+    parser.add_argument("--pool", type=int, default=8, help="Tamaño del pool y del executor")
+    parser.add_argument("--simulado", action="store_true", help="Sin MySQL: verifica accion_no_bloqueante")
+    args = parser.parse_args()
+
+    if args.simulado:
+        if not verificar_simulado(args.pool, args.latencia):
+            print(f"\nAcciones concurrentes tardaron más de {TOLERANCIA_SIMULADO}x lo que tarda una: no se solapan.")
+            sys.exit(1)
+        print(f"\nLas acciones concurrentes se solapan (hasta {args.pool}, el tamaño del executor).")
+        return
+
+    from actions.db_pool import crear_pool, DB_CONFIG  # Requiere mysql.connector
+    pool = crear_pool(DB_CONFIG, size=args.pool, nombre="bench")
+    async_db.configurar(max_workers=args.pool)
+
+    print(f"{'conversaciones':>14} | {'bloqueante (t/s)':>17} | {'executor (t/s)':>15} | {'mejora':>7}")
+    for conversaciones in (1, 2, 4, 8, 16):
+        bloqueante = asyncio.run(medir(conversacion_bloqueante, pool, conversaciones, args.turnos, args.latencia))
+        executor = asyncio.run(medir(conversacion_executor, pool, conversaciones, args.turnos, args.latencia))
+        print(f"{conversaciones:>14} | {bloqueante:>17.1f} | {executor:>15.1f} | {executor / bloqueante:>6.1f}x")
+    pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Benchmark de la capa de datos: las consultas que emiten ActionRecomendarVinoDb
+(las 127 combinaciones de filtros nota/característica/maridaje/cepa/tipo/
+valle/año de la ruta SQL), la carga de los catálogos en memoria que sirven a
+ActionBuscarTour y ActionRecomendarTourDb, las preferencias del usuario y los
+agregados del dashboard de admin_panel().
+
+Por caso informa p50/p95/p99 en ms y filas examinadas (deltas de los
+contadores Handler_read* de la sesión, así que funciona igual en MySQL y
+MariaDB). Con varias bases (`--bases`) se mide el mismo conjunto de casos
+sobre catálogos de distinto tamaño, p. ej. copias locales llenadas con datos
+sintéticos.
+
+`--guardar` escribe una línea base en JSON; `--comparar` vuelve a medir,
+compara con esa base y termina con código 1 si algún caso empeoró más que la
+tolerancia (p95 o filas examinadas).
+
+Requiere un MySQL local (no usar contra producción: corre cientos de SELECT).
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_consultas.py --bases vinai_db_normalizada --guardar base_consultas.json
+    python benchmarks/bench_consultas.py --bases vinai_db_normalizada --comparar base_consultas.json
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector  # noqa: E402
+
+from actions.catalogo_tours import QUERY_TOURS  # noqa: E402
+from actions.consultas import (  # noqa: E402
+    FILTROS_RECOMENDACION, QUERIES_DASHBOARD, QUERY_PREFERENCIAS, consulta_recomendacion,
+)
+from actions.indice_vinos import QUERIES_ETIQUETAS, QUERY_VINOS  # noqa: E402
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+}
+
+# Misma consulta que ResolverVinas.refrescar
+QUERY_RESOLVER = "SELECT id, nombre FROM vinas ORDER BY id"
+TABLAS_TAMANO = ("vinos", "vinas", "usuarios", "preferencias_usuario", "valoraciones_tour")
+
+
+class Caso(NamedTuple):
+    nombre: str
+    # Devuelve (consulta, parámetros) para una repetición
+    generar: Callable[[random.Random], Tuple[str, Tuple]]
+    # Las cargas completas del catálogo se repiten menos
+    pesado: bool = False
+
+
+def _percentil(ordenadas: List[float], p: float) -> float:
+    if not ordenadas:
+        return 0.0
+    return ordenadas[min(len(ordenadas) - 1, int(math.ceil(p * len(ordenadas))) - 1)]
+
+
+# --- Datos de muestra para los parámetros ---
+
+class Muestras:
+    """Vinos reales (con sus etiquetas) y usuarios de la base, para armar filtros que sí existen."""
+
+    def __init__(self, cursor):
+        cursor.execute(QUERY_VINOS)
+        self.vinos = [
+            {"id": f[0], "cepa": f[2], "ano": f[3], "tipo": f[4], "valle": f[6]}
+            for f in cursor.fetchall()
+        ]
+        self.etiquetas: Dict[str, Dict[int, List[str]]] = {}
+        self.todas: Dict[str, List[str]] = {}
+        for tipo, query in QUERIES_ETIQUETAS.items():
+            cursor.execute(query)
+            por_vino: Dict[int, List[str]] = {}
+            for vino_id, nombre in cursor.fetchall():
+                por_vino.setdefault(vino_id, []).append(nombre)
+            self.etiquetas[tipo] = por_vino
+            self.todas[tipo] = sorted({n for nombres in por_vino.values() for n in nombres})
+        cursor.execute("SELECT id FROM usuarios")
+        self.usuarios = [f[0] for f in cursor.fetchall()] or [1]
+
+    def criterios(self, filtros: Tuple[str, ...], rnd: random.Random) -> Dict[str, Any]:
+        """Valores de un vino al azar (la mayoría de las combinaciones devuelve algo)."""
+        vino = rnd.choice(self.vinos) if self.vinos else {}
+        criterios: Dict[str, Any] = {}
+        for filtro in filtros:
+            if filtro in self.etiquetas:
+                propias = self.etiquetas[filtro].get(vino.get("id"), [])
+                opciones = propias or self.todas[filtro] or ["-"]
+                criterios[filtro] = rnd.choice(opciones)
+            else:
+                criterios[filtro] = vino.get(filtro) or "-"
+        return criterios
+
+
+def construir_casos(muestras: Muestras) -> List[Caso]:
+    casos: List[Caso] = []
+    for n in range(1, len(FILTROS_RECOMENDACION) + 1):
+        for filtros in itertools.combinations(FILTROS_RECOMENDACION, n):
+            casos.append(Caso(
+                "vino:" + "+".join(filtros),
+                lambda rnd, filtros=filtros: consulta_recomendacion(**muestras.criterios(filtros, rnd)),
+            ))
+    casos.append(Caso("preferencias", lambda rnd: (QUERY_PREFERENCIAS, (rnd.choice(muestras.usuarios),))))
+    for nombre, query in QUERIES_DASHBOARD.items():
+        casos.append(Caso(f"dashboard:{nombre}", lambda rnd, query=query: (query, ())))
+    casos.append(Caso("carga:tours", lambda rnd: (QUERY_TOURS, ()), pesado=True))
+    casos.append(Caso("carga:resolver_vinas", lambda rnd: (QUERY_RESOLVER, ()), pesado=True))
+    casos.append(Caso("carga:indice_vinos", lambda rnd: (QUERY_VINOS, ()), pesado=True))
+    for tipo, query in QUERIES_ETIQUETAS.items():
+        casos.append(Caso(f"carga:indice_{tipo}", lambda rnd, query=query: (query, ()), pesado=True))
+    return casos
+
+
+# --- Medición ---
+
+def _lecturas_handler(cursor) -> int:
+    cursor.execute("SHOW SESSION STATUS LIKE 'Handler_read%'")
+    return sum(int(valor) for _, valor in cursor.fetchall())
+
+
+def filas_examinadas(cursor, query: str, params: Tuple, ruido: int) -> int:
+    antes = _lecturas_handler(cursor)
+    cursor.execute(query, params)
+    cursor.fetchall()
+    return max(0, _lecturas_handler(cursor) - antes - ruido)
+
+
+def medir_caso(cursor, caso: Caso, repeticiones: int, rnd: random.Random, ruido: int) -> Dict[str, Any]:
+    tiempos = []
+    devueltas = 0
+    for _ in range(repeticiones):
+        query, params = caso.generar(rnd)
+        inicio = time.perf_counter()
+        cursor.execute(query, params)
+        devueltas += len(cursor.fetchall())
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    query, params = caso.generar(rnd)
+    ordenados = sorted(tiempos)
+    return {
+        "p50_ms": round(_percentil(ordenados, 0.50), 3),
+        "p95_ms": round(_percentil(ordenados, 0.95), 3),
+        "p99_ms": round(_percentil(ordenados, 0.99), 3),
+        "filas_examinadas": filas_examinadas(cursor, query, params, ruido),
+        "filas_devueltas": round(devueltas / repeticiones, 1),
+        "repeticiones": repeticiones,
+    }
+
+
+def medir_base(base: str, repeticiones: int, semilla: int, filtro: Optional[str]) -> Dict[str, Any]:
+    conn = mysql.connector.connect(**DB_CONFIG, database=base)
+    try:
+        cursor = conn.cursor()
+        tamano = {}
+        for tabla in TABLAS_TAMANO:
+            cursor.execute(f"SELECT COUNT(*) FROM {tabla}")
+            tamano[tabla] = cursor.fetchone()[0]
+        muestras = Muestras(cursor)
+        # Lo que suma el propio SHOW STATUS, para descontarlo
+        ruido = -_lecturas_handler(cursor)
+        ruido += _lecturas_handler(cursor)
+
+        rnd = random.Random(semilla)
+        resultados = {}
+        for caso in construir_casos(muestras):
+            if filtro and filtro not in caso.nombre:
+                continue
+            n = max(3, repeticiones // 10) if caso.pesado else repeticiones
+            resultados[caso.nombre] = medir_caso(cursor, caso, n, rnd, ruido)
+        cursor.close()
+    finally:
+        conn.close()
+    return {"tamano": tamano, "casos": resultados}
+
+
+# --- Línea base ---
+
+def comparar(actual: Dict[str, Any], base: Dict[str, Any], tolerancia: float, umbral_ms: float) -> List[str]:
+    regresiones = []
+    for nombre_base, medicion in actual["bases"].items():
+        anterior = base["bases"].get(nombre_base)
+        if anterior is None:
+            print(f"[aviso] {nombre_base} no está en la línea base; no se compara.")
+            continue
+        if anterior["tamano"] != medicion["tamano"]:
+            print(f"[aviso] {nombre_base} cambió de tamaño desde la línea base: {anterior['tamano']} -> {medicion['tamano']}")
+        for caso, r in medicion["casos"].items():
+            b = anterior["casos"].get(caso)
+            if b is None:
+                continue
+            if r["p95_ms"] > b["p95_ms"] * (1 + tolerancia) and r["p95_ms"] - b["p95_ms"] > umbral_ms:
+                regresiones.append(f"{nombre_base} {caso}: p95 {b['p95_ms']} -> {r['p95_ms']} ms")
+            if r["filas_examinadas"] > b["filas_examinadas"] * (1 + tolerancia) + 10:
+                regresiones.append(f"{nombre_base} {caso}: filas examinadas {b['filas_examinadas']} -> {r['filas_examinadas']}")
+    return regresiones
+
+
+def imprimir(base: str, medicion: Dict[str, Any]) -> None:
+    tamano = ", ".join(f"{t}={n}" for t, n in medicion["tamano"].items())
+    print(f"\n== {base} ({tamano})")
+    print(f"{'caso':<58} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'examinadas':>10} | {'devueltas':>9}")
+    for caso, r in medicion["casos"].items():
+        print(f"{caso:<58} | {r['p50_ms']:>8.3f} | {r['p95_ms']:>8.3f} | {r['p99_ms']:>8.3f} | "
+              f"{r['filas_examinadas']:>10} | {r['filas_devueltas']:>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bases", default="vinai_db_normalizada",
+                        help="Bases a medir, separadas por coma (p. ej. una por tamaño de catálogo)")
+    parser.add_argument("--repeticiones", type=int, default=50, help="Repeticiones por caso")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--filtro", help="Solo los casos cuyo nombre contenga este texto")
+    parser.add_argument("--guardar", help="Escribir los resultados como línea base en este JSON")
+    parser.add_argument("--comparar", help="Comparar contra esta línea base (código 1 si hay regresiones)")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Empeoramiento relativo permitido")
+    parser.add_argument("--umbral-ms", type=float, default=0.5,
+                        help="Diferencia de p95 bajo la cual no se cuenta como regresión (ruido)")
+    args = parser.parse_args()
+
+    resultado = {"creado": datetime.now().isoformat(timespec="seconds"), "semilla": args.semilla, "bases": {}}
+    for base in [b.strip() for b in args.bases.split(",") if b.strip()]:
+        resultado["bases"][base] = medir_base(base, args.repeticiones, args.semilla, args.filtro)
+        imprimir(base, resultado["bases"][base])
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\nLínea base guardada en {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(resultado, base, args.tolerancia, args.umbral_ms)
+        if regresiones:
+            print(f"\n{len(regresiones)} regresiones respecto de {args.comparar}:")
+            for r in regresiones:
+                print(f"  - {r}")
+            sys.exit(1)
+        print(f"\nSin regresiones respecto de {args.comparar} (tolerancia {args.tolerancia:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
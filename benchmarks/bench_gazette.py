@@ -0,0 +1,88 @@
+"""
+Benchmark: escaneo lineal de `find_keyword` vs. GazetteMatcher (Aho-Corasick).
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_gazette.py --entradas 12000 --mensajes 2000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions.gazette_matcher import GazetteMatcher  # noqa: E402
+
+CATEGORIAS = ("notas_sabor", "caracteristicas", "maridajes", "vinas")
+
+
+def find_keyword(text: str, keywords: List[str]) -> Optional[str]:
+    """Escaneo original de ActionRecomendarVinoDb / ActionBuscarTour."""
+    for keyword in keywords:
+        if keyword in text:
+            return keyword.capitalize()
+    return None
+
+
+def _palabra(rnd: random.Random) -> str:
+    return "".join(rnd.choice(string.ascii_lowercase + "áéíóúñ") for _ in range(rnd.randint(4, 10)))
+
+
+def generar_gazettes(total: int, rnd: random.Random) -> Dict[str, List[str]]:
+    gazettes = {c: [] for c in CATEGORIAS}
+    for i in range(total):
+        palabras = " ".join(_palabra(rnd) for _ in range(rnd.randint(1, 3)))
+        gazettes[CATEGORIAS[i % len(CATEGORIAS)]].append(palabras)
+    return gazettes
+
+
+def generar_mensajes(gazettes: Dict[str, List[str]], total: int, rnd: random.Random) -> List[str]:
+    todas = [p for palabras in gazettes.values() for p in palabras]
+    mensajes = []
+    for _ in range(total):
+        relleno = [_palabra(rnd) for _ in range(rnd.randint(5, 15))]
+        for _ in range(rnd.randint(0, 2)):
+            relleno.insert(rnd.randrange(len(relleno) + 1), rnd.choice(todas))
+        mensajes.append(" ".join(relleno))
+    return mensajes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entradas", type=int, default=12000, help="Palabras totales en los gazettes")
+    parser.add_argument("--mensajes", type=int, default=2000, help="Mensajes de usuario a procesar")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.semilla)
+    gazettes = generar_gazettes(args.entradas, rnd)
+    mensajes = generar_mensajes(gazettes, args.mensajes, rnd)
+
+    inicio = time.perf_counter()
+    matcher = GazetteMatcher(gazettes)
+    t_compilar = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for mensaje in mensajes:
+        for categoria in CATEGORIAS:
+            find_keyword(mensaje, gazettes[categoria])
+    t_lineal = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for mensaje in mensajes:
+        matcher.mejores(mensaje)
+    t_automata = time.perf_counter() - inicio
+
+    n = len(mensajes)
+    print(f"Gazette: {matcher.total_palabras} entradas | {n} mensajes")
+    print(f"Compilación del autómata: {t_compilar * 1000:.1f} ms")
+    print(f"find_keyword (lineal):    {t_lineal / n * 1e6:10.1f} µs/mensaje")
+    print(f"GazetteMatcher:           {t_automata / n * 1e6:10.1f} µs/mensaje")
+    print(f"Aceleración:              {t_lineal / t_automata:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
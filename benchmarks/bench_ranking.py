@@ -0,0 +1,111 @@
+"""
+Benchmark: RankingVinos (actions/ranking_vinos.py) sobre un catálogo sintético
+en memoria, sin base de datos. Mide la construcción de los arreglos y la
+latencia de `mejores()` para pedidos de distinto tipo: muy específicos (que
+se relajan), un solo filtro, solo preferencias guardadas y solo perfil de
+cata ("algo económico y ligero").
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_ranking.py --vinos 100000 --pedidos 2000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions.ranking_vinos import RankingVinos  # noqa: E402
+
+CEPAS = ("Carmenere", "Cabernet Sauvignon", "Merlot", "Syrah", "Pinot Noir", "Malbec",
+         "Chardonnay", "Sauvignon Blanc", "Riesling", "Moscatel")
+VALLES = ("Valle del Maipo", "Valle de Colchagua", "Valle de Casablanca", "Valle de Aconcagua",
+          "Valle del Elqui", "Valle de Curicó", "Valle del Maule", "Valle de Leyda")
+NOTAS = ("Frutos rojos", "Vainilla", "Cítrico", "Pimienta", "Chocolate", "Tabaco", "Miel", "Manzana verde")
+CARACTERISTICAS = ("Robusto", "Fresco", "Seco", "Dulce", "Orgánico", "Reserva", "Ligero", "Mineral", "Joven")
+MARIDAJES = ("Carnes rojas", "Pescados", "Quesos", "Pastas", "Mariscos", "Postres", "Aves")
+GUARDA = ("Beber ahora", "Beber ahora", "3-5 años", "5-10 años", "10+ años")
+PALABRAS_PERFIL = ("economico", "ligero", "robusto", "para guardar", "suave", "premium", "dulce")
+
+
+def generar(total: int, rnd: random.Random) -> Tuple[List[Tuple], Dict[str, List[Tuple[int, str]]]]:
+    filas = []
+    for vino_id in range(1, total + 1):
+        cepa = rnd.choice(CEPAS)
+        tipo = "Blanco" if CEPAS.index(cepa) >= 6 else rnd.choice(("Tinto", "Tinto", "Rosado"))
+        filas.append((
+            vino_id, f"Vino {vino_id}", cepa, rnd.randint(2005, 2024), tipo, f"Viña {vino_id % 800}",
+            rnd.choice(VALLES), None,
+            rnd.choice(("Ligero", "Medio", "Completo", None)), rnd.choice(("Baja", "Media", "Alta")),
+            rnd.choice(("Bajos", "Medios", "Altos")) if tipo == "Tinto" else None,
+            rnd.choice(("Seco", "Seco", "Semi-Seco", "Dulce")), rnd.choice(("$", "$$", "$$$")), rnd.choice(GUARDA),
+        ))
+    etiquetas = {"nota_sabor": [], "caracteristica": [], "maridaje": []}
+    for vino_id in range(1, total + 1):
+        for atributo, valores in (("nota_sabor", NOTAS), ("caracteristica", CARACTERISTICAS), ("maridaje", MARIDAJES)):
+            for valor in rnd.sample(valores, rnd.randint(1, 3)):
+                etiquetas[atributo].append((vino_id, valor))
+    return filas, etiquetas
+
+
+def generar_pedidos(total: int, rnd: random.Random) -> List[Tuple[str, Dict[str, Any]]]:
+    tipos = {
+        "especifico": lambda: dict(cepa=rnd.choice(CEPAS), tipo=rnd.choice(("Tinto", "Blanco")),
+                                   valle=rnd.choice(VALLES).split()[-1], ano=rnd.randint(2005, 2024),
+                                   maridaje=rnd.choice(MARIDAJES), nota_sabor=rnd.choice(NOTAS),
+                                   caracteristica=rnd.choice(CARACTERISTICAS)),
+        "un_filtro": lambda: dict(cepa=rnd.choice(CEPAS)),
+        "preferencias": lambda: dict(preferencias={"cepa": rnd.choice(CEPAS), "valle": rnd.choice(VALLES)}),
+        "perfil": lambda: dict(texto=f"quiero algo {rnd.choice(PALABRAS_PERFIL)} y {rnd.choice(PALABRAS_PERFIL)}"),
+    }
+    nombres = list(tipos)
+    return [(nombre, tipos[nombre]()) for nombre in (rnd.choice(nombres) for _ in range(total))]
+
+
+def _percentil(ordenadas: List[float], p: float) -> float:
+    return ordenadas[min(len(ordenadas) - 1, int(math.ceil(p * len(ordenadas))) - 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vinos", type=int, default=100000)
+    parser.add_argument("--pedidos", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.semilla)
+    filas, etiquetas = generar(args.vinos, rnd)
+    pedidos = generar_pedidos(args.pedidos, rnd)
+
+    ranking = RankingVinos(get_connection=None, semilla=args.semilla)
+    inicio = time.perf_counter()
+    ranking.cargar(filas, etiquetas, version=())
+    t_carga = time.perf_counter() - inicio
+    # Sin DB: la versión del catálogo no cambia nunca
+    estado = ranking._estado
+    ranking.asegurar_vigente = lambda: estado
+
+    tiempos: Dict[str, List[float]] = {}
+    relajados = 0
+    for nombre, pedido in pedidos:
+        inicio = time.perf_counter()
+        resultados = ranking.mejores(k=args.k, **pedido)
+        tiempos.setdefault(nombre, []).append((time.perf_counter() - inicio) * 1000)
+        relajados += bool(resultados and resultados[0].relajados)
+
+    print(f"Catálogo: {args.vinos} vinos, {len(estado.combinaciones_cata)} combinaciones de cata "
+          f"| carga {t_carga * 1000:.0f} ms")
+    print(f"{'pedido':<14} | {'n':>5} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7}")
+    for nombre, lista in sorted(tiempos.items()):
+        lista.sort()
+        print(f"{nombre:<14} | {len(lista):>5} | {_percentil(lista, 0.5):>7.3f} | "
+              f"{_percentil(lista, 0.95):>7.3f} | {_percentil(lista, 0.99):>7.3f}")
+    print(f"Pedidos respondidos relajando algún criterio: {relajados}/{len(pedidos)}")
+
+
+if __name__ == "__main__":
+    main()
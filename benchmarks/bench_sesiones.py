@@ -0,0 +1,75 @@
+"""
+Benchmark de peticiones autenticadas del panel: `/` (admin logueado) y
+`/check_session` (el sondeo de js/bot.js), con y sin el caché de
+administradores de `load_user` (admin_app.CACHE_USUARIOS).
+
+Usa el cliente de pruebas de Flask (sin red) para medir solo el trabajo del
+servidor. La sesión se arma directamente con el primer admin de la tabla
+`admins`, así que no hace falta su contraseña.
+
+Requiere el MySQL local configurado en actions/db_pool.py (DB_CONFIG).
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/bench_sesiones.py --peticiones 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import admin_app  # noqa: E402
+
+
+def primer_admin() -> int:
+    conn = admin_app.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM admins ORDER BY id LIMIT 1")
+        fila = cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+    if not fila:
+        sys.exit("La tabla admins está vacía.")
+    return fila[0]
+
+
+def medir(cliente, ruta: str, peticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(peticiones):
+        respuesta = cliente.get(ruta)
+        if respuesta.status_code != 200:
+            sys.exit(f"{ruta} respondió {respuesta.status_code}")
+    return peticiones / (time.perf_counter() - inicio)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--peticiones", type=int, default=2000, help="Peticiones por medición")
+    args = parser.parse_args()
+
+    admin_id = primer_admin()
+    cliente = admin_app.app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion["_user_id"] = str(admin_id)
+        sesion["_fresh"] = True
+        sesion["public_user_id"] = 1
+        sesion["public_username"] = "bench"
+
+    cliente.get("/")  # Calienta el pool y el caché del dashboard
+    print(f"{'ruta':>15} | {'sin caché (req/s)':>18} | {'con caché (req/s)':>18} | {'mejora':>7}")
+    for ruta in ("/", "/check_session"):
+        admin_app.USAR_CACHE_USUARIOS = False
+        sin_cache = medir(cliente, ruta, args.peticiones)
+        admin_app.USAR_CACHE_USUARIOS = True
+        admin_app.invalidar_usuario()
+        con_cache = medir(cliente, ruta, args.peticiones)
+        print(f"{ruta:>15} | {sin_cache:>18.1f} | {con_cache:>18.1f} | {con_cache / sin_cache:>6.1f}x")
+    print(f"caché de admins: {admin_app.CACHE_USUARIOS.stats()}")
+    admin_app.DB_POOL.close_all()
+
+
+if __name__ == "__main__":
+    main()
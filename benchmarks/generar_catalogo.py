@@ -0,0 +1,395 @@
+"""
+Generador de un catálogo sintético con el esquema real de VinAI, para pruebas
+de capacidad de las acciones y del dashboard (p. ej. con bench_consultas.py).
+
+Crea (o vacía) una base aparte copiando la estructura de la base de
+desarrollo con `CREATE TABLE ... LIKE`, así que hereda también los índices de
+las migraciones aplicadas allí. Copia tal cual las etiquetas (notas_sabor,
+maridajes, caracteristicas) y genera:
+  - vinas con valle, comuna, latitud/longitud alrededor de valles reales y tour
+  - vinos con cepa/tipo coherentes y los enums cuerpo/acidez/taninos/dulzor
+  - vino_nota, vino_caracteristica y vino_maridaje
+  - usuarios, preferencias_usuario (a lo más una por tipo) y valoraciones_tour
+Con sesgo realista: la popularidad de viñas, etiquetas, cepas y la actividad
+de los usuarios siguen una ley de Zipf, y cada viña tiene una "calidad" que
+mueve sus ratings. Todo sale de `--semilla`: misma semilla, mismos datos.
+
+La carga es por lotes de INSERT multi-fila sin chequeos de claves foráneas
+ni únicas; con `--load-data` usa LOAD DATA LOCAL INFILE (más rápido, pero el
+servidor debe tener `local_infile=1`).
+
+Uso (desde la raíz del proyecto):
+    python benchmarks/generar_catalogo.py --base vinai_sintetico --crear
+    python benchmarks/generar_catalogo.py --base vinai_100k --crear --vinos 100000 --valoraciones 1000000
+    python benchmarks/bench_consultas.py --bases vinai_db_normalizada,vinai_sintetico,vinai_100k
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector  # noqa: E402
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+}
+BASE_ORIGEN = 'vinai_db_normalizada'
+
+TABLAS_ETIQUETAS = ("notas_sabor", "caracteristicas", "maridajes")
+TABLAS_GENERADAS = ("vinas", "vinos", "vino_nota", "vino_caracteristica", "vino_maridaje",
+                    "usuarios", "preferencias_usuario", "valoraciones_tour")
+TAMANO_LOTE = 5000
+
+# Valle -> (latitud, longitud, comunas, peso)
+VALLES = {
+    "Valle del Maipo": (-33.70, -70.65, ("Pirque", "Buin", "Puente Alto", "Isla de Maipo", "Talagante"), 10),
+    "Valle de Colchagua": (-34.62, -71.30, ("Santa Cruz", "Palmilla", "Lolol", "Chimbarongo"), 9),
+    "Valle de Casablanca": (-33.32, -71.40, ("Casablanca",), 6),
+    "Valle de Aconcagua": (-32.80, -70.70, ("Panquehue", "Calle Larga", "San Felipe"), 4),
+    "Valle del Cachapoal": (-34.30, -70.90, ("Requínoa", "Rancagua", "Peumo"), 4),
+    "Valle de Curicó": (-34.98, -71.24, ("Curicó", "Molina", "Sagrada Familia"), 4),
+    "Valle del Maule": (-35.55, -71.60, ("San Javier", "Talca", "Cauquenes"), 5),
+    "Valle de Leyda": (-33.62, -71.62, ("San Antonio",), 2),
+    "Valle de San Antonio": (-33.55, -71.55, ("Santo Domingo", "San Antonio"), 2),
+    "Valle del Elqui": (-30.00, -70.70, ("Vicuña", "Paihuano"), 1),
+    "Valle del Limarí": (-30.70, -71.40, ("Ovalle",), 1),
+    "Valle del Itata": (-36.50, -72.40, ("Quillón", "Coelemu"), 2),
+    "Valle del Bío Bío": (-37.50, -72.30, ("Yumbel", "Mulchén"), 1),
+}
+
+# Cepa -> (tipo, peso)
+CEPAS = {
+    "Cabernet Sauvignon": ("Tinto", 20), "Carmenere": ("Tinto", 14), "Sauvignon Blanc": ("Blanco", 14),
+    "Chardonnay": ("Blanco", 10), "Merlot": ("Tinto", 8), "Pinot Noir": ("Tinto", 7), "Syrah": ("Tinto", 6),
+    "Malbec": ("Tinto", 4), "Carignan": ("Tinto", 3), "País": ("Tinto", 2), "Cinsault": ("Tinto", 2),
+    "Garnacha": ("Tinto", 2), "Riesling": ("Blanco", 2), "Viognier": ("Blanco", 1),
+    "Moscatel": ("Blanco", 2), "Gewürztraminer": ("Blanco", 1), "Cabernet Franc": ("Tinto", 2),
+}
+NOMBRES_VINA = ("Los Robles", "Santa Inés", "El Huique", "Quebrada Honda", "Las Pircas", "Altos del Sol",
+                "San Clemente", "Piedra Roja", "La Rinconada", "Cerro Azul", "Tres Esteros", "El Almendro",
+                "Los Aromos", "Las Mercedes", "Casa Vieja", "Monte Grande", "El Peumo", "Las Lomas",
+                "Santa Amalia", "Los Copihues", "Llano Largo", "El Boldo", "Agua Clara", "Punta Larga")
+PREFIJOS_VINA = ("Viña", "Viña", "Viña", "Bodega", "Viñedos", "Casa", "Hacienda")
+LINEAS_VINO = ("Reserva", "Gran Reserva", "Reserva Especial", "Single Vineyard", "Estate", "Icono",
+               "Clásico", "Varietal", "Edición Limitada", "Cosecha Tardía", "Terroir", "Origen")
+TIPOS_TOUR = ("Clásico", "Premium", "Gastronómico", "Bicicleta", "Cabalgata", "Histórico", "Orgánico")
+HORARIOS = ("Lunes a Domingo (10:00 - 17:00)", "Martes a Domingo (9:30 - 18:00)",
+            "Lunes a Sábado (10:00 - 16:30)", "Solo con reserva previa")
+COMENTARIOS = ("Excelente tour, muy recomendable", "Buena cata, algo caro", "Lindo lugar",
+               "El guía sabía mucho", "Regular, esperaba más", "Volvería sin dudarlo")
+GUARDA = ("Beber ahora", "Beber ahora", "3-5 años", "5-10 años", "10+ años")
+HASH_FICTICIO = "scrypt:32768:8:1$sintetico$" + "0" * 128  # Nadie puede iniciar sesión con él
+
+
+# --- Distribuciones ---
+
+class Zipf:
+    """Elige índices 0..n-1 con probabilidad ∝ 1/(rango+1)^s, en orden de rango barajado."""
+
+    def __init__(self, n: int, rnd: random.Random, s: float = 1.1):
+        self.orden = list(range(n))
+        rnd.shuffle(self.orden)
+        self.acumulado = list(itertools.accumulate(1.0 / (k + 1) ** s for k in range(n)))
+        self._rnd = rnd
+
+    def elegir(self) -> int:
+        return self.orden[bisect_left(self.acumulado, self._rnd.random() * self.acumulado[-1])]
+
+    def peso(self, indice_rango: int) -> float:
+        anterior = self.acumulado[indice_rango - 1] if indice_rango else 0.0
+        return (self.acumulado[indice_rango] - anterior) / self.acumulado[-1]
+
+
+def _ponderado(rnd: random.Random, opciones: Dict[str, Any], peso) -> str:
+    return rnd.choices(list(opciones), weights=[peso(v) for v in opciones.values()])[0]
+
+
+def _fecha(rnd: random.Random, desde: datetime, dias: int) -> str:
+    return (desde + timedelta(seconds=rnd.randrange(dias * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# --- Generadores de filas ---
+
+def generar_vinas(n: int, rnd: random.Random) -> Iterator[Tuple]:
+    vistos = set()
+    for vina_id in range(1, n + 1):
+        nombre = f"{rnd.choice(PREFIJOS_VINA)} {rnd.choice(NOMBRES_VINA)}"
+        if nombre in vistos:
+            nombre = f"{nombre} {vina_id}"
+        vistos.add(nombre)
+        valle = _ponderado(rnd, VALLES, lambda v: v[3])
+        lat, lon, comunas, _ = VALLES[valle]
+        con_tour = rnd.random() < 0.7
+        yield (
+            vina_id, nombre, valle, rnd.choice(comunas),
+            f"Tour {rnd.choice(TIPOS_TOUR).lower()} por los viñedos y cata de {rnd.randint(2, 5)} vinos." if con_tour else None,
+            rnd.choice(HORARIOS) if con_tour else None,
+            f"{rnd.choice((45, 60, 75, 90, 120))} min" if con_tour else None,
+            f"${rnd.randrange(10, 60) * 1000:,} CLP".replace(",", ".") if con_tour else None,
+            ", ".join(rnd.sample(TIPOS_TOUR, rnd.randint(1, 3))) if con_tour else None,
+            f"https://ejemplo.com/vina/{vina_id}",
+            round(lat + rnd.gauss(0, 0.12), 8), round(lon + rnd.gauss(0, 0.12), 8),
+            None,
+        )
+
+
+def generar_vinos(n: int, n_vinas: int, rnd: random.Random) -> Iterator[Tuple]:
+    vinas = Zipf(n_vinas, rnd)
+    anos = list(range(2005, 2025))
+    for vino_id in range(1, n + 1):
+        cepa = _ponderado(rnd, CEPAS, lambda v: v[1])
+        tipo = CEPAS[cepa][0]
+        if tipo == "Tinto" and rnd.random() < 0.04:
+            tipo = "Rosado"
+        elif tipo == "Blanco" and rnd.random() < 0.05:
+            tipo = "Espumante"
+        tinto = tipo == "Tinto"
+        cuerpo = rnd.choices(("Ligero", "Medio", "Completo"), weights=(1, 3, 4) if tinto else (5, 3, 1))[0]
+        acidez = rnd.choices(("Baja", "Media", "Alta"), weights=(2, 5, 2) if tinto else (1, 3, 5))[0]
+        taninos = rnd.choices(("Bajos", "Medios", "Altos"), weights=(1, 4, 3))[0] if tinto else None
+        dulzor = rnd.choices(("Seco", "Semi-Seco", "Dulce"), weights=(20, 3, 1) if cepa != "Moscatel" else (1, 2, 5))[0]
+        precio = rnd.choices(("$", "$$", "$$$"), weights=(5, 4, 1))[0]
+        # Más vinos de cosechas recientes
+        ano = rnd.choices(anos, weights=[1 + k * k for k in range(len(anos))])[0]
+        yield (
+            vino_id, f"{rnd.choice(LINEAS_VINO)} {cepa}", cepa, ano, tipo, cuerpo, acidez, taninos, dulzor,
+            vinas.elegir() + 1, f"https://ejemplo.com/vino/{vino_id}", None, precio,
+            rnd.choice(GUARDA) if precio != "$" else "Beber ahora",
+        )
+
+
+def generar_etiquetas(n_vinos: int, ids_etiqueta: Sequence[int], promedio: float,
+                      rnd: random.Random) -> Iterator[Tuple[int, int]]:
+    if not ids_etiqueta:
+        return
+    populares = Zipf(len(ids_etiqueta), rnd, s=0.9)
+    maximo = min(len(ids_etiqueta), max(1, round(promedio * 2)))
+    for vino_id in range(1, n_vinos + 1):
+        cantidad = min(maximo, max(0, round(rnd.gauss(promedio, 1))))
+        elegidas = set()
+        for _ in range(cantidad * 4):
+            if len(elegidas) >= cantidad:
+                break
+            elegidas.add(ids_etiqueta[populares.elegir()])
+        for etiqueta_id in sorted(elegidas):
+            yield (vino_id, etiqueta_id)
+
+
+def generar_usuarios(n: int, rnd: random.Random, inicio: datetime) -> Iterator[Tuple]:
+    for usuario_id in range(1, n + 1):
+        yield (usuario_id, f"usuario{usuario_id}", f"usuario{usuario_id}@ejemplo.com", HASH_FICTICIO,
+               _fecha(rnd, inicio, 730))
+
+
+def generar_preferencias(n_usuarios: int, valores: Dict[str, List[str]], rnd: random.Random) -> Iterator[Tuple]:
+    zipfs = {tipo: Zipf(len(v), rnd) for tipo, v in valores.items() if v}
+    pref_id = 0
+    for usuario_id in range(1, n_usuarios + 1):
+        if rnd.random() > 0.6:
+            continue
+        for tipo in rnd.sample(list(zipfs), rnd.randint(1, min(3, len(zipfs)))):
+            pref_id += 1
+            yield (pref_id, usuario_id, tipo, valores[tipo][zipfs[tipo].elegir()])
+
+
+def generar_valoraciones(total: int, n_usuarios: int, vinas_con_tour: List[int], rnd: random.Random,
+                         inicio: datetime) -> Iterator[Tuple]:
+    """A lo más una valoración por (usuario, viña), como deja la acción al re-valorar."""
+    if not vinas_con_tour or not n_usuarios:
+        return
+    populares = Zipf(len(vinas_con_tour), rnd)
+    activos = Zipf(n_usuarios, rnd, s=0.8)
+    calidad = {vina_id: min(5.0, max(1.5, rnd.gauss(4.0, 0.6))) for vina_id in vinas_con_tour}
+    tope = max(1, len(vinas_con_tour) // 2)
+    valoracion_id = 0
+    peso_restante = 1.0
+    for rango in range(n_usuarios):
+        usuario_id = activos.orden[rango] + 1
+        # Lo que los usuarios más activos no alcanzan a valorar (tope) pasa a los siguientes
+        peso = activos.peso(rango)
+        cantidad = min(tope, round((total - valoracion_id) * peso / peso_restante)) if peso_restante > 0 else 0
+        peso_restante -= peso
+        if cantidad <= 0:
+            continue
+        vistas = set()
+        for _ in range(cantidad * 4):
+            if len(vistas) >= cantidad:
+                break
+            vistas.add(vinas_con_tour[populares.elegir()])
+        for vina_id in vistas:
+            if valoracion_id >= total:
+                return
+            valoracion_id += 1
+            rating = min(5, max(1, round(rnd.gauss(calidad[vina_id], 0.9))))
+            comentario = rnd.choice(COMENTARIOS) if rnd.random() < 0.3 else None
+            yield (valoracion_id, usuario_id, vina_id, rating, comentario, _fecha(rnd, inicio, 730))
+
+
+# --- Carga ---
+
+COLUMNAS = {
+    "vinas": ("id", "nombre", "valle", "comuna", "descripcion_tour", "horario_tour", "duracion_tour",
+              "precio_tour", "tipo_tour", "link_web", "latitud", "longitud", "imagen_url"),
+    "vinos": ("id", "nombre", "cepa", "ano", "tipo", "cuerpo", "acidez", "taninos", "dulzor", "vina_id",
+              "link_compra", "imagen_url", "precio_aproximado", "potencial_guarda"),
+    "vino_nota": ("vino_id", "nota_id"),
+    "vino_caracteristica": ("vino_id", "caracteristica_id"),
+    "vino_maridaje": ("vino_id", "maridaje_id"),
+    "usuarios": ("id", "username", "email", "password_hash", "fecha_registro"),
+    "preferencias_usuario": ("id", "usuario_id", "tipo_preferencia", "valor_preferencia"),
+    "valoraciones_tour": ("id", "usuario_id", "vina_id", "rating", "comentario", "fecha_valoracion"),
+}
+
+
+def _lotes(filas: Iterable[Tuple], tamano: int) -> Iterator[List[Tuple]]:
+    iterador = iter(filas)
+    while True:
+        lote = list(itertools.islice(iterador, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+def _campo_tsv(valor: Any) -> str:
+    if valor is None:
+        return "\\N"
+    return str(valor).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def cargar(conn, tabla: str, filas: Iterable[Tuple], load_data: bool = False) -> Tuple[int, float]:
+    """Inserta `filas` por lotes. Devuelve (filas, segundos)."""
+    columnas = COLUMNAS[tabla]
+    cursor = conn.cursor()
+    total = 0
+    inicio = time.perf_counter()
+    for lote in _lotes(filas, TAMANO_LOTE):
+        if load_data:
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".tsv", delete=False) as f:
+                for fila in lote:
+                    f.write("\t".join(_campo_tsv(v) for v in fila) + "\n")
+            try:
+                cursor.execute(f"LOAD DATA LOCAL INFILE %s INTO TABLE {tabla} CHARACTER SET utf8mb4 "
+                               f"({', '.join(columnas)})", (f.name.replace("\\", "/"),))
+            finally:
+                os.unlink(f.name)
+        else:
+            # executemany de un INSERT ... VALUES se envía como un solo INSERT multi-fila
+            cursor.executemany(
+                f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join(['%s'] * len(columnas))})", lote
+            )
+        conn.commit()
+        total += len(lote)
+    cursor.close()
+    return total, time.perf_counter() - inicio
+
+
+def preparar_base(conn, base: str, crear: bool) -> None:
+    cursor = conn.cursor()
+    if crear:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{base}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        cursor.execute(f"SHOW TABLES FROM `{BASE_ORIGEN}`")
+        for (tabla,) in cursor.fetchall():
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS `{base}`.`{tabla}` LIKE `{BASE_ORIGEN}`.`{tabla}`")
+        for tabla in TABLAS_ETIQUETAS + ("admins", "schema_migraciones"):
+            cursor.execute(f"SHOW TABLES FROM `{BASE_ORIGEN}` LIKE %s", (tabla,))
+            if cursor.fetchall():
+                cursor.execute(f"DELETE FROM `{base}`.`{tabla}`")
+                cursor.execute(f"INSERT INTO `{base}`.`{tabla}` SELECT * FROM `{BASE_ORIGEN}`.`{tabla}`")
+    cursor.execute(f"USE `{base}`")
+    cursor.execute("SET foreign_key_checks = 0, unique_checks = 0")
+    for tabla in TABLAS_GENERADAS:
+        cursor.execute(f"TRUNCATE TABLE {tabla}")
+    conn.commit()
+    cursor.close()
+
+
+def _ids(conn, consulta: str) -> List[Any]:
+    cursor = conn.cursor()
+    cursor.execute(consulta)
+    valores = [fila[0] for fila in cursor.fetchall()]
+    cursor.close()
+    return valores
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base", default="vinai_sintetico", help="Base a llenar (se vacía antes)")
+    parser.add_argument("--crear", action="store_true",
+                        help=f"Crear la base y sus tablas copiando la estructura de {BASE_ORIGEN}")
+    parser.add_argument("--vinas", type=int, default=2000)
+    parser.add_argument("--vinos", type=int, default=20000)
+    parser.add_argument("--usuarios", type=int, default=20000)
+    parser.add_argument("--valoraciones", type=int, default=100000)
+    parser.add_argument("--etiquetas-por-vino", type=float, default=2.0,
+                        help="Promedio de notas, características y maridajes por vino (cada uno)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--load-data", action="store_true", help="Cargar con LOAD DATA LOCAL INFILE")
+    args = parser.parse_args()
+
+    if args.base == BASE_ORIGEN:
+        sys.exit(f"{BASE_ORIGEN} es la base de desarrollo: elige otra con --base.")
+
+    conn = mysql.connector.connect(**DB_CONFIG, allow_local_infile=args.load_data)
+    try:
+        preparar_base(conn, args.base, args.crear)
+        rnd = random.Random(args.semilla)
+        inicio_datos = datetime(2023, 1, 1)
+        cargas = [
+            ("vinas", lambda: generar_vinas(args.vinas, rnd)),
+            ("vinos", lambda: generar_vinos(args.vinos, args.vinas, rnd)),
+        ]
+        for tabla, columna, origen in (("vino_nota", "nota_id", "notas_sabor"),
+                                       ("vino_caracteristica", "caracteristica_id", "caracteristicas"),
+                                       ("vino_maridaje", "maridaje_id", "maridajes")):
+            ids = _ids(conn, f"SELECT id FROM {origen} ORDER BY id")
+            cargas.append((tabla, lambda ids=ids: generar_etiquetas(args.vinos, ids, args.etiquetas_por_vino, rnd)))
+        cargas.append(("usuarios", lambda: generar_usuarios(args.usuarios, rnd, inicio_datos)))
+
+        total_filas = 0
+        inicio = time.perf_counter()
+        for tabla, generar in cargas:
+            filas, segundos = cargar(conn, tabla, generar(), args.load_data)
+            total_filas += filas
+            print(f"{tabla:<22} {filas:>10} filas  {segundos:7.1f}s  ({filas / max(segundos, 1e-9):,.0f} filas/s)")
+
+        # Las preferencias y valoraciones dependen de lo ya cargado
+        valores_preferencia = {
+            "cepa": list(CEPAS),
+            "tipo_vino": ["Tinto", "Blanco", "Rosado", "Espumante"],
+            "valle": list(VALLES),
+            "maridaje": _ids(conn, "SELECT nombre FROM maridajes ORDER BY id"),
+            "caracteristica": _ids(conn, "SELECT nombre FROM caracteristicas ORDER BY id"),
+        }
+        vinas_con_tour = _ids(conn, "SELECT id FROM vinas WHERE descripcion_tour IS NOT NULL ORDER BY id")
+        for tabla, filas_generadas in (
+            ("preferencias_usuario", generar_preferencias(args.usuarios, valores_preferencia, rnd)),
+            ("valoraciones_tour", generar_valoraciones(args.valoraciones, args.usuarios, vinas_con_tour, rnd,
+                                                       inicio_datos)),
+        ):
+            filas, segundos = cargar(conn, tabla, filas_generadas, args.load_data)
+            total_filas += filas
+            print(f"{tabla:<22} {filas:>10} filas  {segundos:7.1f}s  ({filas / max(segundos, 1e-9):,.0f} filas/s)")
+
+        cursor = conn.cursor()
+        for tabla in TABLAS_GENERADAS:
+            cursor.execute(f"ANALYZE TABLE {tabla}")
+            cursor.fetchall()
+        cursor.close()
+        total = time.perf_counter() - inicio
+        print(f"\n{args.base}: {total_filas} filas en {total:.1f}s (semilla {args.semilla}).")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import threading
+from collections import deque
+from typing import List, Optional, Tuple
+
+# --- Buffer Circular de Líneas ---
+# Guarda las últimas `capacidad` líneas de salida de un proceso, cada una con
+# un número de secuencia creciente. Un lector (p. ej. un stream SSE) pide "todo
+# lo posterior a la secuencia N" y puede esperar a que lleguen líneas nuevas.
+# Si el lector se atrasa más que la capacidad, pierde las más viejas.
+
+
+class BufferCircular:
+    def __init__(self, capacidad: int = 2000):
+        self.capacidad = capacidad
+        self._lineas: "deque[Tuple[int, str]]" = deque(maxlen=capacidad)
+        self._siguiente = 1
+        self._cerrado = False
+        self._condicion = threading.Condition()
+
+    def agregar(self, linea: str) -> int:
+        with self._condicion:
+            seq = self._siguiente
+            self._siguiente += 1
+            self._lineas.append((seq, linea))
+            self._condicion.notify_all()
+            return seq
+
+    def cerrar(self) -> None:
+        """Marca que no llegarán más líneas (despierta a los lectores)."""
+        with self._condicion:
+            self._cerrado = True
+            self._condicion.notify_all()
+
+    @property
+    def cerrado(self) -> bool:
+        return self._cerrado
+
+    @property
+    def ultima_secuencia(self) -> int:
+        return self._siguiente - 1
+
+    def desde(self, seq: int = 0) -> List[Tuple[int, str]]:
+        """Líneas con secuencia mayor que `seq` que siguen en el buffer."""
+        with self._condicion:
+            return [(s, l) for s, l in self._lineas if s > seq]
+
+    def esperar(self, seq: int, timeout: Optional[float] = None) -> List[Tuple[int, str]]:
+        """Como `desde`, pero si no hay nada nuevo espera hasta `timeout` (o hasta que se cierre)."""
+        with self._condicion:
+            self._condicion.wait_for(lambda: self._siguiente - 1 > seq or self._cerrado, timeout)
+            return [(s, l) for s, l in self._lineas if s > seq]
+
+    def ultimas(self, n: int) -> List[str]:
+        with self._condicion:
+            return [l for _, l in list(self._lineas)[-n:]]
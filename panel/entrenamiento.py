@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from panel.buffer_circular import BufferCircular
+
+# --- Trabajos de Entrenamiento en Segundo Plano ---
+# `rasa train` tarda minutos: la ruta del panel solo encola el trabajo y
+# vuelve. Un hilo corre el proceso, vuelca su salida (stdout + stderr) a un
+# buffer circular que el panel lee por SSE, y al terminar agrega una línea al
+# historial (JSON Lines) con la duración, para detectar regresiones.
+# Solo puede haber un entrenamiento a la vez.
+
+logger = logging.getLogger(__name__)
+
+EN_COLA = "en_cola"
+CORRIENDO = "corriendo"
+EXITOSO = "exitoso"
+FALLIDO = "fallido"
+CANCELADO = "cancelado"
+OMITIDO = "omitido"      # Sin cambios desde el último modelo: no se corrió `rasa train`
+ESTADOS_FINALES = (EXITOSO, FALLIDO, CANCELADO, OMITIDO)
+
+CAPACIDAD_LOG = 2000
+MAX_HISTORIAL = 200
+
+# Salida de rasa/tqdm: "Epochs:  43%|████      | 43/100" y la ruta del modelo
+_PORCENTAJE = re.compile(r"(\d{1,3})%\|")
+_MODELO = re.compile(r"saved at '([^']+\.tar\.gz)'")
+
+
+class EntrenamientoEnCurso(RuntimeError):
+    def __init__(self, trabajo: "TrabajoEntrenamiento"):
+        super().__init__(f"Ya hay un entrenamiento en curso ({trabajo.id}).")
+        self.trabajo = trabajo
+
+
+class TrabajoEntrenamiento:
+    def __init__(self, comando: List[str], motivo: str = ""):
+        self.id = uuid.uuid4().hex[:12]
+        self.comando = comando
+        self.motivo = motivo
+        self.estado = EN_COLA
+        self.creado = time.time()
+        self.inicio: Optional[float] = None
+        self.fin: Optional[float] = None
+        self.codigo_salida: Optional[int] = None
+        self.progreso: Optional[int] = None
+        self.etapa = ""
+        self.modelo: Optional[str] = None
+        self.log = BufferCircular(CAPACIDAD_LOG)
+        self._proceso: Optional[subprocess.Popen] = None
+
+    @property
+    def terminado(self) -> bool:
+        return self.estado in ESTADOS_FINALES
+
+    @property
+    def duracion(self) -> Optional[float]:
+        if self.inicio is None:
+            return None
+        return (self.fin or time.time()) - self.inicio
+
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "estado": self.estado,
+            "motivo": self.motivo,
+            "creado": self.creado,
+            "inicio": self.inicio,
+            "fin": self.fin,
+            "duracion_s": round(self.duracion, 1) if self.duracion is not None else None,
+            "codigo_salida": self.codigo_salida,
+            "progreso": self.progreso,
+            "etapa": self.etapa,
+            "modelo": self.modelo,
+        }
+
+    def _procesar_linea(self, linea: str) -> None:
+        porcentaje = _PORCENTAJE.search(linea)
+        if porcentaje:
+            self.progreso = min(100, int(porcentaje.group(1)))
+        if "Training NLU model" in linea:
+            self.etapa = "NLU"
+        elif "Training Core model" in linea:
+            self.etapa = "Core"
+        modelo = _MODELO.search(linea)
+        if modelo:
+            self.modelo = modelo.group(1)
+
+
+class GestorEntrenamiento:
+    def __init__(self, project_path: str, python_executable: str,
+                 historial_path: Optional[str] = None):
+        self.project_path = project_path
+        self.python_executable = python_executable
+        self.historial_path = historial_path or os.path.join(project_path, ".entrenamientos", "historial.jsonl")
+        self._lock = threading.Lock()
+        self._actual: Optional[TrabajoEntrenamiento] = None
+        self._trabajos: Dict[str, TrabajoEntrenamiento] = {}
+
+    @property
+    def actual(self) -> Optional[TrabajoEntrenamiento]:
+        """El trabajo en curso o el último que corrió en este proceso."""
+        return self._actual
+
+    def obtener(self, trabajo_id: str) -> Optional[TrabajoEntrenamiento]:
+        return self._trabajos.get(trabajo_id)
+
+    def encolar(self, argumentos: Optional[List[str]] = None, motivo: str = "",
+                al_terminar: Optional[Callable[[TrabajoEntrenamiento], None]] = None) -> TrabajoEntrenamiento:
+        """
+        Lanza `rasa train` en segundo plano. EntrenamientoEnCurso si ya hay uno.
+        `al_terminar(trabajo)` corre en el hilo del trabajo, ya en su estado final.
+        """
+        comando = [self.python_executable, "-m", "rasa", "train"] + list(argumentos or [])
+        with self._lock:
+            if self._actual is not None and not self._actual.terminado:
+                raise EntrenamientoEnCurso(self._actual)
+            trabajo = TrabajoEntrenamiento(comando, motivo)
+            self._actual = trabajo
+            self._trabajos[trabajo.id] = trabajo
+        threading.Thread(target=self._correr, args=(trabajo, al_terminar), name=f"entrenamiento-{trabajo.id}",
+                         daemon=True).start()
+        return trabajo
+
+    def omitir(self, modelo: str, motivo: str = "") -> TrabajoEntrenamiento:
+        """Registra en el historial un entrenamiento que no hizo falta (se reutiliza `modelo`)."""
+        with self._lock:
+            if self._actual is not None and not self._actual.terminado:
+                raise EntrenamientoEnCurso(self._actual)
+            trabajo = TrabajoEntrenamiento([], motivo)
+            trabajo.inicio = trabajo.fin = trabajo.creado
+            trabajo.estado = OMITIDO
+            trabajo.modelo = modelo
+            self._actual = trabajo
+            self._trabajos[trabajo.id] = trabajo
+        trabajo.log.agregar(f"Sin cambios en el dominio, la configuración ni los datos: se reutiliza {modelo}")
+        self._guardar_historial(trabajo)
+        trabajo.log.cerrar()
+        return trabajo
+
+    def cancelar(self, trabajo_id: str) -> bool:
+        trabajo = self._trabajos.get(trabajo_id)
+        if trabajo is None or trabajo.terminado or trabajo._proceso is None:
+            return False
+        trabajo.estado = CANCELADO
+        trabajo._proceso.terminate()
+        return True
+
+    def _correr(self, trabajo: TrabajoEntrenamiento,
+                al_terminar: Optional[Callable[[TrabajoEntrenamiento], None]] = None) -> None:
+        trabajo.inicio = time.time()
+        trabajo.estado = CORRIENDO
+        trabajo.log.agregar(f"$ {' '.join(trabajo.comando[1:])}")
+        try:
+            # text=True traduce los '\r' de las barras de progreso a saltos de línea
+            trabajo._proceso = subprocess.Popen(
+                trabajo.comando, cwd=self.project_path, stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT, text=True, bufsize=1, encoding="utf-8", errors="replace",
+            )
+            for linea in trabajo._proceso.stdout:
+                linea = linea.rstrip()
+                if linea:
+                    trabajo._procesar_linea(linea)
+                    trabajo.log.agregar(linea)
+            trabajo.codigo_salida = trabajo._proceso.wait()
+            if trabajo.estado != CANCELADO:
+                trabajo.estado = EXITOSO if trabajo.codigo_salida == 0 else FALLIDO
+        except Exception as e:
+            trabajo.estado = FALLIDO
+            trabajo.log.agregar(f"Error al ejecutar el entrenamiento: {e}")
+            logger.error(f"Entrenamiento {trabajo.id}: {e}")
+        finally:
+            trabajo.fin = time.time()
+            if trabajo.estado == EXITOSO:
+                trabajo.progreso = 100
+            trabajo.log.agregar(f"[{trabajo.estado}] en {trabajo.duracion:.1f}s")
+            if al_terminar is not None:
+                try:
+                    al_terminar(trabajo)
+                except Exception as e:
+                    logger.error(f"Entrenamiento {trabajo.id}: error al finalizar: {e}")
+            self._guardar_historial(trabajo)
+            trabajo.log.cerrar()
+
+    # --- Historial ---
+
+    def _guardar_historial(self, trabajo: TrabajoEntrenamiento) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.historial_path), exist_ok=True)
+            with open(self.historial_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(trabajo.resumen(), ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"No se pudo guardar el historial de entrenamientos: {e}")
+
+    def historial(self, n: int = 20) -> List[Dict[str, Any]]:
+        """Los últimos `n` entrenamientos, el más reciente primero."""
+        try:
+            with open(self.historial_path, encoding="utf-8") as f:
+                lineas = deque(f, maxlen=min(n, MAX_HISTORIAL))
+        except FileNotFoundError:
+            return []
+        registros = []
+        for linea in reversed(lineas):
+            try:
+                registros.append(json.loads(linea))
+            except json.JSONDecodeError:
+                continue
+        return registros
@@ -0,0 +1,173 @@
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+import mysql.connector
+
+from actions.db_pool import DB_CONFIG
+from actions.resolver_vinas import nucleo_de
+from actions.texto import normalizar
+
+# --- Lookup Tables del Catálogo para el NLU ---
+# `data/nlu.yml` solo trae unos pocos ejemplos de viñas, notas y maridajes.
+# Este módulo exporta el catálogo de la DB a `data/catalogo_nlu.yml` (lookup
+# tables + sinónimos, p. ej. "montes" -> "Viña Montes") para que el modelo
+# reconozca las entidades sin depender solo del escaneo del GAZETTE.
+#
+# Además calcula una huella (SHA-256) de todo lo que entra al entrenamiento:
+# domain.yml, config.yml y data/**/*.yml (incluido el archivo generado). Si
+# coincide con la del último entrenamiento exitoso y su modelo sigue en
+# models/, re-entrenar no cambiaría nada y se puede omitir.
+#
+# Uso (desde la raíz del proyecto):
+#     python -m panel.nlu_catalogo            # genera y muestra la huella
+#     python -m panel.nlu_catalogo --huella   # solo la huella
+
+logger = logging.getLogger(__name__)
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARCHIVO_GENERADO = os.path.join("data", "catalogo_nlu.yml")
+ARCHIVO_HUELLA = os.path.join(".entrenamientos", "huella.json")
+
+# Entidad del NLU -> consulta que trae sus valores
+LOOKUPS = {
+    "vina": "SELECT nombre FROM vinas",
+    "valle": "SELECT DISTINCT valle FROM vinas WHERE valle IS NOT NULL",
+    "sabor_nota": "SELECT nombre FROM notas_sabor",
+    "maridaje": "SELECT nombre FROM maridajes",
+    "caracteristica": "SELECT nombre FROM caracteristicas",
+}
+
+
+def leer_catalogo(get_connection: Callable[[], Any]) -> Dict[str, List[str]]:
+    """Valores únicos (sin repetir por mayúsculas/tildes) y ordenados de cada entidad."""
+    catalogo = {}
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        for entidad, consulta in LOOKUPS.items():
+            cursor.execute(consulta)
+            unicos: Dict[str, str] = {}
+            for (valor,) in cursor.fetchall():
+                valor = " ".join(str(valor or "").split())
+                if valor:
+                    unicos.setdefault(normalizar(valor), valor)
+            catalogo[entidad] = sorted(unicos.values(), key=normalizar)
+        cursor.close()
+    finally:
+        conn.close()
+    return catalogo
+
+
+def _sinonimos(entidad: str, valor: str) -> List[str]:
+    """Formas alternativas que el usuario escribe para `valor` (sin tildes, sin "Viña")."""
+    formas = {normalizar(valor)}
+    if entidad == "vina":
+        formas.add(nucleo_de(normalizar(valor)))
+    formas.discard(valor.lower())
+    return sorted(f for f in formas if f)
+
+
+def generar_yaml(catalogo: Dict[str, List[str]]) -> str:
+    lineas = [
+        "# Generado por `python -m panel.nlu_catalogo` desde la base de datos. No editar a mano.",
+        'version: "3.1"',
+        "nlu:",
+    ]
+    for entidad, valores in catalogo.items():
+        if not valores:
+            continue
+        lineas += [f"- lookup: {entidad}", "  examples: |"]
+        lineas += [f"    - {valor}" for valor in valores]
+    for entidad, valores in catalogo.items():
+        for valor in valores:
+            sinonimos = _sinonimos(entidad, valor)
+            if sinonimos:
+                # json.dumps produce un string YAML válido (comillas dobles)
+                lineas += [f"- synonym: {json.dumps(valor, ensure_ascii=False)}", "  examples: |"]
+                lineas += [f"    - {s}" for s in sinonimos]
+    return "\n".join(lineas) + "\n"
+
+
+def escribir_si_cambio(ruta: str, contenido: str) -> bool:
+    """Escribe de forma atómica solo si el contenido cambió. True si escribió."""
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            if f.read() == contenido:
+                return False
+    except FileNotFoundError:
+        pass
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8", newline="\n") as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+    return True
+
+
+def generar(get_connection: Callable[[], Any], project_path: str = PROJECT_PATH) -> Dict[str, Any]:
+    """Regenera data/catalogo_nlu.yml. Propaga errores de DB."""
+    catalogo = leer_catalogo(get_connection)
+    cambio = escribir_si_cambio(os.path.join(project_path, ARCHIVO_GENERADO), generar_yaml(catalogo))
+    return {"cambio": cambio, "valores": {entidad: len(v) for entidad, v in catalogo.items()}}
+
+
+# --- Huella del entrenamiento ---
+
+def archivos_entrenamiento(project_path: str = PROJECT_PATH) -> List[str]:
+    rutas = [os.path.join(project_path, "domain.yml"), os.path.join(project_path, "config.yml")]
+    rutas += glob.glob(os.path.join(project_path, "data", "**", "*.yml"), recursive=True)
+    return sorted(r for r in rutas if os.path.isfile(r))
+
+
+def calcular_huella(project_path: str = PROJECT_PATH) -> str:
+    h = hashlib.sha256()
+    for ruta in archivos_entrenamiento(project_path):
+        h.update(os.path.relpath(ruta, project_path).replace(os.sep, "/").encode("utf-8") + b"\0")
+        with open(ruta, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+def modelo_vigente(huella: str, project_path: str = PROJECT_PATH) -> Optional[str]:
+    """Ruta del modelo entrenado con esta misma huella, si sigue existiendo."""
+    try:
+        with open(os.path.join(project_path, ARCHIVO_HUELLA), encoding="utf-8") as f:
+            guardada = json.load(f)
+    except (OSError, ValueError):
+        return None
+    modelo = guardada.get("modelo")
+    if guardada.get("huella") != huella or not modelo:
+        return None
+    return modelo if os.path.isfile(os.path.join(project_path, modelo)) else None
+
+
+def guardar_huella(huella: str, modelo: str, project_path: str = PROJECT_PATH) -> None:
+    ruta = os.path.join(project_path, ARCHIVO_HUELLA)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    escribir_si_cambio(ruta, json.dumps({"huella": huella, "modelo": modelo}))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Lookup tables del catálogo para el NLU de VinAI")
+    parser.add_argument("--huella", action="store_true", help="Solo calcular la huella, sin tocar la DB")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if not args.huella:
+        resultado = generar(lambda: mysql.connector.connect(**DB_CONFIG))
+        estado = "actualizado" if resultado["cambio"] else "sin cambios"
+        print(f"{ARCHIVO_GENERADO} {estado}: {resultado['valores']}")
+    huella = calcular_huella()
+    modelo = modelo_vigente(huella)
+    print(f"huella: {huella}")
+    print(f"modelo vigente: {modelo}" if modelo else "hay que re-entrenar")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+import urllib.request
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, List, Optional
+
+from panel.buffer_circular import BufferCircular
+
+# --- Supervisor de los Servidores del Bot ---
+# Cada servidor (Rasa Core en 5005, acciones en 5055) corre bajo un hilo que:
+#   - vacía su salida (stdout + stderr) línea por línea a un buffer circular y
+#     a un archivo rotativo en logs/. Si nadie lee el pipe, al llenarse el
+#     buffer del sistema operativo el proceso se bloquea al escribir su log.
+#   - distingue "arrancando" de "listo" consultando el puerto (readiness) y,
+#     ya listo, vuelve a consultarlo cada pocos segundos (liveness).
+#   - si el proceso muere, no queda listo a tiempo o deja de responder, lo
+#     reinicia con espera exponencial.
+# `detener` primero pide terminar (SIGTERM) y solo mata si no sale a tiempo.
+
+logger = logging.getLogger(__name__)
+
+DETENIDO = "Detenido"
+INICIANDO = "Iniciando"
+CORRIENDO = "Corriendo"
+SIN_RESPUESTA = "Sin respuesta"
+REINICIANDO = "Reiniciando"
+
+CAPACIDAD_LOG = 2000
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_RESPALDOS = 3
+
+INTERVALO_SONDEO = 1.0          # Mientras arranca
+INTERVALO_VIVO = 5.0            # Ya listo
+TIMEOUT_SONDEO = 2.0
+FALLOS_VIVO_MAXIMOS = 3
+TIMEOUT_ARRANQUE = 300.0        # Rasa Core carga el modelo: puede tardar
+TIMEOUT_DETENER = 10.0
+RETROCESO_INICIAL = 1.0
+RETROCESO_MAXIMO = 60.0
+ESTABLE_TRAS = 120.0            # Corriendo este tiempo, el retroceso vuelve al inicial
+
+
+def _consultar(url: str, timeout: float = TIMEOUT_SONDEO) -> Optional[bytes]:
+    """Cuerpo de la respuesta si `url` responde 200, None en cualquier otro caso."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as respuesta:
+            return respuesta.read() if respuesta.status == 200 else None
+    except Exception:
+        return None
+
+
+def modelo_cargado(cuerpo: bytes) -> bool:
+    """Readiness de Rasa Core: /status ya informa un modelo cargado."""
+    try:
+        return bool(json.loads(cuerpo).get("model_file"))
+    except (ValueError, AttributeError):
+        return False
+
+
+class ProcesoSupervisado:
+    def __init__(self, nombre: str, comando: List[str], cwd: str, url_listo: str,
+                 url_vivo: Optional[str] = None, validar_listo: Optional[Callable[[bytes], bool]] = None,
+                 directorio_logs: Optional[str] = None):
+        self.nombre = nombre
+        self.comando = comando
+        self.cwd = cwd
+        self.url_listo = url_listo
+        self.url_vivo = url_vivo or url_listo
+        self.validar_listo = validar_listo
+        self.log = BufferCircular(CAPACIDAD_LOG)
+        self.estado = DETENIDO
+        self.reinicios = 0
+        self.ultimo_error = ""
+        self.codigo_salida: Optional[int] = None
+        self.inicio: Optional[float] = None           # time.time() del último arranque
+        self.tiempo_arranque: Optional[float] = None  # Segundos hasta quedar listo
+        self._proceso: Optional[subprocess.Popen] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._archivo = self._crear_log_archivo(directorio_logs or os.path.join(cwd, "logs"))
+
+    def _crear_log_archivo(self, directorio: str) -> logging.Logger:
+        archivo = logging.getLogger(f"{__name__}.{self.nombre}")
+        archivo.propagate = False
+        archivo.setLevel(logging.INFO)
+        if not archivo.handlers:
+            try:
+                os.makedirs(directorio, exist_ok=True)
+                handler = RotatingFileHandler(os.path.join(directorio, f"{self.nombre}.log"),
+                                              maxBytes=LOG_MAX_BYTES, backupCount=LOG_RESPALDOS,
+                                              encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                archivo.addHandler(handler)
+            except OSError as e:
+                logger.error(f"No se pudo abrir el log de {self.nombre}: {e}")
+        return archivo
+
+    # --- Control ---
+
+    @property
+    def activo(self) -> bool:
+        """El supervisor lo mantiene arriba (aunque ahora mismo esté arrancando o reiniciando)."""
+        return self._hilo is not None and self._hilo.is_alive()
+
+    @property
+    def pid(self) -> Optional[int]:
+        proceso = self._proceso
+        return proceso.pid if proceso is not None and proceso.poll() is None else None
+
+    def iniciar(self) -> bool:
+        """False si ya estaba supervisado."""
+        with self._lock:
+            if self.activo:
+                return False
+            self._parar.clear()
+            self.reinicios = 0
+            self.ultimo_error = ""
+            self._hilo = threading.Thread(target=self._supervisar, name=f"supervisor-{self.nombre}",
+                                          daemon=True)
+            self._hilo.start()
+            return True
+
+    def detener(self, timeout: float = TIMEOUT_DETENER) -> bool:
+        """Parada ordenada: SIGTERM, espera `timeout` y recién ahí SIGKILL. False si ya estaba detenido."""
+        with self._lock:
+            hilo = self._hilo
+            if hilo is None or not hilo.is_alive():
+                return False
+            self._parar.set()
+        self._terminar(timeout)
+        hilo.join(timeout)
+        self.estado = DETENIDO
+        return True
+
+    def _terminar(self, timeout: float) -> None:
+        proceso = self._proceso
+        if proceso is None or proceso.poll() is not None:
+            return
+        proceso.terminate()
+        try:
+            proceso.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self._registrar(f"[supervisor] {self.nombre} no terminó en {timeout:.0f}s; se fuerza la salida.")
+            proceso.kill()
+            proceso.wait()
+
+    # --- Bucle de supervisión ---
+
+    def _registrar(self, linea: str) -> None:
+        self.log.agregar(linea)
+        self._archivo.info(linea)
+
+    def _drenar(self, proceso: subprocess.Popen) -> None:
+        for linea in proceso.stdout:
+            linea = linea.rstrip()
+            if linea:
+                self._registrar(linea)
+
+    def _supervisar(self) -> None:
+        retroceso = RETROCESO_INICIAL
+        while not self._parar.is_set():
+            motivo = self._correr_una_vez()
+            if self._parar.is_set():
+                break
+            # Se cayó o se colgó: reinicio con espera exponencial
+            if self.inicio is not None and time.time() - self.inicio >= ESTABLE_TRAS:
+                retroceso = RETROCESO_INICIAL
+            self.reinicios += 1
+            self.ultimo_error = motivo
+            self.estado = REINICIANDO
+            self._registrar(f"[supervisor] {self.nombre}: {motivo}. Reinicio #{self.reinicios} en {retroceso:.0f}s.")
+            logger.warning(f"{self.nombre}: {motivo}; reinicio en {retroceso:.0f}s")
+            if self._parar.wait(retroceso):
+                break
+            retroceso = min(retroceso * 2, RETROCESO_MAXIMO)
+        self.estado = DETENIDO
+
+    def _correr_una_vez(self) -> str:
+        """Lanza el proceso y lo vigila hasta que muera o deje de responder. Devuelve el motivo."""
+        self.estado = INICIANDO
+        self.inicio = time.time()
+        self.tiempo_arranque = None
+        self.codigo_salida = None
+        self._registrar(f"[supervisor] $ {' '.join(self.comando[1:])}")
+        try:
+            proceso = subprocess.Popen(
+                self.comando, cwd=self.cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                text=True, bufsize=1, encoding="utf-8", errors="replace",
+            )
+        except OSError as e:
+            return f"no se pudo lanzar ({e})"
+        self._proceso = proceso
+        drenaje = threading.Thread(target=self._drenar, args=(proceso,), name=f"drenaje-{self.nombre}",
+                                   daemon=True)
+        drenaje.start()
+
+        fallos = 0
+        motivo = ""
+        while not self._parar.is_set():
+            codigo = proceso.poll()
+            if codigo is not None:
+                self.codigo_salida = codigo
+                motivo = f"terminó con código {codigo}"
+                break
+            if self.estado == INICIANDO:
+                cuerpo = _consultar(self.url_listo)
+                if cuerpo is not None and (self.validar_listo is None or self.validar_listo(cuerpo)):
+                    self.tiempo_arranque = time.time() - self.inicio
+                    self.estado = CORRIENDO
+                    self._registrar(f"[supervisor] {self.nombre} listo en {self.tiempo_arranque:.1f}s.")
+                elif time.time() - self.inicio > TIMEOUT_ARRANQUE:
+                    motivo = f"no quedó listo en {TIMEOUT_ARRANQUE:.0f}s"
+                    break
+                self._parar.wait(INTERVALO_SONDEO)
+                continue
+            if _consultar(self.url_vivo) is None:
+                fallos += 1
+                self.estado = SIN_RESPUESTA
+                if fallos >= FALLOS_VIVO_MAXIMOS:
+                    motivo = f"no respondió {fallos} sondeos seguidos"
+                    break
+            else:
+                fallos = 0
+                self.estado = CORRIENDO
+            self._parar.wait(INTERVALO_VIVO)
+
+        if not self._parar.is_set():
+            self._terminar(TIMEOUT_DETENER)
+        drenaje.join(TIMEOUT_SONDEO)
+        self.codigo_salida = proceso.poll()
+        return motivo
+
+    def resumen(self) -> Dict[str, Any]:
+        activo = self.estado in (INICIANDO, CORRIENDO, SIN_RESPUESTA)
+        return {
+            "nombre": self.nombre,
+            "estado": self.estado,
+            "pid": self.pid,
+            "reinicios": self.reinicios,
+            "ultimo_error": self.ultimo_error,
+            "codigo_salida": self.codigo_salida,
+            "inicio": self.inicio if activo else None,
+            "uptime_s": round(time.time() - self.inicio, 1) if activo and self.inicio else None,
+            "tiempo_arranque_s": round(self.tiempo_arranque, 1) if self.tiempo_arranque is not None else None,
+        }
+
+
+class Supervisor:
+    def __init__(self, procesos: List[ProcesoSupervisado]):
+        self.procesos: Dict[str, ProcesoSupervisado] = {p.nombre: p for p in procesos}
+
+    def __getitem__(self, nombre: str) -> ProcesoSupervisado:
+        return self.procesos[nombre]
+
+    def algun_activo(self) -> bool:
+        return any(p.activo for p in self.procesos.values())
+
+    def detener_todos(self, timeout: float = TIMEOUT_DETENER) -> List[str]:
+        """Detiene todos en paralelo; devuelve los nombres que estaban corriendo."""
+        detenidos: List[str] = []
+        hilos = []
+        for proceso in self.procesos.values():
+            if proceso.activo:
+                detenidos.append(proceso.nombre)
+                hilo = threading.Thread(target=proceso.detener, args=(timeout,), daemon=True)
+                hilo.start()
+                hilos.append(hilo)
+        for hilo in hilos:
+            hilo.join(timeout * 2)
+        return detenidos
+
+    def resumen(self) -> Dict[str, Dict[str, Any]]:
+        return {nombre: p.resumen() for nombre, p in self.procesos.items()}